@@ -0,0 +1,26 @@
+"""back off failed stripe events
+
+Revision ID: 10ee0bfb355a
+Revises: abcedac5c976
+Create Date: 2025-09-25 11:42:08.513927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '10ee0bfb355a'
+down_revision: Union[str, None] = 'abcedac5c976'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('stripe_events', sa.Column('available_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('stripe_events', 'available_at')
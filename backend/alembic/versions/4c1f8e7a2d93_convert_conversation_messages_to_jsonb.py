@@ -0,0 +1,76 @@
+"""convert conversation messages to jsonb
+
+Revision ID: 4c1f8e7a2d93
+Revises: e9a2d4c7b185
+Create Date: 2025-09-22 14:08:51.307562
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1f8e7a2d93'
+down_revision: Union[str, None] = 'e9a2d4c7b185'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# An in-place ALTER COLUMN ... TYPE jsonb rewrites the table under an exclusive
+# lock. Instead the data is copied into a new column in committed batches while
+# a trigger keeps rows written in the meantime in sync, and only the final
+# swap takes the lock.
+
+BATCH_SIZE = 1000
+BACKFILL_REMAINING = 'UPDATE home_design_conversations SET messages_jsonb = messages::jsonb WHERE messages_jsonb IS NULL'
+
+
+def upgrade() -> None:
+    op.add_column('home_design_conversations', sa.Column('messages_jsonb', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.execute("""
+        CREATE FUNCTION home_design_conversations_messages_jsonb() RETURNS trigger AS $$
+        BEGIN
+            NEW.messages_jsonb = NEW.messages::jsonb;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER home_design_conversations_messages_jsonb
+        BEFORE INSERT OR UPDATE OF messages ON home_design_conversations
+        FOR EACH ROW EXECUTE FUNCTION home_design_conversations_messages_jsonb()
+    """)
+
+    backfill = sa.text(f"""
+        UPDATE home_design_conversations
+        SET messages_jsonb = messages::jsonb
+        WHERE id IN (
+            SELECT id FROM home_design_conversations
+            WHERE messages_jsonb IS NULL
+            LIMIT {BATCH_SIZE}
+        )
+    """)
+    with op.get_context().autocommit_block():
+        if context.is_offline_mode():
+            # A script cannot loop over batches, so copy every row at once
+            op.execute(BACKFILL_REMAINING)
+        else:
+            connection = op.get_bind()
+            while connection.execute(backfill).rowcount:
+                pass
+
+    op.execute('DROP TRIGGER home_design_conversations_messages_jsonb ON home_design_conversations')
+    op.execute('DROP FUNCTION home_design_conversations_messages_jsonb()')
+    op.execute(BACKFILL_REMAINING)
+    op.drop_column('home_design_conversations', 'messages')
+    op.alter_column('home_design_conversations', 'messages_jsonb', new_column_name='messages', nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('home_design_conversations', 'messages',
+               existing_type=postgresql.JSONB(astext_type=sa.Text()),
+               type_=sa.JSON(),
+               existing_nullable=False,
+               postgresql_using='messages::json')
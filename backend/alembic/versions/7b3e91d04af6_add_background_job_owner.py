@@ -0,0 +1,28 @@
+"""add background job owner
+
+Revision ID: 7b3e91d04af6
+Revises: 10ee0bfb355a
+Create Date: 2025-09-25 15:06:31.204815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3e91d04af6'
+down_revision: Union[str, None] = '10ee0bfb355a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('background_jobs', sa.Column('user_id', sa.UUID(), nullable=True))
+    op.create_foreign_key('background_jobs_user_id_fkey', 'background_jobs', 'user', ['user_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('background_jobs_user_id_fkey', 'background_jobs', type_='foreignkey')
+    op.drop_column('background_jobs', 'user_id')
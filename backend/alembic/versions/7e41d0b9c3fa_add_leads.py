@@ -0,0 +1,34 @@
+"""add leads
+
+Revision ID: 7e41d0b9c3fa
+Revises: 5b9e13c8a2d6
+Create Date: 2025-09-15 11:08:27.361942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e41d0b9c3fa'
+down_revision: Union[str, None] = '5b9e13c8a2d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('leads',
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('baserow_row_id', sa.Integer(), nullable=False),
+    sa.Column('instagram_url', sa.String(), nullable=True),
+    sa.Column('synced_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('username')
+    )
+    op.create_index(op.f('ix_leads_baserow_row_id'), 'leads', ['baserow_row_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_leads_baserow_row_id'), table_name='leads')
+    op.drop_table('leads')
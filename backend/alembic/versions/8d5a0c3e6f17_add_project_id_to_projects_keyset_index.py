@@ -0,0 +1,33 @@
+"""add project id to projects keyset index
+
+Revision ID: 8d5a0c3e6f17
+Revises: 4c1f8e7a2d93
+Create Date: 2025-09-23 11:52:30.684019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d5a0c3e6f17'
+down_revision: Union[str, None] = '4c1f8e7a2d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The project listing pages by (updated_at, id); with id in the index each page
+# is a single index range scan. Built concurrently, as in e9a2d4c7b185.
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_home_design_projects_user_id_updated_at_id', 'home_design_projects', ['user_id', sa.text('updated_at DESC'), sa.text('id DESC')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_home_design_projects_user_id_updated_at', table_name='home_design_projects', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_home_design_projects_user_id_updated_at', 'home_design_projects', ['user_id', sa.text('updated_at DESC')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_home_design_projects_user_id_updated_at_id', table_name='home_design_projects', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,39 @@
+"""add invoices
+
+Revision ID: a81c5e0f2b64
+Revises: 3f2a9c41d7e8
+Create Date: 2025-09-09 14:03:52.771904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a81c5e0f2b64'
+down_revision: Union[str, None] = '3f2a9c41d7e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('invoices',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('customer_id', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('hosted_invoice_url', sa.String(), nullable=True),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('credits', sa.Integer(), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_invoices_customer_id_created', 'invoices', ['customer_id', sa.text('created DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_invoices_customer_id_created', table_name='invoices')
+    op.drop_table('invoices')
@@ -0,0 +1,36 @@
+"""store invoice created with time zone
+
+Revision ID: abcedac5c976
+Revises: 8d5a0c3e6f17
+Create Date: 2025-09-24 09:17:41.208356
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'abcedac5c976'
+down_revision: Union[str, None] = '8d5a0c3e6f17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Existing values were written as naive UTC
+
+
+def upgrade() -> None:
+    op.alter_column('invoices', 'created',
+               existing_type=sa.DateTime(),
+               type_=sa.DateTime(timezone=True),
+               existing_nullable=False,
+               postgresql_using="created AT TIME ZONE 'UTC'")
+
+
+def downgrade() -> None:
+    op.alter_column('invoices', 'created',
+               existing_type=sa.DateTime(timezone=True),
+               type_=sa.DateTime(),
+               existing_nullable=False,
+               postgresql_using="created AT TIME ZONE 'UTC'")
@@ -0,0 +1,31 @@
+"""add instagram analytics cache
+
+Revision ID: c4d7e2a9f150
+Revises: a81c5e0f2b64
+Create Date: 2025-09-11 09:47:05.118364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d7e2a9f150'
+down_revision: Union[str, None] = 'a81c5e0f2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('instagram_analytics_cache',
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('data', sa.JSON(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('username')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('instagram_analytics_cache')
@@ -0,0 +1,40 @@
+"""add hot path indexes
+
+Revision ID: e9a2d4c7b185
+Revises: b3c58f61e9d2
+Create Date: 2025-09-19 10:27:05.442193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9a2d4c7b185'
+down_revision: Union[str, None] = 'b3c58f61e9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction, so these run in an
+# autocommit block and leave the tables writable while the indexes build.
+# if_not_exists lets a rerun pass over indexes built before an interruption.
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_home_design_projects_user_id_updated_at', 'home_design_projects', ['user_id', sa.text('updated_at DESC')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_home_design_conversations_project_id_updated_at', 'home_design_conversations', ['project_id', sa.text('updated_at DESC')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_home_design_edits_project_id_created_at', 'home_design_edits', ['project_id', sa.text('created_at DESC')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index(op.f('ix_user_stripe_customer_id'), 'user', ['stripe_customer_id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index(op.f('ix_user_stripe_subscription_id'), 'user', ['stripe_subscription_id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_user_stripe_subscription_id'), table_name='user', postgresql_concurrently=True, if_exists=True)
+        op.drop_index(op.f('ix_user_stripe_customer_id'), table_name='user', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_home_design_edits_project_id_created_at', table_name='home_design_edits', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_home_design_conversations_project_id_updated_at', table_name='home_design_conversations', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_home_design_projects_user_id_updated_at', table_name='home_design_projects', postgresql_concurrently=True, if_exists=True)
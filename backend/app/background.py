@@ -0,0 +1,151 @@
+import asyncio
+import signal
+import threading
+from typing import Any, Awaitable, Callable, Coroutine, List, Set
+
+from fastapi import HTTPException
+
+
+class TaskTracker:
+    """Background work started by requests that shutdown waits for.
+
+    Unlike FastAPI's BackgroundTasks, a task runs outside the request that
+    started it, and the lifespan can stop new work and drain running work
+    before the worker exits instead of having it killed mid-flight.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.accepting = True
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def start(self):
+        self.accepting = True
+
+    def stop_accepting(self):
+        self.accepting = False
+
+    def require_accepting(self):
+        """Route dependency rejecting requests that would start new work"""
+        if not self.accepting:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is restarting, please try again",
+                headers={"Retry-After": "5"},
+            )
+
+    def spawn(self, coroutine: Coroutine) -> asyncio.Task:
+        if not self.accepting:
+            coroutine.close()
+        self.require_accepting()
+        return self.track(coroutine)
+
+    def track(self, coroutine: Coroutine) -> asyncio.Task:
+        """Run work that was already admitted, e.g. paid for before shutdown began"""
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+        return task
+
+    def _finished(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error in {self.name} task: {task.exception()}")
+
+    async def drain(self, timeout: float) -> int:
+        """Stop accepting work and wait up to timeout for running tasks.
+
+        Tasks still running at the deadline are cancelled. Returns how many
+        were cancelled.
+        """
+        self.stop_accepting()
+        if not self._tasks:
+            return 0
+
+        print(f"Waiting up to {timeout:.0f}s for {len(self._tasks)} {self.name} tasks")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            print(f"Cancelled {len(pending)} {self.name} tasks at shutdown")
+        return len(pending)
+
+
+class ShutdownSignal:
+    """Set as soon as the worker is told to stop.
+
+    uvicorn stops accepting connections on SIGTERM but runs the lifespan
+    shutdown only once every open connection has closed, so responses that
+    never end on their own (SSE streams) wait on this to finish early.
+    """
+
+    def __init__(self):
+        self._event = asyncio.Event()
+        self._callbacks: List[Callable[[], None]] = []
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Run callback (once) when shutdown starts"""
+        self._callbacks.append(callback)
+
+    def set(self):
+        if self._event.is_set():
+            return
+        self._event.set()
+        for callback in self._callbacks:
+            callback()
+
+    def install(self):
+        """Chain onto the server's SIGINT/SIGTERM handlers; call from the lifespan.
+
+        uvicorn restores its own handlers when it exits, removing these.
+        """
+        self._event.clear()
+        if threading.current_thread() is not threading.main_thread():
+            return
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous):
+                loop.call_soon_threadsafe(self.set)
+                previous(signum, frame)
+
+            signal.signal(sig, handler)
+
+    async def wait_for(self, awaitable: Awaitable, timeout: float) -> Any:
+        """asyncio.wait_for that also gives up once shutdown starts.
+
+        Returns None if shutdown started first.
+        """
+        result = asyncio.ensure_future(awaitable)
+        stopping = asyncio.ensure_future(self._event.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {result, stopping},
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            result.cancel()
+            stopping.cancel()
+        if result in done:
+            return result.result()
+        if stopping in done:
+            return None
+        raise asyncio.TimeoutError
+
+
+image_generations = TaskTracker("image generation")
+
+server_shutdown = ShutdownSignal()
+# Requests still in flight after SIGTERM must not start new generations
+server_shutdown.add_callback(image_generations.stop_accepting)
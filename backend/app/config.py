@@ -6,6 +6,23 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     TEST_DATABASE_URL: str
     EXPIRE_ON_COMMIT: bool = False
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 30.0
+    DATABASE_POOL_RECYCLE_SECONDS: int = 1800
+    DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_POOL_PREWARM: bool = True
+    # Prepared statements cached per connection; 0 when behind a pgbouncer
+    # in transaction mode
+    DATABASE_STATEMENT_CACHE_SIZE: int = 100
+    # Optional streaming replica for read-only routes
+    DATABASE_REPLICA_URL: str | None = None
+    # How long a user's reads stay on the primary after they write
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    # Log requests issuing more statements than this, or repeating one
+    # statement this many times
+    QUERY_LOG_THRESHOLD: int = 20
+    QUERY_REPEAT_THRESHOLD: int = 5
 
     # User
     ACCESS_SECRET_KEY: str
@@ -26,9 +43,47 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
     TEMPLATE_DIR: str = "email_templates"
+    MAIL_POOL_SIZE: int = 2
+    MAIL_TIMEOUT_SECONDS: float = 30.0
+
+    # Response compression (brotli, else gzip) for bodies of at least this size
+    COMPRESSION_MINIMUM_SIZE: int = 1000
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Outbound HTTP
+    HTTP_TIMEOUT_SECONDS: float = 30.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_RETRY_BACKOFF_SECONDS: float = 0.5
+    HTTP_RETRY_MAX_BACKOFF_SECONDS: float = 30.0
+
+    # Outbox
+    OUTBOX_POLL_SECONDS: float = 5.0
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_LEASE_SECONDS: int = 60
+    OUTBOX_RETRY_BACKOFF_SECONDS: float = 5.0
+    OUTBOX_RETRY_MAX_BACKOFF_SECONDS: float = 3600.0
+
+    # Background jobs
+    JOB_POLL_SECONDS: float = 30.0
+    JOB_HEARTBEAT_SECONDS: float = 15.0
+    JOB_STALE_SECONDS: int = 60
+
+    # How long shutdown waits for running image generations before cancelling
+    # them; gunicorn's graceful_timeout must also cover in-flight requests
+    GENERATION_DRAIN_SECONDS: float = 45.0
 
     # Baserow
     BASEROW_API_TOKEN: str
+    LEAD_ENRICHMENT_CONCURRENCY: int = 10
+    INSTAGRAM_ANALYTICS_TTL_SECONDS: int = 7 * 24 * 3600
+    INSTAGRAM_ANALYTICS_NEGATIVE_TTL_SECONDS: int = 15 * 60
+    LEAD_SYNC_INTERVAL_SECONDS: int = 3600
+    LEAD_IMPORT_MAX_URLS: int = 5000
 
     # Fal
     FAL_KEY: str
@@ -42,10 +97,16 @@ class Settings(BaseSettings):
     # S3
     S3_AWS_ACCESS_KEY_ID: str
     S3_AWS_SECRET_ACCESS_KEY: str
+    S3_MAX_POOL_CONNECTIONS: int = 50
 
     # Stripe
     STRIPE_SECRET_KEY: str
     STRIPE_WEBHOOK_SECRET: str
+    STRIPE_EVENT_POLL_SECONDS: float = 5.0
+    STRIPE_EVENT_BATCH_SIZE: int = 50
+    STRIPE_EVENT_MAX_ATTEMPTS: int = 10
+    STRIPE_EVENT_RETRY_BACKOFF_SECONDS: float = 5.0
+    STRIPE_EVENT_RETRY_MAX_BACKOFF_SECONDS: float = 3600.0
 
     # Google
     GOOGLE_OAUTH_CLIENT_ID: str
@@ -53,6 +114,8 @@ class Settings(BaseSettings):
 
     # Loops
     LOOPS_API_KEY: str
+    LOOPS_REQUESTS_PER_SECOND: float = 10.0
+    LOOPS_CONCURRENCY: int = 5
 
     # Claude
     CLAUDE_API_KEY: str
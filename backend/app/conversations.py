@@ -0,0 +1,60 @@
+from typing import Any, Dict, List
+from uuid import UUID
+
+from sqlalchemy import func, literal, text, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import HomeDesignConversation
+
+# Sets image_url on the last assistant message, located inside Postgres. The
+# containment check skips conversations without one, where the path is NULL.
+ATTACH_IMAGE_SQL = text("""
+    UPDATE home_design_conversations
+    SET messages = jsonb_set(
+            messages,
+            ARRAY[
+                (
+                    SELECT max(position) - 1
+                    FROM jsonb_array_elements(messages)
+                        WITH ORDINALITY AS message(value, position)
+                    WHERE message.value->>'role' = 'assistant'
+                )::text,
+                'image_url'
+            ],
+            to_jsonb(CAST(:image_url AS text))
+        ),
+        updated_at = now()
+    WHERE id = :conversation_id
+      AND messages @> '[{"role": "assistant"}]'
+    """)
+
+
+async def append_conversation_messages(
+    db: AsyncSession, conversation_id: UUID | str, messages: List[Dict[str, Any]]
+) -> bool:
+    """Append messages with a single UPDATE, without reading the array first.
+
+    Returns False when the conversation does not exist. The caller commits.
+    """
+    result = await db.execute(
+        update(HomeDesignConversation)
+        .where(HomeDesignConversation.id == conversation_id)
+        .values(
+            messages=HomeDesignConversation.messages.op("||")(literal(messages, JSONB)),
+            updated_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+async def attach_image_to_last_assistant_message(
+    db: AsyncSession, conversation_id: UUID | str, image_url: str
+) -> bool:
+    """Set image_url on the conversation's last assistant message. The caller commits."""
+    result = await db.execute(
+        ATTACH_IMAGE_SQL,
+        {"conversation_id": str(conversation_id), "image_url": image_url},
+    )
+    return result.rowcount > 0
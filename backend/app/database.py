@@ -1,18 +1,170 @@
-from typing import AsyncGenerator
+import asyncio
+import math
+import time
+from typing import Any, AsyncGenerator, Dict, Optional
 
-from fastapi import Depends
+import jwt
+from fastapi import Depends, Request
 from fastapi_users.db import SQLAlchemyUserDatabase
+from fastapi_users.jwt import decode_jwt, generate_jwt
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from .config import settings
 from .models import Base, User, OAuthAccount
+from .query_stats import instrument_engine
 
-engine = create_async_engine(settings.DATABASE_URL)
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_wait_seconds_total = 0.0
+        self.checkout_wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.checkout_wait_seconds_total += waited
+            self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, waited)
+
+
+def create_engine(url: str):
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        connect_args={
+            # SQLAlchemy's asyncpg adapter keeps its own prepared statement cache
+            "prepared_statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+        },
+    )
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+engine = create_engine(settings.DATABASE_URL)
 
 async_session_maker = async_sessionmaker(
     engine, expire_on_commit=settings.EXPIRE_ON_COMMIT
 )
 
+read_engine = (
+    create_engine(settings.DATABASE_REPLICA_URL)
+    if settings.DATABASE_REPLICA_URL
+    else engine
+)
+
+read_session_maker = async_sessionmaker(
+    read_engine, expire_on_commit=settings.EXPIRE_ON_COMMIT
+)
+
+# Signed cookie telling any worker that the user wrote recently; it expires
+# when their reads may go back to the replica
+RECENT_WRITE_COOKIE = "recent_write"
+RECENT_WRITE_AUDIENCE = ["homeideasai:recent-write"]
+
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def get_request_subject(request: Request) -> Optional[str]:
+    """User id from the request's bearer token, without touching the database"""
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        data = decode_jwt(token, settings.ACCESS_SECRET_KEY, ["fastapi-users:auth"])
+    except jwt.PyJWTError:
+        return None
+    return data.get("sub")
+
+
+def recent_write_token(subject: str) -> str:
+    return generate_jwt(
+        {"sub": subject, "aud": RECENT_WRITE_AUDIENCE},
+        settings.ACCESS_SECRET_KEY,
+        lifetime_seconds=settings.READ_YOUR_WRITES_SECONDS,
+    )
+
+
+def wrote_recently(request: Request, subject: Optional[str]) -> bool:
+    token = request.cookies.get(RECENT_WRITE_COOKIE)
+    if not subject or not token:
+        return False
+    try:
+        data = decode_jwt(token, settings.ACCESS_SECRET_KEY, RECENT_WRITE_AUDIENCE)
+    except jwt.PyJWTError:
+        return False
+    return data.get("sub") == subject
+
+
+async def track_writes(request: Request, call_next):
+    """Middleware marking users whose requests changed data with a cookie"""
+    response = await call_next(request)
+    if (
+        read_engine is not engine
+        and request.method in UNSAFE_METHODS
+        and response.status_code < 400
+    ):
+        subject = get_request_subject(request)
+        if subject:
+            response.set_cookie(
+                RECENT_WRITE_COOKIE,
+                recent_write_token(subject),
+                max_age=math.ceil(settings.READ_YOUR_WRITES_SECONDS),
+                httponly=True,
+                secure=True,
+                samesite="none",
+            )
+    return response
+
+
+async def prewarm_pool():
+    """Open pool_size connections up front so the first requests don't connect.
+
+    The replica engine, when there is one, is warmed as well.
+    """
+    engines = [engine] if read_engine is engine else [engine, read_engine]
+    connections = await asyncio.gather(
+        *(
+            pooled.connect().start()
+            for pooled in engines
+            for _ in range(settings.DATABASE_POOL_SIZE)
+        ),
+        return_exceptions=True,
+    )
+    for connection in connections:
+        if isinstance(connection, Exception):
+            print(f"Error pre-warming database pool: {connection}")
+        else:
+            await connection.close()
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "checkouts": pool.checkouts,
+        "checkout_wait_seconds_total": round(pool.checkout_wait_seconds_total, 6),
+        "checkout_wait_seconds_max": round(pool.checkout_wait_seconds_max, 6),
+    }
+
 
 async def create_db_and_tables():
     async with engine.begin() as conn:
@@ -24,6 +176,18 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only routes: the replica, unless the user just wrote"""
+    if read_engine is not engine and wrote_recently(
+        request, get_request_subject(request)
+    ):
+        maker = async_session_maker
+    else:
+        maker = read_session_maker
+    async with maker() as session:
+        yield session
+
+
 def get_async_session_context():
     """Get async session context manager for use in background tasks and other contexts"""
     return async_session_maker
@@ -1,60 +1,188 @@
-from pathlib import Path
+import asyncio
 import urllib.parse
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from email.utils import formataddr
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
 from .config import settings
 from .models import User
+from .outbox import enqueue_message, outbox_dispatcher, register_outbox_handler
+
+EMAIL_TOPIC = "email"
+AUTH_EMAIL_TOPIC = "auth_email"
+
+RESET_PASSWORD_EMAIL = "reset_password"
+VERIFICATION_EMAIL = "verify"
+
+TEMPLATE_FOLDER = Path(__file__).parent / settings.TEMPLATE_DIR
+
+email_templates = Environment(
+    loader=FileSystemLoader(TEMPLATE_FOLDER),
+    autoescape=select_autoescape(["html"]),
+)
+
+
+def load_email_templates():
+    """Compile every template up front; Jinja keeps the compiled versions"""
+    for name in email_templates.list_templates(extensions=["html"]):
+        email_templates.get_template(name)
 
 
-def get_email_config():
-    conf = ConnectionConfig(
-        MAIL_USERNAME=settings.MAIL_USERNAME,
-        MAIL_PASSWORD=settings.MAIL_PASSWORD,
-        MAIL_FROM=settings.MAIL_FROM,
-        MAIL_PORT=settings.MAIL_PORT,
-        MAIL_SERVER=settings.MAIL_SERVER,
-        MAIL_FROM_NAME=settings.MAIL_FROM_NAME,
-        MAIL_STARTTLS=settings.MAIL_STARTTLS,
-        MAIL_SSL_TLS=settings.MAIL_SSL_TLS,
-        USE_CREDENTIALS=settings.USE_CREDENTIALS,
-        VALIDATE_CERTS=settings.VALIDATE_CERTS,
-        TEMPLATE_FOLDER=Path(__file__).parent / settings.TEMPLATE_DIR,
+def build_email_message(
+    to: str, subject: str, reply_to: str, template: str, context: Dict[str, Any]
+) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    message["To"] = to
+    message["Reply-To"] = reply_to
+    message["Subject"] = subject
+    message.set_content(
+        email_templates.get_template(template).render(**context), subtype="html"
     )
-    return conf
+    return message
+
+
+class SMTPPool:
+    """Long-lived SMTP connections shared by the senders in this worker.
+
+    Connections are opened (with STARTTLS and login) on first use and reused
+    afterwards; one that the server has dropped is reopened once.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._idle: Optional[asyncio.Queue] = None
+        self._connections: List[aiosmtplib.SMTP] = []
+
+    def _create_connection(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=settings.MAIL_SERVER,
+            port=settings.MAIL_PORT,
+            username=settings.MAIL_USERNAME if settings.USE_CREDENTIALS else None,
+            password=settings.MAIL_PASSWORD if settings.USE_CREDENTIALS else None,
+            use_tls=settings.MAIL_SSL_TLS,
+            start_tls=settings.MAIL_STARTTLS,
+            validate_certs=settings.VALIDATE_CERTS,
+            timeout=settings.MAIL_TIMEOUT_SECONDS,
+        )
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self._size):
+                connection = self._create_connection()
+                self._connections.append(connection)
+                self._idle.put_nowait(connection)
+
+        connection = await self._idle.get()
+        try:
+            if not connection.is_connected:
+                await connection.connect()
+            yield connection
+        finally:
+            self._idle.put_nowait(connection)
+
+    async def send(self, message: EmailMessage):
+        async with self.connection() as connection:
+            try:
+                await connection.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                connection.close()
+                await connection.connect()
+                await connection.send_message(message)
 
+    async def close(self):
+        for connection in self._connections:
+            if connection.is_connected:
+                try:
+                    await connection.quit()
+                except aiosmtplib.SMTPException:
+                    connection.close()
+        self._connections = []
+        self._idle = None
 
-async def send_reset_password_email(user: User, token: str):
-    conf = get_email_config()
-    email = user.email
+
+smtp_pool = SMTPPool(settings.MAIL_POOL_SIZE)
+
+
+@register_outbox_handler(EMAIL_TOPIC)
+async def deliver_email(payload: Dict[str, Any], message_id: int):
+    await smtp_pool.send(build_email_message(**payload))
+
+
+async def queue_email(
+    db: AsyncSession,
+    to: str,
+    subject: str,
+    reply_to: str,
+    template: str,
+    context: Dict[str, Any],
+):
+    """Store an email in the outbox and wake the sender; SMTP happens later"""
+    enqueue_message(
+        db,
+        EMAIL_TOPIC,
+        {
+            "to": to,
+            "subject": subject,
+            "reply_to": reply_to,
+            "template": template,
+            "context": context,
+        },
+    )
+    await db.commit()
+    outbox_dispatcher.notify()
+
+
+def reset_password_message(user: User, token: str) -> EmailMessage:
     base_url = f"{settings.FRONTEND_URL}/password-recovery/confirm?"
     params = {"token": token}
     encoded_params = urllib.parse.urlencode(params)
     link = f"{base_url}{encoded_params}"
-    message = MessageSchema(
+    return build_email_message(
+        to=user.email,
         subject="Password recovery - HomeIdeasAI",
-        recipients=[email],
-        reply_to=["howdyrohan@gmail.com"],
-        template_body={"username": email, "link": link},
-        subtype=MessageType.html,
+        reply_to="howdyrohan@gmail.com",
+        template="password_reset.html",
+        context={"username": user.email, "link": link},
     )
 
-    fm = FastMail(conf)
-    await fm.send_message(message, template_name="password_reset.html")
 
-
-async def send_verification_email(user: User, token: str):
-    conf = get_email_config()
-    email = user.email
+def verification_message(user: User, token: str) -> EmailMessage:
     base_url = f"{settings.FRONTEND_URL}/verify-email?"
     params = {"token": token}
     encoded_params = urllib.parse.urlencode(params)
     link = f"{base_url}{encoded_params}"
-    message = MessageSchema(
+    return build_email_message(
+        to=user.email,
         subject="Verify your email - HomeIdeasAI",
-        recipients=[email],
-        reply_to=["rohan@homeideasai.com"],
-        template_body={"username": email, "link": link},
-        subtype=MessageType.html,
+        reply_to="rohan@homeideasai.com",
+        template="verify_email.html",
+        context={"username": user.email, "link": link},
     )
-    fm = FastMail(conf)
-    await fm.send_message(message, template_name="verify_email.html")
+
+
+async def queue_auth_email(db: AsyncSession, user: User, kind: str):
+    """Store a token email in the outbox by user id only.
+
+    The token is minted by the AUTH_EMAIL_TOPIC handler when the email is
+    sent, so it never sits in the outbox table.
+    """
+    enqueue_message(db, AUTH_EMAIL_TOPIC, {"kind": kind, "user_id": str(user.id)})
+    await db.commit()
+    outbox_dispatcher.notify()
+
+
+async def send_reset_password_email(db: AsyncSession, user: User):
+    await queue_auth_email(db, user, RESET_PASSWORD_EMAIL)
+
+
+async def send_verification_email(db: AsyncSession, user: User):
+    await queue_auth_email(db, user, VERIFICATION_EMAIL)
@@ -0,0 +1,136 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+from .config import settings
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# POST creates rows, so only retry it when the server says it did nothing (429)
+NON_IDEMPOTENT_METHODS = {"POST"}
+
+
+def get_retry_after(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """Transport that retries 429 and 5xx responses, honoring Retry-After"""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        max_retries: int,
+        backoff_seconds: float,
+        max_backoff_seconds: float,
+    ):
+        self._transport = transport
+        self._max_retries = max_retries
+        self._backoff_seconds = backoff_seconds
+        self._max_backoff_seconds = max_backoff_seconds
+
+    def _should_retry(self, request: httpx.Request, response: httpx.Response) -> bool:
+        if response.status_code == 429:
+            return True
+        return (
+            response.status_code in RETRY_STATUS_CODES
+            and request.method not in NON_IDEMPOTENT_METHODS
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            response = await self._transport.handle_async_request(request)
+            if attempt >= self._max_retries or not self._should_retry(
+                request, response
+            ):
+                return response
+
+            delay = get_retry_after(response)
+            if delay is None:
+                delay = self._backoff_seconds * 2**attempt * (0.5 + random.random())
+            delay = min(delay, self._max_backoff_seconds)
+
+            await response.aclose()
+            attempt += 1
+            print(
+                f"Retrying {request.method} {request.url.host} after "
+                f"{response.status_code} (attempt {attempt}, waiting {delay:.1f}s)"
+            )
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class RateLimiter:
+    """Spaces calls out to at most `rate` per second across concurrent callers"""
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate
+        self._next_at = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        delay = self._next_at - now
+        self._next_at = max(now, self._next_at) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    transport = RetryTransport(
+        httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        ),
+        max_retries=settings.HTTP_MAX_RETRIES,
+        backoff_seconds=settings.HTTP_RETRY_BACKOFF_SECONDS,
+        max_backoff_seconds=settings.HTTP_RETRY_MAX_BACKOFF_SECONDS,
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(
+            settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS
+        ),
+    )
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared pooled client for outbound HTTP calls.
+
+    Created by the application lifespan; created lazily when used outside of it
+    (tests, commands).
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
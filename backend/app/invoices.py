@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import StripeInvoice
+
+
+def invoice_values(invoice: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a Stripe invoice object to a row of the local invoices table"""
+    lines = (invoice.get("lines") or {}).get("data") or []
+    return {
+        "id": invoice["id"],
+        "customer_id": invoice["customer"],
+        "status": invoice.get("status"),
+        "hosted_invoice_url": invoice.get("hosted_invoice_url"),
+        "total": invoice.get("total") or 0,
+        "currency": invoice.get("currency"),
+        "credits": sum(line.get("quantity") or 0 for line in lines),
+        "created": datetime.fromtimestamp(invoice["created"], tz=timezone.utc),
+    }
+
+
+async def upsert_invoices(db: AsyncSession, invoices: Iterable[Dict[str, Any]]):
+    """Insert or refresh invoices in one statement. The caller commits."""
+    rows = [invoice_values(invoice) for invoice in invoices]
+    if not rows:
+        return
+
+    stmt = insert(StripeInvoice).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StripeInvoice.id],
+        set_={
+            "status": stmt.excluded.status,
+            "hosted_invoice_url": stmt.excluded.hosted_invoice_url,
+            "total": stmt.excluded.total,
+            "currency": stmt.excluded.currency,
+            "credits": stmt.excluded.credits,
+            "updated_at": datetime.utcnow(),
+        },
+    )
+    await db.execute(stmt)
+
+
+async def delete_invoice(db: AsyncSession, invoice_id: str):
+    await db.execute(delete(StripeInvoice).where(StripeInvoice.id == invoice_id))
@@ -0,0 +1,257 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import func, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .config import settings
+from .database import async_session_maker
+from .models import BackgroundJob
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class JobContext:
+    """Handed to a job handler: its parameters, where to resume, and a way to save progress"""
+
+    def __init__(
+        self,
+        job_id: UUID,
+        params: Dict[str, Any],
+        checkpoint: Optional[Dict[str, Any]],
+        session_maker: async_sessionmaker,
+        progress: Optional[Dict[str, Any]] = None,
+    ):
+        self.job_id = job_id
+        self.params = params
+        self.checkpoint = checkpoint or {}
+        self.progress = progress or {}
+        self._session_maker = session_maker
+
+    async def save_progress(
+        self,
+        checkpoint: Optional[Dict[str, Any]],
+        progress: Optional[Dict[str, Any]] = None,
+    ):
+        """Persist the checkpoint a restarted run should resume from.
+
+        With checkpoint None the stored checkpoint is left as it is, so a large
+        one is written once while progress keeps being updated.
+        """
+        values = {"heartbeat_at": datetime.utcnow()}
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+            values["checkpoint"] = checkpoint
+        if progress is not None:
+            self.progress = progress
+            values["progress"] = progress
+        async with self._session_maker() as db:
+            await db.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id == self.job_id)
+                .values(**values)
+            )
+            await db.commit()
+
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[Dict[str, Any]]]]
+
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+# Kinds started automatically, with the seconds between consecutive runs
+JOB_SCHEDULES: Dict[str, float] = {}
+
+
+def register_job(kind: str, every_seconds: Optional[float] = None):
+    """Register the handler that runs jobs of the given kind.
+
+    With every_seconds, the job runner also starts a job of this kind whenever
+    none was created within that many seconds.
+    """
+
+    def decorator(handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = handler
+        if every_seconds is not None:
+            JOB_SCHEDULES[kind] = every_seconds
+        return handler
+
+    return decorator
+
+
+async def create_job(
+    db: AsyncSession,
+    kind: str,
+    params: Optional[Dict[str, Any]] = None,
+    user_id: Optional[UUID] = None,
+) -> BackgroundJob:
+    """Create a job, or return the active job of the same kind and params"""
+    params = params or {}
+    result = await db.execute(
+        select(BackgroundJob).where(
+            BackgroundJob.kind == kind, BackgroundJob.status.in_(ACTIVE_STATUSES)
+        )
+    )
+    for job in result.scalars().all():
+        if job.params == params:
+            return job
+
+    job = BackgroundJob(kind=kind, status="pending", params=params, user_id=user_id)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    job_runner.launch(job.id)
+    return job
+
+
+def _stale_before() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+
+
+def _claimable():
+    """Pending jobs, and running jobs whose worker stopped sending heartbeats"""
+    return or_(
+        BackgroundJob.status == "pending",
+        (BackgroundJob.status == "running")
+        & (BackgroundJob.heartbeat_at < _stale_before()),
+    )
+
+
+async def run_job(
+    job_id: UUID, session_maker: async_sessionmaker = async_session_maker
+):
+    """Claim a job and run its handler, resuming from the stored checkpoint"""
+    async with session_maker() as db:
+        result = await db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, _claimable())
+            .values(status="running", heartbeat_at=datetime.utcnow(), error=None)
+            .returning(
+                BackgroundJob.kind,
+                BackgroundJob.params,
+                BackgroundJob.checkpoint,
+                BackgroundJob.progress,
+            )
+        )
+        claimed = result.first()
+        await db.commit()
+
+    if claimed is None:
+        # Finished, or another worker is running it
+        return
+
+    kind, params, checkpoint, progress = claimed
+    handler = JOB_HANDLERS.get(kind)
+    context = JobContext(job_id, params, checkpoint, session_maker, progress)
+    heartbeat = asyncio.create_task(_send_heartbeats(job_id, session_maker))
+
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job kind {kind}")
+        job_result = await handler(context)
+        values = {"status": "completed", "result": job_result}
+    except asyncio.CancelledError:
+        # Shutting down: leave the job running so it is resumed once stale
+        raise
+    except Exception as e:
+        print(f"Error running {kind} job {job_id}: {e}")
+        values = {"status": "failed", "error": str(e)}
+    finally:
+        heartbeat.cancel()
+
+    async with session_maker() as db:
+        await db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id)
+            .values(finished_at=datetime.utcnow(), **values)
+        )
+        await db.commit()
+
+
+async def _send_heartbeats(job_id: UUID, session_maker: async_sessionmaker):
+    while True:
+        await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+        try:
+            async with session_maker() as db:
+                await db.execute(
+                    update(BackgroundJob)
+                    .where(BackgroundJob.id == job_id)
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"Error sending heartbeat for job {job_id}: {e}")
+
+
+async def _create_scheduled_jobs(db: AsyncSession):
+    for kind, every_seconds in JOB_SCHEDULES.items():
+        # Every worker polls; the lock lets only one of them check and create
+        # the job at a time. It is held until create_job commits.
+        locked = await db.scalar(
+            text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"),
+            {"key": f"scheduled_job:{kind}"},
+        )
+        if not locked:
+            continue
+
+        # Compared on the database clock, which also sets created_at
+        recent = await db.scalar(
+            select(BackgroundJob.id)
+            .where(
+                BackgroundJob.kind == kind,
+                BackgroundJob.created_at
+                > func.now() - timedelta(seconds=every_seconds),
+            )
+            .limit(1)
+        )
+        if recent is None:
+            await create_job(db, kind)
+        else:
+            await db.rollback()
+
+
+class JobRunner:
+    """Runs jobs in this worker and picks up jobs interrupted elsewhere"""
+
+    def __init__(self):
+        self._tasks: Dict[UUID, asyncio.Task] = {}
+        self._poller: Optional[asyncio.Task] = None
+
+    def launch(self, job_id: UUID):
+        if job_id in self._tasks:
+            return
+        task = asyncio.create_task(run_job(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    def start(self):
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        if self._poller is not None:
+            tasks.append(self._poller)
+            self._poller = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _poll(self):
+        while True:
+            try:
+                async with async_session_maker() as db:
+                    await _create_scheduled_jobs(db)
+                    result = await db.execute(
+                        select(BackgroundJob.id).where(_claimable())
+                    )
+                    job_ids = result.scalars().all()
+                for job_id in job_ids:
+                    self.launch(job_id)
+            except Exception as e:
+                print(f"Error polling background jobs: {e}")
+            await asyncio.sleep(settings.JOB_POLL_SECONDS)
+
+
+job_runner = JobRunner()
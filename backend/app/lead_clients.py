@@ -0,0 +1,290 @@
+import asyncio
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import HTTPException
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .config import settings
+from .database import async_session_maker
+from .http_client import get_http_client
+from .metrics import observe_dependency
+from .models import InstagramAnalyticsCache
+
+BASEROW_API_URL = "https://api.baserow.io/api/database/rows/table"
+INSTAGRAM_ANALYTICS_URL = "https://api.usetevy.com/instagram-analytics"
+
+# Baserow accepts at most 200 rows per list page and per batch request
+BASEROW_MAX_BATCH_SIZE = 200
+
+EMAIL_PATTERN = re.compile(r"[\w\.-]+@[\w\.-]+")
+
+
+def extract_instagram_username(value: str) -> str:
+    """Extract the username from an Instagram profile URL or @handle"""
+    value = (value or "").strip()
+    if value.startswith("@"):
+        value = value[1:]
+    return value.rstrip("/").split("/")[-1].split("?")[0]
+
+
+def normalize_instagram_username(username: str) -> str:
+    return username.strip().lstrip("@").lower()
+
+
+def normalize_instagram_url(url: str) -> str:
+    """Canonical form of an Instagram profile URL used to detect duplicate rows"""
+    return url.rstrip("/").replace(
+        "https://instagram.com/", "https://www.instagram.com/"
+    )
+
+
+def build_profile_fields(analytics_data: dict, default_name: str = "") -> dict:
+    """Map Instagram analytics to the Baserow lead columns"""
+    bio = analytics_data.get("biography", "") or ""
+    email_match = EMAIL_PATTERN.search(bio)
+    return {
+        "Name": analytics_data.get("name", default_name),
+        "Followers": analytics_data.get("followers_count", 0),
+        "Following": analytics_data.get("follows_count", 0),
+        "Bio": analytics_data.get("biography", ""),
+        "Media Count": analytics_data.get("media_count", 0),
+        "Engagement Rate": round(analytics_data.get("engagement_rate", 0.0), 4),
+        "Instagram Profile Website": analytics_data.get("website", ""),
+        "Contact Email": email_match.group(0) if email_match else "",
+    }
+
+
+class BaserowClient:
+    """Thin async wrapper over the Baserow rows API.
+
+    Failed calls raise HTTPException with Baserow's status code, like the
+    routes did when they called Baserow directly.
+    """
+
+    def __init__(self, http: httpx.AsyncClient, token: str):
+        self._http = http
+        self._headers = {
+            "Authorization": f"Token {token}",
+            "Content-Type": "application/json",
+        }
+
+    async def _request(
+        self, method: str, url: str, detail: str, expected_status: int = 200, **kwargs
+    ) -> httpx.Response:
+        with observe_dependency("baserow"):
+            response = await self._http.request(
+                method, url, headers=self._headers, **kwargs
+            )
+        if response.status_code != expected_status:
+            print(response.text)
+            raise HTTPException(status_code=response.status_code, detail=detail)
+        return response
+
+    async def list_rows(
+        self,
+        table_id: str,
+        page: int = 1,
+        search: Optional[str] = None,
+        size: Optional[int] = None,
+        order_by: Optional[str] = None,
+        after_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        params = {"user_field_names": "true", "page": page}
+        if size:
+            params["size"] = size
+        if order_by:
+            params["order_by"] = order_by
+        if after_id is not None:
+            params["filter__id__higher_than"] = after_id
+        if search:
+            params["search"] = search
+        response = await self._request(
+            "GET",
+            f"{BASEROW_API_URL}/{table_id}/",
+            "Failed to fetch rows from Baserow",
+            params=params,
+        )
+        return response.json()
+
+    async def create_row(self, table_id: str, fields: dict) -> Dict[str, Any]:
+        response = await self._request(
+            "POST",
+            f"{BASEROW_API_URL}/{table_id}/",
+            "Failed to create new row",
+            params={"user_field_names": "true"},
+            json=fields,
+        )
+        return response.json()
+
+    async def update_row(self, table_id: str, row_id: int, fields: dict) -> dict:
+        response = await self._request(
+            "PATCH",
+            f"{BASEROW_API_URL}/{table_id}/{row_id}/",
+            "Failed to update row",
+            params={"user_field_names": "true"},
+            json=fields,
+        )
+        return response.json()
+
+    async def batch_create_rows(self, table_id: str, items: List[dict]) -> List[dict]:
+        """Create rows in requests of up to 200 rows, returning them in order"""
+        created = []
+        for start in range(0, len(items), BASEROW_MAX_BATCH_SIZE):
+            response = await self._request(
+                "POST",
+                f"{BASEROW_API_URL}/{table_id}/batch/",
+                "Failed to batch create rows",
+                params={"user_field_names": "true"},
+                json={"items": items[start : start + BASEROW_MAX_BATCH_SIZE]},
+            )
+            created.extend(response.json().get("items", []))
+        return created
+
+    async def batch_update_rows(self, table_id: str, items: List[dict]) -> List[dict]:
+        """Update rows (each item carries its "id") in requests of up to 200 rows"""
+        updated = []
+        for start in range(0, len(items), BASEROW_MAX_BATCH_SIZE):
+            response = await self._request(
+                "PATCH",
+                f"{BASEROW_API_URL}/{table_id}/batch/",
+                "Failed to batch update rows",
+                params={"user_field_names": "true"},
+                json={"items": items[start : start + BASEROW_MAX_BATCH_SIZE]},
+            )
+            updated.extend(response.json().get("items", []))
+        return updated
+
+    async def batch_delete_rows(self, table_id: str, row_ids: List[int]):
+        """Delete rows in requests of up to 200 rows"""
+        for start in range(0, len(row_ids), BASEROW_MAX_BATCH_SIZE):
+            await self._request(
+                "POST",
+                f"{BASEROW_API_URL}/{table_id}/batch-delete/",
+                "Failed to batch delete rows",
+                expected_status=204,
+                json={"items": row_ids[start : start + BASEROW_MAX_BATCH_SIZE]},
+            )
+
+    async def delete_row(self, table_id: str, row_id: int):
+        await self._request(
+            "DELETE",
+            f"{BASEROW_API_URL}/{table_id}/{row_id}/",
+            "Failed to delete row",
+            expected_status=204,
+        )
+
+
+class InstagramAnalyticsClient:
+    def __init__(self, http: httpx.AsyncClient):
+        self._http = http
+
+    async def fetch(self, username: str) -> Optional[dict]:
+        """Fetch profile analytics, returning None when the profile is not found.
+
+        Other failures (rate limiting, server errors once retries run out)
+        raise HTTPException, so they are not mistaken for a missing profile.
+        """
+        response = await self._http.get(
+            f"{INSTAGRAM_ANALYTICS_URL}/{username}",
+            headers={"Content-Type": "application/json"},
+        )
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            print(response.text)
+            raise HTTPException(
+                status_code=response.status_code,
+                detail="Failed to fetch Instagram analytics",
+            )
+        return response.json()
+
+
+class CachedInstagramAnalyticsClient:
+    """Instagram analytics backed by the instagram_analytics_cache table.
+
+    Fresh entries are served from the database. Stale entries are served
+    immediately while a background task refreshes them, and missing profiles
+    are cached for a short time so they are not requested repeatedly. A
+    lookup that fails for another reason (an error response, a timeout or a
+    connection error) leaves the cache as it was.
+    """
+
+    # Refreshes in flight in this worker, so a username is refreshed only once
+    _refreshing: Dict[str, asyncio.Task] = {}
+
+    def __init__(
+        self,
+        client: InstagramAnalyticsClient,
+        session_maker: async_sessionmaker = async_session_maker,
+    ):
+        self._client = client
+        self._session_maker = session_maker
+
+    async def fetch(self, username: str) -> Optional[dict]:
+        key = normalize_instagram_username(username)
+        async with self._session_maker() as db:
+            entry = await db.get(InstagramAnalyticsCache, key)
+
+        if entry is not None:
+            age = datetime.utcnow() - entry.fetched_at
+            if entry.data is None:
+                if age < timedelta(
+                    seconds=settings.INSTAGRAM_ANALYTICS_NEGATIVE_TTL_SECONDS
+                ):
+                    return None
+            else:
+                if age >= timedelta(seconds=settings.INSTAGRAM_ANALYTICS_TTL_SECONDS):
+                    self._refresh_in_background(key)
+                return entry.data
+
+        try:
+            return await self._refresh(key)
+        except HTTPException as e:
+            print(f"Error fetching Instagram analytics for {key}: {e.detail}")
+        except httpx.HTTPError as e:
+            print(f"Error fetching Instagram analytics for {key}: {e!r}")
+        # Nothing usable was cached (stale data is served above)
+        return None
+
+    async def _refresh(self, key: str) -> Optional[dict]:
+        data = await self._client.fetch(key)
+        async with self._session_maker() as db:
+            stmt = insert(InstagramAnalyticsCache).values(
+                username=key, data=data, fetched_at=datetime.utcnow()
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[InstagramAnalyticsCache.username],
+                set_={
+                    "data": stmt.excluded.data,
+                    "fetched_at": stmt.excluded.fetched_at,
+                },
+            )
+            await db.execute(stmt)
+            await db.commit()
+        return data
+
+    def _refresh_in_background(self, key: str):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self._refresh(key)
+            except Exception as e:
+                print(f"Error refreshing Instagram analytics for {key}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+
+def get_baserow_client() -> BaserowClient:
+    return BaserowClient(get_http_client(), settings.BASEROW_API_TOKEN)
+
+
+def get_instagram_client() -> CachedInstagramAnalyticsClient:
+    return CachedInstagramAnalyticsClient(InstagramAnalyticsClient(get_http_client()))
@@ -0,0 +1,155 @@
+import asyncio
+import csv
+import io
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .config import settings
+from .database import async_session_maker
+from .lead_clients import (
+    BASEROW_MAX_BATCH_SIZE,
+    BaserowClient,
+    CachedInstagramAnalyticsClient,
+    build_profile_fields,
+    extract_instagram_username,
+    normalize_instagram_username,
+)
+from .leads import get_lead_row_ids, upsert_leads
+
+# CSV header names recognized as the column holding the URLs
+CSV_URL_COLUMNS = {"instagram_url", "instagram page", "instagram", "url"}
+
+
+def parse_csv_urls(content: bytes) -> List[str]:
+    """Read Instagram URLs from a CSV upload.
+
+    Uses the column with a recognized header when there is one, and the first
+    column otherwise.
+    """
+    rows = list(csv.reader(io.StringIO(content.decode("utf-8-sig"))))
+    if not rows:
+        return []
+
+    column = 0
+    header = [cell.strip().lower() for cell in rows[0]]
+    for index, name in enumerate(header):
+        if name in CSV_URL_COLUMNS:
+            column = index
+            rows = rows[1:]
+            break
+
+    return [
+        row[column].strip() for row in rows if len(row) > column and row[column].strip()
+    ]
+
+
+async def import_instagram_urls(
+    baserow: BaserowClient,
+    instagram: CachedInstagramAnalyticsClient,
+    table_id: str,
+    urls: Iterable[str],
+    concurrency: Optional[int] = None,
+    session_maker: async_sessionmaker = async_session_maker,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Enrich and save a list of Instagram URLs, yielding one result per URL.
+
+    URLs are deduplicated by normalized username and checked against the
+    local leads index in one query. Analytics are fetched concurrently
+    (bounded by LEAD_ENRICHMENT_CONCURRENCY) and results are written through
+    the Baserow batch endpoints as each batch of 200 fills up.
+    """
+    profiles: Dict[str, Tuple[str, str]] = {}  # key -> (input, username)
+    for url in urls:
+        username = extract_instagram_username(url)
+        key = normalize_instagram_username(username)
+        if not key:
+            yield {"input": url, "status": "invalid"}
+        elif key in profiles:
+            yield {"input": url, "username": key, "status": "duplicate"}
+        else:
+            profiles[key] = (url, username)
+
+    if not profiles:
+        return
+
+    async with session_maker() as db:
+        existing_row_ids = await get_lead_row_ids(db, profiles)
+
+    semaphore = asyncio.Semaphore(concurrency or settings.LEAD_ENRICHMENT_CONCURRENCY)
+
+    async def enrich(key: str) -> Tuple[str, Any]:
+        async with semaphore:
+            try:
+                return key, await instagram.fetch(key)
+            except Exception as e:
+                return key, e
+
+    def result(key: str, status: str, **fields) -> Dict[str, Any]:
+        return {"input": profiles[key][0], "username": key, "status": status, **fields}
+
+    async def write_creates(batch: List[Tuple[str, dict]]) -> List[Dict[str, Any]]:
+        try:
+            rows = await baserow.batch_create_rows(
+                table_id, [fields for _, fields in batch]
+            )
+        except HTTPException as e:
+            return [result(key, "error", detail=e.detail) for key, _ in batch]
+        async with session_maker() as db:
+            await upsert_leads(db, rows)
+            await db.commit()
+        return [
+            result(key, "created", row_id=row["id"])
+            for (key, _), row in zip(batch, rows)
+        ]
+
+    async def write_updates(batch: List[Tuple[str, dict]]) -> List[Dict[str, Any]]:
+        try:
+            await baserow.batch_update_rows(table_id, [fields for _, fields in batch])
+        except HTTPException as e:
+            return [result(key, "error", detail=e.detail) for key, _ in batch]
+        return [result(key, "updated", row_id=fields["id"]) for key, fields in batch]
+
+    creates: List[Tuple[str, dict]] = []
+    updates: List[Tuple[str, dict]] = []
+    tasks = [asyncio.create_task(enrich(key)) for key in profiles]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            key, analytics = await next_done
+            if isinstance(analytics, Exception):
+                yield result(key, "error", detail=str(analytics))
+                continue
+            if not analytics:
+                yield result(key, "not_found")
+                continue
+
+            fields = {
+                "Instagram Page": f"https://www.instagram.com/{profiles[key][1]}",
+                **build_profile_fields(analytics),
+            }
+            row_id = existing_row_ids.get(key)
+            if row_id is None:
+                creates.append((key, fields))
+            else:
+                updates.append((key, {"id": row_id, **fields}))
+
+            if len(creates) >= BASEROW_MAX_BATCH_SIZE:
+                for item in await write_creates(creates):
+                    yield item
+                creates = []
+            if len(updates) >= BASEROW_MAX_BATCH_SIZE:
+                for item in await write_updates(updates):
+                    yield item
+                updates = []
+
+        if creates:
+            for item in await write_creates(creates):
+                yield item
+        if updates:
+            for item in await write_updates(updates):
+                yield item
+    finally:
+        # Stop enriching when the client disconnects mid-stream
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,347 @@
+import asyncio
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+)
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .config import settings
+from .database import async_session_maker
+from .lead_clients import (
+    BASEROW_MAX_BATCH_SIZE,
+    BaserowClient,
+    CachedInstagramAnalyticsClient,
+    build_profile_fields,
+    extract_instagram_username,
+    normalize_instagram_url,
+)
+from .leads import remove_unsynced_leads, upsert_leads
+
+# Pages fetched ahead of the page currently being processed
+PAGE_PREFETCH = 2
+
+# Number of planned changes listed individually in a dedupe report
+REPORT_SAMPLE_SIZE = 100
+
+
+# Receives (checkpoint, progress); a checkpoint of None leaves the saved one as is
+ProgressCallback = Callable[[Optional[Dict[str, Any]], Dict[str, Any]], Awaitable[None]]
+
+
+async def iter_pages(
+    baserow: BaserowClient, table_id: str, after_id: Optional[int] = None
+) -> AsyncGenerator[List[dict], None]:
+    """Yield pages of rows while the next pages are fetched in the background.
+
+    Rows are ordered by id and each page is requested as the rows after the
+    last id seen, so rows added or deleted elsewhere in the table never shift
+    what a page (or a sweep resumed from a row id) returns.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=PAGE_PREFETCH)
+
+    async def produce():
+        last_id = after_id
+        try:
+            while True:
+                data = await baserow.list_rows(
+                    table_id,
+                    size=BASEROW_MAX_BATCH_SIZE,
+                    order_by="id",
+                    after_id=last_id,
+                )
+                rows = data.get("results", [])
+                if rows:
+                    await queue.put(rows)
+                if not rows or not data.get("next"):
+                    break
+                last_id = rows[-1]["id"]
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+
+
+async def update_empty_names(
+    baserow: BaserowClient,
+    instagram: CachedInstagramAnalyticsClient,
+    table_id: str,
+    concurrency: Optional[int] = None,
+    checkpoint: Optional[Dict[str, Any]] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Dict[str, int]:
+    """Fill in analytics for every row whose Name is empty.
+
+    Analytics lookups run concurrently (bounded by LEAD_ENRICHMENT_CONCURRENCY)
+    and updates are written through the batch endpoint, 200 rows at a time,
+    while the following pages are already being fetched.
+
+    After each page, on_progress receives a checkpoint ({"row_id", "stats"})
+    that only covers rows up to row_id, all of whose updates have been
+    written; its stats are the totals up to that row. Passing it back as
+    checkpoint resumes the sweep after row_id, continuing from those totals.
+    """
+    checkpoint = checkpoint or {}
+    semaphore = asyncio.Semaphore(concurrency or settings.LEAD_ENRICHMENT_CONCURRENCY)
+    # Totals up to the saved position
+    stats = {"pages": 0, "rows_checked": 0, "rows_updated": 0}
+    stats.update(checkpoint.get("stats", {}))
+    # Row ids counted by each stat past the saved position; they move into
+    # stats once the position passes them
+    uncounted: Dict[str, List[int]] = {key: [] for key in stats}
+    # Updates not yet handed to a batch write
+    pending_updates: List[dict] = []
+    write_task: Optional[asyncio.Task] = None
+    writing: List[dict] = []
+
+    async def enrich(row: dict) -> Optional[dict]:
+        username = extract_instagram_username(row.get("Instagram Page", ""))
+        if not username:
+            return None
+        async with semaphore:
+            analytics_data = await instagram.fetch(username)
+        if not analytics_data:
+            return None
+        return {
+            "id": row["id"],
+            **build_profile_fields(analytics_data, default_name="Updated Name"),
+        }
+
+    async def flush(items: List[dict]):
+        nonlocal write_task, writing
+        # Keep one batch write in flight while the next batch is being enriched
+        if write_task is not None:
+            await write_task
+        writing = items
+        write_task = asyncio.create_task(baserow.batch_update_rows(table_id, items))
+
+    def advance(last_row_id: int) -> int:
+        """Move the saved position up to the first unwritten update"""
+        if write_task is not None and not write_task.done():
+            unwritten = writing
+        else:
+            unwritten = pending_updates
+        position = unwritten[0]["id"] - 1 if unwritten else last_row_id
+        for key, row_ids in uncounted.items():
+            stats[key] += sum(1 for row_id in row_ids if row_id <= position)
+            uncounted[key] = [row_id for row_id in row_ids if row_id > position]
+        return position
+
+    def totals() -> Dict[str, int]:
+        return {key: stats[key] + len(row_ids) for key, row_ids in uncounted.items()}
+
+    async for rows in iter_pages(baserow, table_id, after_id=checkpoint.get("row_id")):
+        uncounted["pages"].append(rows[-1]["id"])
+        uncounted["rows_checked"].extend(row["id"] for row in rows)
+
+        candidates = [row for row in rows if not row.get("Name")]
+        updates = await asyncio.gather(*(enrich(row) for row in candidates))
+        updates = [update for update in updates if update]
+        uncounted["rows_updated"].extend(update["id"] for update in updates)
+        pending_updates.extend(updates)
+
+        while len(pending_updates) >= BASEROW_MAX_BATCH_SIZE:
+            await flush(pending_updates[:BASEROW_MAX_BATCH_SIZE])
+            pending_updates = pending_updates[BASEROW_MAX_BATCH_SIZE:]
+
+        if on_progress is not None:
+            if write_task is not None and write_task.done():
+                # Surface a failed write before recording progress past it
+                await write_task
+            position = advance(rows[-1]["id"])
+            await on_progress({"row_id": position, "stats": dict(stats)}, totals())
+
+    if pending_updates:
+        await flush(pending_updates)
+    if write_task is not None:
+        await write_task
+
+    return totals()
+
+
+async def sync_leads(
+    baserow: BaserowClient,
+    table_id: str,
+    session_maker: async_sessionmaker = async_session_maker,
+) -> Dict[str, int]:
+    """Rebuild the local leads index from a full read of the Baserow table.
+
+    Each page is indexed as it arrives; leads whose rows were not seen are
+    removed only once the whole table has been read.
+    """
+    sync_started_at = datetime.utcnow()
+    stats = {"pages": 0, "rows_checked": 0}
+
+    async for rows in iter_pages(baserow, table_id):
+        stats["pages"] += 1
+        stats["rows_checked"] += len(rows)
+        async with session_maker() as db:
+            await upsert_leads(db, rows, sync_started_at=sync_started_at)
+            await db.commit()
+
+    async with session_maker() as db:
+        stats["leads_removed"] = await remove_unsynced_leads(db, sync_started_at)
+        await db.commit()
+
+    return stats
+
+
+async def remove_duplicates(
+    baserow: BaserowClient,
+    table_id: str,
+    dry_run: bool = False,
+    checkpoint: Optional[Dict[str, Any]] = None,
+    progress: Optional[Dict[str, Any]] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """Normalize Instagram URLs and delete rows whose URL was already seen.
+
+    The table is read completely before anything is written, so deleting rows
+    cannot shift page boundaries under the scan. The first row seen for a URL
+    is kept; normalizations and deletions are then applied through the batch
+    endpoints. With dry_run, only the report of planned changes is returned.
+
+    The plan is passed to on_progress once, as the "apply" phase checkpoint.
+    After each batch only the progress is saved (checkpoint None); its
+    rows_normalized and rows_deleted counts are the offsets into the plan
+    that a resumed run, given both back, continues from. An interrupted scan
+    starts over.
+    """
+    checkpoint = checkpoint or {}
+    if checkpoint.get("phase") == "apply":
+        plan = checkpoint
+        progress = progress or {}
+        normalized = progress.get("rows_normalized", 0)
+        deleted = progress.get("rows_deleted", 0)
+    else:
+        plan = await _plan_duplicate_removal(baserow, table_id, on_progress)
+        if dry_run:
+            return _dedupe_report(plan, dry_run)
+        normalized = deleted = 0
+        if on_progress is not None:
+            await on_progress(plan, _dedupe_progress(plan, normalized, deleted))
+
+    async def save():
+        if on_progress is not None:
+            await on_progress(None, _dedupe_progress(plan, normalized, deleted))
+
+    normalizations = plan["normalizations"]
+    while normalized < len(normalizations):
+        batch = normalizations[normalized : normalized + BASEROW_MAX_BATCH_SIZE]
+        await baserow.batch_update_rows(table_id, batch)
+        normalized += len(batch)
+        await save()
+    deletions = plan["deletions"]
+    while deleted < len(deletions):
+        batch = deletions[deleted : deleted + BASEROW_MAX_BATCH_SIZE]
+        await _delete_rows(baserow, table_id, batch)
+        deleted += len(batch)
+        await save()
+
+    return _dedupe_report(plan, dry_run)
+
+
+async def _delete_rows(baserow: BaserowClient, table_id: str, row_ids: List[int]):
+    """Batch delete rows, tolerating rows that are already gone.
+
+    A run interrupted between a batch delete and saving its progress repeats
+    that batch, which Baserow rejects as a whole; the rows are then deleted
+    one at a time, skipping the missing ones.
+    """
+    try:
+        await baserow.batch_delete_rows(table_id, row_ids)
+    except HTTPException as e:
+        if e.status_code not in (400, 404):
+            raise
+        for row_id in row_ids:
+            try:
+                await baserow.delete_row(table_id, row_id)
+            except HTTPException as e:
+                if e.status_code != 404:
+                    raise
+
+
+async def _plan_duplicate_removal(
+    baserow: BaserowClient, table_id: str, on_progress: Optional[ProgressCallback]
+) -> Dict[str, Any]:
+    url_to_row_id: Dict[str, int] = {}
+    normalizations: List[dict] = []
+    duplicates: List[dict] = []
+    stats = {"pages": 0, "rows_checked": 0}
+
+    async for rows in iter_pages(baserow, table_id):
+        stats["pages"] += 1
+        stats["rows_checked"] += len(rows)
+        for row in rows:
+            instagram_page = (row.get("Instagram Page") or "").rstrip("/")
+            if not instagram_page:
+                continue
+
+            normalized_url = normalize_instagram_url(instagram_page)
+            kept_row_id = url_to_row_id.get(normalized_url)
+            if kept_row_id is not None:
+                duplicates.append(
+                    {"id": row["id"], "url": normalized_url, "kept_id": kept_row_id}
+                )
+                continue
+
+            url_to_row_id[normalized_url] = row["id"]
+            if normalized_url != row.get("Instagram Page"):
+                normalizations.append(
+                    {"id": row["id"], "Instagram Page": normalized_url}
+                )
+
+        if on_progress is not None:
+            await on_progress({"phase": "scan"}, {"phase": "scan", **stats})
+
+    return {
+        "phase": "apply",
+        "stats": stats,
+        "normalizations": normalizations,
+        "deletions": [row["id"] for row in duplicates],
+        "duplicates": duplicates[:REPORT_SAMPLE_SIZE],
+        "planned_normalizations": len(normalizations),
+        "planned_deletions": len(duplicates),
+    }
+
+
+def _dedupe_progress(
+    plan: Dict[str, Any], normalized: int, deleted: int
+) -> Dict[str, Any]:
+    return {
+        "phase": "apply",
+        **plan["stats"],
+        "planned_normalizations": plan["planned_normalizations"],
+        "planned_deletions": plan["planned_deletions"],
+        "rows_normalized": normalized,
+        "rows_deleted": deleted,
+    }
+
+
+def _dedupe_report(plan: Dict[str, Any], dry_run: bool) -> Dict[str, Any]:
+    return {
+        **plan["stats"],
+        "dry_run": dry_run,
+        "rows_normalized": plan["planned_normalizations"],
+        "rows_deleted": plan["planned_deletions"],
+        "duplicates": plan["duplicates"],
+    }
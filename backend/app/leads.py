@@ -0,0 +1,92 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .lead_clients import extract_instagram_username, normalize_instagram_username
+from .models import Lead
+
+
+def lead_username(instagram_page: str) -> str:
+    """Key of the leads index for an Instagram profile URL or @handle"""
+    return normalize_instagram_username(extract_instagram_username(instagram_page))
+
+
+def lead_values(
+    rows: Iterable[Dict[str, Any]], synced_at: datetime
+) -> List[Dict[str, Any]]:
+    """Map Baserow rows to leads, keeping the first row seen for each username"""
+    values: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        username = lead_username(row.get("Instagram Page") or "")
+        if not username or username in values:
+            continue
+        values[username] = {
+            "username": username,
+            "baserow_row_id": row["id"],
+            "instagram_url": row.get("Instagram Page"),
+            "synced_at": synced_at,
+        }
+    return list(values.values())
+
+
+async def find_lead(db: AsyncSession, username: str) -> Optional[Lead]:
+    return await db.get(Lead, normalize_instagram_username(username))
+
+
+async def get_lead_row_ids(
+    db: AsyncSession, usernames: Iterable[str]
+) -> Dict[str, int]:
+    """Baserow row ids of those normalized usernames that are indexed"""
+    result = await db.execute(
+        select(Lead.username, Lead.baserow_row_id).where(
+            Lead.username.in_(list(usernames))
+        )
+    )
+    return {username: row_id for username, row_id in result.all()}
+
+
+async def upsert_leads(
+    db: AsyncSession,
+    rows: Iterable[Dict[str, Any]],
+    sync_started_at: Optional[datetime] = None,
+):
+    """Index Baserow rows in one statement. The caller commits.
+
+    An existing lead for the same username is kept, so the oldest row of a
+    duplicate stays indexed. A full sync passes sync_started_at to replace
+    leads it has not visited yet.
+    """
+    values = lead_values(rows, datetime.utcnow())
+    if not values:
+        return
+
+    stmt = insert(Lead).values(values)
+    if sync_started_at is None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[Lead.username])
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Lead.username],
+            set_={
+                "baserow_row_id": stmt.excluded.baserow_row_id,
+                "instagram_url": stmt.excluded.instagram_url,
+                "synced_at": stmt.excluded.synced_at,
+            },
+            where=Lead.synced_at < sync_started_at,
+        )
+    await db.execute(stmt)
+
+
+async def remove_leads(db: AsyncSession, row_ids: Iterable[int]):
+    """Drop the leads of deleted (or re-keyed) Baserow rows. The caller commits."""
+    row_ids = list(row_ids)
+    if row_ids:
+        await db.execute(delete(Lead).where(Lead.baserow_row_id.in_(row_ids)))
+
+
+async def remove_unsynced_leads(db: AsyncSession, sync_started_at: datetime) -> int:
+    """Drop leads whose rows were not seen by a completed full sync"""
+    result = await db.execute(delete(Lead).where(Lead.synced_at < sync_started_at))
+    return result.rowcount
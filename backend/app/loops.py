@@ -0,0 +1,131 @@
+import asyncio
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .config import settings
+from .database import async_session_maker
+from .http_client import RateLimiter, get_http_client
+from .metrics import observe_dependency
+from .models import User
+from .outbox import enqueue_message, outbox_dispatcher, register_outbox_handler
+
+LOOPS_EVENTS_URL = "https://app.loops.so/api/v1/events/send"
+
+LOOPS_EVENT_TOPIC = "loops.event"
+
+ACCOUNT_CREATED_EVENT = "Nails Deisgn AI Account Created"
+
+# Users read from the server-side cursor and dispatched per checkpoint
+DISPATCH_CHUNK_SIZE = 500
+
+# Shared by every Loops call in this worker
+loops_rate_limiter = RateLimiter(settings.LOOPS_REQUESTS_PER_SECOND)
+
+
+def account_created_event(user_id: uuid.UUID, email: str) -> Dict[str, Any]:
+    return {
+        "email": email,
+        "userId": str(user_id),
+        "nailsCustomerId": str(user_id),
+        "eventName": ACCOUNT_CREATED_EVENT,
+        "eventProperties": {},
+        "mailingLists": {},
+    }
+
+
+async def send_loops_event(payload: Dict[str, Any], idempotency_key: str):
+    """Send an event to Loops, raising when it is not accepted"""
+    await loops_rate_limiter.wait()
+    with observe_dependency("loops"):
+        response = await get_http_client().post(
+            LOOPS_EVENTS_URL,
+            json=payload,
+            headers={
+                "Authorization": f"Bearer {settings.LOOPS_API_KEY}",
+                "Content-Type": "application/json",
+                # Loops rejects a repeated key with 409, so a retry is sent only once
+                "Idempotency-Key": idempotency_key,
+            },
+        )
+    if response.status_code == 409:
+        return
+    if response.status_code >= 400:
+        raise RuntimeError(
+            f"Loops returned {response.status_code}: {response.text[:200]}"
+        )
+
+
+@register_outbox_handler(LOOPS_EVENT_TOPIC)
+async def deliver_loops_event(payload: Dict[str, Any], message_id: int):
+    await send_loops_event(payload, f"outbox-{message_id}")
+
+
+def enqueue_loops_event(db: AsyncSession, payload: Dict[str, Any]):
+    """Queue a Loops event to be sent once the caller commits"""
+    enqueue_message(db, LOOPS_EVENT_TOPIC, payload)
+
+
+async def dispatch_account_created_events(
+    idempotency_prefix: str,
+    checkpoint: Optional[Dict[str, Any]] = None,
+    on_progress: Optional[
+        Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[None]]
+    ] = None,
+    session_maker: async_sessionmaker = async_session_maker,
+) -> Dict[str, int]:
+    """Send the account-created event for every user, in user id order.
+
+    Only ids and emails are read, through a server-side cursor, and users are
+    dispatched DISPATCH_CHUNK_SIZE at a time with LOOPS_CONCURRENCY requests
+    in flight, so memory stays flat. After each chunk, on_progress receives a
+    checkpoint ({"user_id", "stats"}) to resume from; events carry an
+    idempotency key built from idempotency_prefix, so a resumed run does not
+    send them twice. Events Loops did not accept are queued in the outbox,
+    before the checkpoint moves past them, and retried from there.
+    """
+    checkpoint = checkpoint or {}
+    stats = {"users_processed": 0, "events_sent": 0, "failed": 0}
+    stats.update(checkpoint.get("stats", {}))
+    semaphore = asyncio.Semaphore(settings.LOOPS_CONCURRENCY)
+
+    async def send(user_id: uuid.UUID, email: str) -> Optional[Dict[str, Any]]:
+        """Send one event, returning it if it still has to be delivered"""
+        event = account_created_event(user_id, email)
+        async with semaphore:
+            try:
+                await send_loops_event(event, f"{idempotency_prefix}-{user_id}")
+                return None
+            except Exception as e:
+                print(f"Error sending account created event for {user_id}: {e}")
+                return event
+
+    query = select(User.id, User.email).order_by(User.id)
+    if checkpoint.get("user_id"):
+        query = query.where(User.id > uuid.UUID(checkpoint["user_id"]))
+
+    async with session_maker() as db:
+        result = await db.stream(query.execution_options(yield_per=DISPATCH_CHUNK_SIZE))
+        async for users in result.partitions():
+            results = await asyncio.gather(
+                *(send(user_id, email) for user_id, email in users)
+            )
+            failed = [event for event in results if event is not None]
+            if failed:
+                async with session_maker() as outbox_db:
+                    for event in failed:
+                        enqueue_loops_event(outbox_db, event)
+                    await outbox_db.commit()
+                outbox_dispatcher.notify()
+            stats["users_processed"] += len(users)
+            stats["events_sent"] += len(users) - len(failed)
+            stats["failed"] += len(failed)
+            if on_progress is not None:
+                await on_progress(
+                    {"user_id": str(users[-1][0]), "stats": dict(stats)},
+                    dict(stats),
+                )
+
+    return stats
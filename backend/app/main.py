@@ -4,17 +4,63 @@ from app.routes.items import router as items_router
 from app.routes.waitlist import router as waitlist_router
 from app.routes.home_design_projects import router as home_design_projects_router
 from app.routes.home_design_chat import router as home_design_chat_router
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager
 from datetime import datetime
 
 from .schemas import UserCreate, UserRead, UserUpdate
 from .users import AUTH_URL_PATH, auth_backend, fastapi_users, google_oauth_router
 from .routes.lead_generation import router as lead_generation_router
+from .routes.jobs import router as jobs_router
+from .background import image_generations, server_shutdown
+from .compression import CompressionMiddleware
+from .database import get_pool_stats, prewarm_pool, track_writes
+from .email import load_email_templates, smtp_pool
+from .http_client import close_http_client, get_http_client
+from .jobs import job_runner
+from .metrics import render_metrics, track_metrics
+from .outbox import outbox_dispatcher
+from .pagination import NEXT_CURSOR_HEADER
+from .providers import close_provider_clients, init_provider_clients
+from .query_stats import track_queries
+from .stripe_events import stripe_event_consumer
 from .utils import simple_generate_unique_route_id
 
 
-app = FastAPI(generate_unique_id_function=simple_generate_unique_route_id)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_http_client()
+    await init_provider_clients()
+    load_email_templates()
+    if settings.DATABASE_POOL_PREWARM:
+        await prewarm_pool()
+    stripe_event_consumer.start()
+    job_runner.start()
+    outbox_dispatcher.start()
+    image_generations.start()
+    server_shutdown.install()
+    yield
+    # Runs once the server has stopped accepting connections (SIGTERM, reload)
+    # and the open ones have finished; SSE streams end as soon as the signal
+    # arrives so they don't hold this up. Generations finish first: they still
+    # need the database and clients.
+    server_shutdown.set()
+    await image_generations.drain(settings.GENERATION_DRAIN_SECONDS)
+    await outbox_dispatcher.stop()
+    await job_runner.stop()
+    await stripe_event_consumer.stop()
+    await smtp_pool.close()
+    await close_provider_clients()
+    await close_http_client()
+
+
+app = FastAPI(
+    generate_unique_id_function=simple_generate_unique_route_id,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 origins = [
@@ -23,12 +69,27 @@ origins = [
     "http://localhost:3001",  # Next.js dev server
 ]
 
+# Sends a user's reads to the primary for a moment after they write
+app.middleware("http")(track_writes)
+# Statement count and database time per request, in Server-Timing and logs
+app.middleware("http")(track_queries)
+# Prometheus request metrics, served at /metrics
+app.middleware("http")(track_metrics)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
@@ -66,6 +127,7 @@ app.include_router(billing_router, prefix="/billing")
 app.include_router(items_router, prefix="/items")
 app.include_router(waitlist_router, prefix="/waitlist")
 app.include_router(lead_generation_router, prefix="/lead-generation")
+app.include_router(jobs_router, prefix="/jobs")
 app.include_router(home_design_projects_router, prefix="/home-design")
 app.include_router(home_design_chat_router, prefix="/home-design")
 
@@ -90,3 +152,16 @@ async def health_check():
         "timestamp": datetime.utcnow().isoformat(),
         "service": "homeideasai-backend",
     }
+
+
+@app.get("/health/db-pool", tags=["health"])
+async def database_pool_stats():
+    """Connection pool gauges and checkout wait times for this worker"""
+    return get_pool_stats()
+
+
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+async def metrics():
+    """Prometheus metrics, aggregated across gunicorn workers"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
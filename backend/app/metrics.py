@@ -0,0 +1,159 @@
+import functools
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+
+from fastapi import Request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .database import get_pool_stats
+
+# Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+# (set up in gunicorn.conf.py) and any worker can serve the aggregate.
+# Gauges say how workers combine: livesum adds up the live workers, livemax
+# takes the largest.
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "Requests handled, by route and status code",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response headers were ready, by route",
+    ["method", "route"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests currently being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections in use",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_IN = Gauge(
+    "db_pool_checked_in",
+    "Idle connections held by the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Connections opened beyond the pool size",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT_MAX = Gauge(
+    "db_pool_checkout_wait_seconds_max",
+    "Longest wait for a connection since the worker started",
+    multiprocess_mode="livemax",
+)
+
+IMAGE_GENERATIONS_IN_PROGRESS = Gauge(
+    "image_generations_in_progress",
+    "Background image generations currently running",
+    multiprocess_mode="livesum",
+)
+IMAGE_GENERATION_DURATION = Histogram(
+    "image_generation_duration_seconds",
+    "Time from starting a background image generation to saving it",
+    buckets=(5, 10, 20, 30, 45, 60, 90, 120, 180, 300, float("inf")),
+)
+
+STRIPE_EVENTS_FAILED = Counter(
+    "stripe_events_failed_total",
+    "Stripe events given up on after STRIPE_EVENT_MAX_ATTEMPTS, by event type",
+    ["type"],
+)
+
+OUTBOUND_REQUEST_DURATION = Histogram(
+    "outbound_request_duration_seconds",
+    "Latency of calls to external services",
+    ["dependency", "outcome"],
+)
+
+SSE_CONNECTIONS = Gauge(
+    "sse_connections",
+    "Open server-sent event streams",
+    multiprocess_mode="livesum",
+)
+
+
+@contextmanager
+def observe_dependency(dependency: str) -> Iterator[None]:
+    """Time a call to an external service, labelled ok or error"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        OUTBOUND_REQUEST_DURATION.labels(dependency, outcome).observe(
+            time.perf_counter() - started
+        )
+
+
+def track_image_generation(func):
+    """Count a background generation as in progress while it runs, and time it"""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        with IMAGE_GENERATIONS_IN_PROGRESS.track_inprogress():
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                IMAGE_GENERATION_DURATION.observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+def update_pool_gauges():
+    stats = get_pool_stats()
+    DB_POOL_CHECKED_OUT.set(stats["checked_out"])
+    DB_POOL_CHECKED_IN.set(stats["checked_in"])
+    DB_POOL_OVERFLOW.set(stats["overflow"])
+    DB_POOL_CHECKOUT_WAIT_MAX.set(stats["checkout_wait_seconds_max"])
+
+
+async def track_metrics(request: Request, call_next):
+    """Middleware recording request counts, latencies and in-flight requests"""
+    method = request.method
+    started = time.perf_counter()
+    status = 500
+    try:
+        with HTTP_REQUESTS_IN_PROGRESS.labels(method).track_inprogress():
+            response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template, not the raw path, to keep label values bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        HTTP_REQUEST_DURATION.labels(method, path).observe(
+            time.perf_counter() - started
+        )
+        HTTP_REQUESTS.labels(method, path, str(status)).inc()
+        update_pool_gauges()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Metrics in the Prometheus text format, across all workers when under gunicorn"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
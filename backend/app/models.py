@@ -14,9 +14,10 @@ from sqlalchemy import (
     Text,
     JSON,
     Boolean,
+    Index,
 )
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from uuid import uuid4
 from sqlalchemy.orm import Mapped
 
@@ -30,12 +31,12 @@ class OAuthAccount(SQLAlchemyBaseOAuthAccountTableUUID, Base):
 
 
 class User(SQLAlchemyBaseUserTableUUID, Base):
-    stripe_customer_id = Column(String, nullable=True)
+    stripe_customer_id = Column(String, nullable=True, index=True)
     credits = Column(Integer, default=0)
     created_at = Column(DateTime, server_default=func.now())
 
     # Subscription fields
-    stripe_subscription_id = Column(String, nullable=True)
+    stripe_subscription_id = Column(String, nullable=True, index=True)
     subscription_status = Column(
         String, nullable=True
     )  # active, canceled, past_due, etc.
@@ -96,6 +97,15 @@ class HomeDesignProject(Base):
         "HomeDesignEdit", back_populates="project", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        Index(
+            "ix_home_design_projects_user_id_updated_at_id",
+            user_id,
+            updated_at.desc(),
+            id.desc(),
+        ),
+    )
+
 
 class HomeDesignConversation(Base):
     __tablename__ = "home_design_conversations"
@@ -105,13 +115,21 @@ class HomeDesignConversation(Base):
         UUID(as_uuid=True), ForeignKey("home_design_projects.id"), nullable=False
     )
     messages = Column(
-        JSON, nullable=False
+        JSONB, nullable=False
     )  # Array of {role: "user"|"assistant", content: string}
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     project = relationship("HomeDesignProject", back_populates="conversations")
 
+    __table_args__ = (
+        Index(
+            "ix_home_design_conversations_project_id_updated_at",
+            project_id,
+            updated_at.desc(),
+        ),
+    )
+
 
 class HomeDesignEdit(Base):
     __tablename__ = "home_design_edits"
@@ -133,3 +151,135 @@ class HomeDesignEdit(Base):
 
     project = relationship("HomeDesignProject", back_populates="edits")
     conversation = relationship("HomeDesignConversation")
+
+    __table_args__ = (
+        Index(
+            "ix_home_design_edits_project_id_created_at", project_id, created_at.desc()
+        ),
+    )
+
+
+class StripeEvent(Base):
+    __tablename__ = "stripe_events"
+
+    id = Column(String, primary_key=True)  # Stripe event ID (evt_...)
+    type = Column(String, nullable=False)
+    customer_id = Column(String, nullable=True)
+    payload = Column(JSON, nullable=False)
+    stripe_created_at = Column(DateTime, nullable=False)
+    received_at = Column(DateTime, server_default=func.now())
+    processed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(
+        DateTime, nullable=False, server_default=func.now()
+    )  # Next attempt, pushed back after a failure
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_stripe_events_pending",
+            "customer_id",
+            "stripe_created_at",
+            postgresql_where=processed_at.is_(None),
+        ),
+    )
+
+
+class StripeInvoice(Base):
+    __tablename__ = "invoices"
+
+    id = Column(String, primary_key=True)  # Stripe invoice ID (in_...)
+    customer_id = Column(String, nullable=False)
+    status = Column(String, nullable=True)  # draft, open, paid, void, etc.
+    hosted_invoice_url = Column(String, nullable=True)
+    total = Column(Integer, nullable=False, default=0)  # In cents
+    currency = Column(String, nullable=True)
+    credits = Column(Integer, nullable=False, default=0)
+    created = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index(
+            "ix_invoices_customer_id_created",
+            customer_id,
+            created.desc(),
+            id.desc(),
+        ),
+    )
+
+
+class InstagramAnalyticsCache(Base):
+    __tablename__ = "instagram_analytics_cache"
+
+    username = Column(String, primary_key=True)  # Lowercased, without "@"
+    data = Column(JSON, nullable=True)  # None caches a failed lookup
+    fetched_at = Column(DateTime, nullable=False)
+
+
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    kind = Column(String, nullable=False)  # Key into the registered job handlers
+    status = Column(
+        String, nullable=False, default="pending"
+    )  # pending, running, completed, failed
+    params = Column(JSON, nullable=False, default=dict)
+    user_id = Column(
+        UUID(as_uuid=True), ForeignKey("user.id"), nullable=True
+    )  # Who started it; scheduled jobs have none
+    checkpoint = Column(JSON, nullable=True)  # Where an interrupted run resumes
+    progress = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_background_jobs_active",
+            "kind",
+            postgresql_where=status.in_(["pending", "running"]),
+        ),
+    )
+
+
+class Lead(Base):
+    """Local index of the Baserow leads table, keyed by Instagram username"""
+
+    __tablename__ = "leads"
+
+    username = Column(String, primary_key=True)  # Lowercased, without "@"
+    baserow_row_id = Column(Integer, nullable=False, index=True)
+    instagram_url = Column(String, nullable=True)
+    synced_at = Column(DateTime, nullable=False)
+
+
+class OutboxMessage(Base):
+    """Side effect recorded in the same transaction as the change causing it"""
+
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    topic = Column(String, nullable=False)  # Key into the registered handlers
+    payload = Column(JSON, nullable=False)
+    status = Column(
+        String, nullable=False, default="pending"
+    )  # pending, delivered, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(
+        DateTime, nullable=False, server_default=func.now()
+    )  # Next delivery attempt, pushed back while a dispatcher holds it
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    delivered_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_outbox_pending",
+            available_at,
+            postgresql_where=status == "pending",
+        ),
+    )
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import Row, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .config import settings
+from .database import async_session_maker
+from .models import OutboxMessage
+
+# Receives the message payload and its id (usable as an idempotency key);
+# raising schedules a retry
+OutboxHandler = Callable[[Dict[str, Any], int], Awaitable[None]]
+
+OUTBOX_HANDLERS: Dict[str, OutboxHandler] = {}
+
+
+def register_outbox_handler(topic: str):
+    """Register the handler that delivers messages of the given topic"""
+
+    def decorator(handler: OutboxHandler) -> OutboxHandler:
+        OUTBOX_HANDLERS[topic] = handler
+        return handler
+
+    return decorator
+
+
+def enqueue_message(db: AsyncSession, topic: str, payload: Dict[str, Any]):
+    """Add a message to the session; it is delivered once the caller commits"""
+    db.add(OutboxMessage(topic=topic, payload=payload, status="pending", attempts=0))
+
+
+def retry_delay(attempts: int) -> timedelta:
+    seconds = settings.OUTBOX_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.OUTBOX_RETRY_MAX_BACKOFF_SECONDS))
+
+
+async def claim_messages(db: AsyncSession, limit: int) -> List[Row]:
+    """Lease due messages so other dispatchers skip them while they are delivered.
+
+    Returns rows of (id, topic, payload, attempts), attempts including this one.
+    """
+    due = (
+        select(OutboxMessage.id)
+        .where(OutboxMessage.status == "pending")
+        .where(OutboxMessage.available_at <= func.now())
+        .order_by(OutboxMessage.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(due.scalar_subquery()))
+        .values(
+            attempts=OutboxMessage.attempts + 1,
+            available_at=func.now() + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS),
+        )
+        .returning(
+            OutboxMessage.id,
+            OutboxMessage.topic,
+            OutboxMessage.payload,
+            OutboxMessage.attempts,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    messages = list(result.all())
+    await db.commit()
+    return sorted(messages, key=lambda message: message.id)
+
+
+async def deliver(message: Row) -> Optional[str]:
+    """Run the message's handler, returning the error if it failed"""
+    handler = OUTBOX_HANDLERS.get(message.topic)
+    if handler is None:
+        return f"No handler registered for topic {message.topic}"
+    try:
+        await handler(message.payload, message.id)
+    except Exception as e:
+        return str(e) or type(e).__name__
+    return None
+
+
+async def dispatch_outbox(
+    session_maker: async_sessionmaker = async_session_maker,
+) -> int:
+    """Deliver one batch of due messages concurrently. Returns the batch size."""
+    async with session_maker() as db:
+        messages = await claim_messages(db, settings.OUTBOX_BATCH_SIZE)
+    if not messages:
+        return 0
+
+    errors = await asyncio.gather(*(deliver(message) for message in messages))
+
+    delivered = [m.id for m, error in zip(messages, errors) if error is None]
+    async with session_maker() as db:
+        if delivered:
+            await db.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(delivered))
+                .values(status="delivered", delivered_at=func.now(), last_error=None)
+            )
+        for message, error in zip(messages, errors):
+            if error is None:
+                continue
+            print(
+                f"Error delivering {message.topic} message {message.id} "
+                f"(attempt {message.attempts}): {error}"
+            )
+            if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                values = {"status": "failed", "last_error": error}
+            else:
+                values = {
+                    "available_at": func.now() + retry_delay(message.attempts),
+                    "last_error": error,
+                }
+            await db.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id == message.id)
+                .values(**values)
+            )
+        await db.commit()
+
+    return len(messages)
+
+
+class OutboxDispatcher:
+    """Background loop delivering outbox messages outside the request path"""
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                dispatched = await dispatch_outbox()
+            except Exception as e:
+                print(f"Error in outbox dispatcher: {e}")
+                dispatched = 0
+
+            if dispatched:
+                continue
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.OUTBOX_POLL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+
+
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,30 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Tuple
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: datetime, row_id: Any) -> str:
+    """Encode the keyset position of the last row on a page as an opaque cursor"""
+    raw = json.dumps([sort_value.isoformat(), str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: str, id_type: Callable[[str], Any] = str
+) -> Tuple[datetime, Any]:
+    """Decode a cursor produced by encode_cursor, rejecting malformed input with 400.
+
+    The row id is converted with id_type (e.g. uuid.UUID) so a tampered id
+    fails here rather than in the query.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), id_type(row_id)
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,126 @@
+import importlib
+import types
+from contextlib import AsyncExitStack
+from typing import Any, Callable, Optional
+
+from .config import settings
+from .metrics import observe_dependency
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a provider SDK that imports it on first attribute access.
+
+    The SDKs take most of the app's import time, and a module-level
+    `stripe = LazyModule("stripe")` keeps call sites unchanged while moving
+    that cost out of `import app.main` (worker boot, test collection, OpenAPI
+    generation). on_import runs once, right after the real import.
+    """
+
+    def __init__(
+        self, name: str, on_import: Optional[Callable[[types.ModuleType], None]] = None
+    ):
+        super().__init__(name)
+        self._on_import = on_import
+        self._module: Optional[types.ModuleType] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> types.ModuleType:
+        if self._module is None:
+            module = importlib.import_module(self.__name__)
+            if self._on_import is not None:
+                self._on_import(module)
+            self._module = module
+        return self._module
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.load(), name)
+
+
+def configure_stripe(module: types.ModuleType):
+    # Defined here so subclassing doesn't import stripe with this module
+    class InstrumentedStripeHTTPClient(module.RequestsClient):
+        """Stripe's default HTTP client, timing each call for /metrics"""
+
+        def request(self, *args, **kwargs):
+            with observe_dependency("stripe"):
+                return super().request(*args, **kwargs)
+
+    module.api_key = settings.STRIPE_SECRET_KEY
+    module.default_http_client = InstrumentedStripeHTTPClient()
+
+
+stripe = LazyModule("stripe", on_import=configure_stripe)
+fal_client = LazyModule("fal_client")
+aioboto3 = LazyModule("aioboto3")
+# For except clauses, which only look up the exception class once one is raised
+botocore_exceptions = LazyModule("botocore.exceptions")
+
+_claude_client = None
+_s3_client = None
+# Owns the S3 client's async context, which aioboto3 requires
+_s3_exit_stack: Optional[AsyncExitStack] = None
+
+
+def get_claude_client():
+    """Shared async Anthropic client, created on first use.
+
+    Also usable as a route dependency.
+    """
+    global _claude_client
+    if _claude_client is None:
+        import anthropic
+
+        _claude_client = anthropic.AsyncAnthropic(api_key=settings.CLAUDE_API_KEY)
+    return _claude_client
+
+
+async def get_s3_client():
+    """Shared aioboto3 S3 client, keeping a pool of connections to S3.
+
+    Opened by the application lifespan; opened on first use outside of it
+    (tests, commands). Also usable as a route dependency.
+    """
+    global _s3_client, _s3_exit_stack
+    if _s3_client is None:
+        from botocore.config import Config
+
+        exit_stack = AsyncExitStack()
+        _s3_client = await exit_stack.enter_async_context(
+            aioboto3.Session().client(
+                "s3",
+                aws_access_key_id=settings.S3_AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.S3_AWS_SECRET_ACCESS_KEY,
+                config=Config(max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS),
+            )
+        )
+        _s3_exit_stack = exit_stack
+    return _s3_client
+
+
+async def init_provider_clients():
+    """Import the SDKs and build their clients in the worker process.
+
+    Called from the application lifespan, so it runs after gunicorn forks
+    (clients holding sockets or threads must not be shared across a fork)
+    and before the first request, which then pays no import cost.
+    """
+    for module in (stripe, fal_client, aioboto3):
+        module.load()
+    get_claude_client()
+    await get_s3_client()
+
+
+async def close_provider_clients():
+    global _claude_client, _s3_client, _s3_exit_stack
+    if _claude_client is not None:
+        await _claude_client.close()
+        _claude_client = None
+    if _s3_exit_stack is not None:
+        await _s3_exit_stack.aclose()
+        _s3_exit_stack = None
+        _s3_client = None
+    if stripe.is_loaded:
+        stripe.default_http_client.close()
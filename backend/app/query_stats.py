@@ -0,0 +1,91 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Tuple
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+
+@dataclass
+class QueryStats:
+    """Statements issued, and time spent in the database, within one scope"""
+
+    count: int = 0
+    duration_seconds: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    def repeated_statements(self, threshold: int) -> Counter:
+        """Statements run at least `threshold` times, the usual sign of an N+1"""
+        return Counter({sql: n for sql, n in self.statements.items() if n >= threshold})
+
+
+# Every scope currently collecting; nested scopes (a test around a request)
+# each see the statements
+_collectors: ContextVar[Tuple[QueryStats, ...]] = ContextVar(
+    "query_stats_collectors", default=()
+)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Collect the statements executed in the current context"""
+    stats = QueryStats()
+    token = _collectors.set(_collectors.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    collectors = _collectors.get()
+    if not collectors:
+        return
+    duration = time.perf_counter() - context._query_started
+    for stats in collectors:
+        stats.count += 1
+        stats.duration_seconds += duration
+        stats.statements[statement] += 1
+
+
+def instrument_engine(engine: Engine):
+    """Attach the statement counters to an engine (the sync_engine of an async one)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+async def track_queries(request: Request, call_next):
+    """Middleware reporting each request's statement count and database time.
+
+    Totals go out in a Server-Timing header. Requests that issue more than
+    QUERY_LOG_THRESHOLD statements, or repeat one QUERY_REPEAT_THRESHOLD
+    times, are logged.
+    """
+    with count_queries() as stats:
+        response = await call_next(request)
+
+    duration_ms = stats.duration_seconds * 1000
+    response.headers.append(
+        "Server-Timing", f'db;dur={duration_ms:.1f};desc="{stats.count} queries"'
+    )
+
+    repeated = stats.repeated_statements(settings.QUERY_REPEAT_THRESHOLD)
+    if stats.count > settings.QUERY_LOG_THRESHOLD or repeated:
+        print(
+            f"{request.method} {request.url.path} issued {stats.count} queries "
+            f"in {duration_ms:.1f}ms"
+        )
+        for sql, n in repeated.most_common():
+            print(f"  Possible N+1, ran {n} times: {' '.join(sql.split())[:200]}")
+    return response
@@ -1,3 +1,4 @@
+import asyncio
 from app.config import settings
 from app.schemas import (
     CompleteCheckoutSessionResponse,
@@ -6,20 +7,21 @@ from app.schemas import (
     SubscriptionInfo,
     CancelSubscriptionResponse,
 )
-from fastapi import APIRouter, HTTPException, Request, Body, Depends
-import stripe
-from app.models import User
+from fastapi import APIRouter, HTTPException, Request, Response, Body, Depends, Query
+from app.models import User, StripeInvoice
+from sqlalchemy import or_, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.database import get_async_session
+from app.database import get_async_session, get_read_session
 from app.users import current_active_user
+from app.stripe_events import record_stripe_event
+from app.invoices import upsert_invoices, delete_invoice
+from app.providers import stripe
+from app.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
 from datetime import datetime
 
 router = APIRouter(tags=["billing"])
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
-
 @router.post("/create-checkout-session", response_model=StripeCheckoutSession)
 async def create_checkout_session(
     package_type: str = Body(...),
@@ -135,8 +137,20 @@ async def stripe_webhook(
     except stripe.error.SignatureVerificationError as e:
         raise HTTPException(status_code=400, detail="Invalid signature")
 
+    print(f"Received webhook event: {event['type']} ({event['id']})")
+
+    # Store the event and acknowledge immediately; the Stripe event consumer
+    # applies it in the background. Redeliveries of the same event ID are ignored.
+    created = await record_stripe_event(db, payload)
+    if not created:
+        print(f"Ignoring duplicate webhook event {event['id']}")
+
+    return {"status": "success"}
+
+
+async def apply_stripe_event(event: dict, db: AsyncSession):
+    """Apply a stored Stripe event. The caller commits the transaction."""
     event_type = event["type"]
-    print(f"Received webhook event: {event_type}")
 
     if event_type == "checkout.session.completed":
         session = event["data"]["object"]
@@ -160,184 +174,156 @@ async def stripe_webhook(
             f"Processing customer.subscription.deleted for subscription {subscription.get('id')}"
         )
         await handle_subscription_deleted(subscription, db)
-    elif event_type == "invoice.payment_succeeded":
+    elif event_type == "invoice.deleted":
         invoice = event["data"]["object"]
-        print(f"Processing invoice.payment_succeeded for invoice {invoice.get('id')}")
-        if invoice["billing_reason"] == "subscription_cycle":
+        await delete_invoice(db, invoice["id"])
+    elif event_type.startswith("invoice."):
+        invoice = event["data"]["object"]
+        print(f"Processing {event_type} for invoice {invoice.get('id')}")
+        # Keep the local invoice mirror in sync with every invoice change
+        await upsert_invoices(db, [invoice])
+        if (
+            event_type == "invoice.payment_succeeded"
+            and invoice["billing_reason"] == "subscription_cycle"
+        ):
             await handle_subscription_renewal(invoice, db)
     else:
         print(f"Unhandled webhook event type: {event_type}")
 
-    return {"status": "success"}
-
 
 async def handle_checkout_session_completed(session, db: AsyncSession):
     """Handle checkout session completion for both one-time payments and subscriptions"""
-    try:
-        customer_id = session["customer"]
-        mode = session["mode"]
-
-        # Find the user by Stripe customer ID
-        result = await db.execute(
-            select(User).filter(User.stripe_customer_id == customer_id)
-        )
-        user = result.scalars().first()
-
-        if not user:
-            print(f"User not found for customer {customer_id}")
-            return
+    customer_id = session["customer"]
+    mode = session["mode"]
 
-        if mode == "payment":
-            # Handle one-time payment (credits purchase)
-            line_items = stripe.checkout.Session.list_line_items(session["id"])
-            quantity = sum(item["quantity"] for item in line_items["data"])
+    # Find the user by Stripe customer ID
+    result = await db.execute(
+        select(User).filter(User.stripe_customer_id == customer_id)
+    )
+    user = result.scalars().first()
 
-            if user.credits is None:
-                user.credits = 0
-            user.credits += quantity
-            await db.commit()
+    if not user:
+        print(f"User not found for customer {customer_id}")
+        return
+
+    if mode == "payment":
+        # Handle one-time payment (credits purchase)
+        # Runs in the event consumer, so keep the blocking call off the loop
+        line_items = await asyncio.to_thread(
+            stripe.checkout.Session.list_line_items, session["id"]
+        )
+        quantity = sum(item["quantity"] for item in line_items["data"])
 
-        elif mode == "subscription":
-            # Subscription will be handled by subscription.created webhook
-            pass
+        if user.credits is None:
+            user.credits = 0
+        user.credits += quantity
 
-    except Exception as e:
-        print(f"Error handling checkout session: {e}")
+    elif mode == "subscription":
+        # Subscription will be handled by subscription.created webhook
+        pass
 
 
 async def handle_subscription_created(subscription, db: AsyncSession):
     """Handle new subscription creation"""
-    try:
-        customer_id = subscription["customer"]
-        subscription_id = subscription["id"]
-        status = subscription["status"]
-        current_period_start = datetime.fromtimestamp(
-            subscription["current_period_start"]
-        )
-        current_period_end = datetime.fromtimestamp(subscription["current_period_end"])
-        price_id = subscription["items"]["data"][0]["price"]["id"]
+    customer_id = subscription["customer"]
+    subscription_id = subscription["id"]
+    status = subscription["status"]
+    current_period_start = datetime.fromtimestamp(subscription["current_period_start"])
+    current_period_end = datetime.fromtimestamp(subscription["current_period_end"])
+    price_id = subscription["items"]["data"][0]["price"]["id"]
+
+    # Find the user by Stripe customer ID
+    result = await db.execute(
+        select(User).filter(User.stripe_customer_id == customer_id)
+    )
+    user = result.scalars().first()
 
-        # Find the user by Stripe customer ID
-        result = await db.execute(
-            select(User).filter(User.stripe_customer_id == customer_id)
+    if not user:
+        print(
+            f"ERROR: User not found for customer {customer_id} in subscription creation"
         )
-        user = result.scalars().first()
-
-        if not user:
-            print(
-                f"ERROR: User not found for customer {customer_id} in subscription creation"
-            )
-            return
-
-        # Update user subscription info
-        user.stripe_subscription_id = subscription_id
-        user.subscription_status = status
-        user.subscription_current_period_start = current_period_start
-        user.subscription_current_period_end = current_period_end
-        user.subscription_cancel_at_period_end = False
-        user.plan_id = price_id
-
-        # Grant initial credits for Pro plan (200 credits)
-        if user.credits is None:
-            user.credits = 0
-        user.credits += 200
-
-        await db.commit()
-
-    except Exception as e:
-        print(f"CRITICAL ERROR handling subscription creation: {e}")
-        import traceback
-
-        traceback.print_exc()
+        return
+
+    # Update user subscription info
+    user.stripe_subscription_id = subscription_id
+    user.subscription_status = status
+    user.subscription_current_period_start = current_period_start
+    user.subscription_current_period_end = current_period_end
+    user.subscription_cancel_at_period_end = False
+    user.plan_id = price_id
+
+    # Grant initial credits for Pro plan (200 credits)
+    if user.credits is None:
+        user.credits = 0
+    user.credits += 200
 
 
 async def handle_subscription_updated(subscription, db: AsyncSession):
     """Handle subscription updates (status changes, etc.)"""
-    try:
-        subscription_id = subscription["id"]
-        status = subscription["status"]
-        current_period_start = datetime.fromtimestamp(
-            subscription["current_period_start"]
-        )
-        current_period_end = datetime.fromtimestamp(subscription["current_period_end"])
-        cancel_at_period_end = subscription.get("cancel_at_period_end", False)
-
-        # Find the user by subscription ID
-        result = await db.execute(
-            select(User).filter(User.stripe_subscription_id == subscription_id)
-        )
-        user = result.scalars().first()
+    subscription_id = subscription["id"]
+    status = subscription["status"]
+    current_period_start = datetime.fromtimestamp(subscription["current_period_start"])
+    current_period_end = datetime.fromtimestamp(subscription["current_period_end"])
+    cancel_at_period_end = subscription.get("cancel_at_period_end", False)
 
-        if not user:
-            print(f"User not found for subscription {subscription_id}")
-            return
-
-        # Update subscription info
-        user.subscription_status = status
-        user.subscription_current_period_start = current_period_start
-        user.subscription_current_period_end = current_period_end
-        user.subscription_cancel_at_period_end = cancel_at_period_end
+    # Find the user by subscription ID
+    result = await db.execute(
+        select(User).filter(User.stripe_subscription_id == subscription_id)
+    )
+    user = result.scalars().first()
 
-        await db.commit()
+    if not user:
+        print(f"User not found for subscription {subscription_id}")
+        return
 
-    except Exception as e:
-        print(f"Error handling subscription update: {e}")
+    # Update subscription info
+    user.subscription_status = status
+    user.subscription_current_period_start = current_period_start
+    user.subscription_current_period_end = current_period_end
+    user.subscription_cancel_at_period_end = cancel_at_period_end
 
 
 async def handle_subscription_deleted(subscription, db: AsyncSession):
     """Handle subscription cancellation"""
-    try:
-        subscription_id = subscription["id"]
-
-        # Find the user by subscription ID
-        result = await db.execute(
-            select(User).filter(User.stripe_subscription_id == subscription_id)
-        )
-        user = result.scalars().first()
+    subscription_id = subscription["id"]
 
-        if not user:
-            print(f"User not found for subscription {subscription_id}")
-            return
-
-        # Clear subscription info
-        user.subscription_status = "canceled"
-        user.stripe_subscription_id = None
-        user.subscription_current_period_start = None
-        user.subscription_current_period_end = None
-        user.subscription_cancel_at_period_end = False
-        user.plan_id = None
+    # Find the user by subscription ID
+    result = await db.execute(
+        select(User).filter(User.stripe_subscription_id == subscription_id)
+    )
+    user = result.scalars().first()
 
-        await db.commit()
+    if not user:
+        print(f"User not found for subscription {subscription_id}")
+        return
 
-    except Exception as e:
-        print(f"Error handling subscription deletion: {e}")
+    # Clear subscription info
+    user.subscription_status = "canceled"
+    user.stripe_subscription_id = None
+    user.subscription_current_period_start = None
+    user.subscription_current_period_end = None
+    user.subscription_cancel_at_period_end = False
+    user.plan_id = None
 
 
 async def handle_subscription_renewal(invoice, db: AsyncSession):
     """Handle subscription renewal (monthly credit grant)"""
-    try:
-        customer_id = invoice["customer"]
-        subscription_id = invoice["subscription"]
+    customer_id = invoice["customer"]
 
-        # Find the user by Stripe customer ID
-        result = await db.execute(
-            select(User).filter(User.stripe_customer_id == customer_id)
-        )
-        user = result.scalars().first()
-
-        if not user:
-            print(f"User not found for customer {customer_id}")
-            return
-
-        # Grant 200 credits for Pro plan renewal
-        if user.credits is None:
-            user.credits = 0
-        user.credits += 200
+    # Find the user by Stripe customer ID
+    result = await db.execute(
+        select(User).filter(User.stripe_customer_id == customer_id)
+    )
+    user = result.scalars().first()
 
-        await db.commit()
+    if not user:
+        print(f"User not found for customer {customer_id}")
+        return
 
-    except Exception as e:
-        print(f"Error handling subscription renewal: {e}")
+    # Grant 200 credits for Pro plan renewal
+    if user.credits is None:
+        user.credits = 0
+    user.credits += 200
 
 
 async def get_price_id(package_type: str) -> str:
@@ -362,61 +348,25 @@ async def get_price_id(package_type: str) -> str:
 @router.post(
     "/complete-checkout-session", response_model=CompleteCheckoutSessionResponse
 )
-async def complete_checkout_session(
-    session_id: str = Body(...),
-    db: AsyncSession = Depends(get_async_session),
-):
-    try:
-        # Retrieve the session from Stripe
-        session = stripe.checkout.Session.retrieve(session_id)
-
-        # Call the function to handle the session and get the total amount and currency
-        total_amount, currency = await handle_checkout_session_legacy(session, db)
+async def complete_checkout_session(session_id: str = Body(...)):
+    """Report the outcome of a one-time checkout for the payment status page.
 
-        return {
-            "status": "success",
-            "amount": total_amount,
-            "currency": currency,  # Use the currency returned from the session
-        }
+    Read-only: the credits are granted once, by the checkout.session.completed
+    webhook event.
+    """
+    try:
+        session = await asyncio.to_thread(stripe.checkout.Session.retrieve, session_id)
     except stripe.error.StripeError as e:
         raise HTTPException(status_code=500, detail=f"Stripe API error: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
+    return checkout_session_summary(session)
 
-async def handle_checkout_session_legacy(session, db: AsyncSession):
-    # Extract the customer ID from the session
-    customer_id = session["customer"]
 
-    # Retrieve the line items for the session
-    line_items = stripe.checkout.Session.list_line_items(session["id"])
-
-    # Extract the quantity and calculate the total amount from the line items
-    quantity = sum(item["quantity"] for item in line_items["data"])
-    total_amount = (
-        sum(item["amount_total"] for item in line_items["data"]) / 100
-    )  # Stripe amounts are in cents
-
-    # Extract the currency from the first line item (assuming all items have the same currency)
-    currency = line_items["data"][0]["currency"] if line_items["data"] else "USD"
-
-    # Retrieve the user from the database using the customer ID
-    result = await db.execute(
-        select(User).filter(User.stripe_customer_id == customer_id)
-    )
-
-    user = result.scalars().first()
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    if user.credits == None:
-        user.credits = 0
-    # Update the user's credits
-    user.credits += quantity
-    await db.commit()
-
-    return total_amount, currency
+def checkout_session_summary(session):
+    return {
+        "status": "success" if session["payment_status"] == "paid" else "pending",
+        "amount": (session["amount_total"] or 0) / 100,  # Stripe amounts are in cents
+        "currency": session["currency"] or "usd",
+    }
 
 
 @router.get("/subscription", response_model=SubscriptionInfo)
@@ -570,32 +520,51 @@ async def get_checkout_session_info(
 
 @router.get("/invoices", response_model=list[Invoice])
 async def get_user_invoices(
+    response: Response,
     user: User = Depends(current_active_user),
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_read_session),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: str | None = None,
 ):
-    try:
-        # Ensure the user has a Stripe customer ID
-        if not user.stripe_customer_id:
-            raise HTTPException(
-                status_code=404, detail="User has no Stripe customer ID"
-            )
+    """Get the user's invoices, newest first, from the local invoice mirror.
 
-        # Retrieve the invoices from Stripe
-        invoices = stripe.Invoice.list(customer=user.stripe_customer_id, limit=10)
+    Pass the X-Next-Cursor response header back as `cursor` to fetch the next page.
+    """
+    # Ensure the user has a Stripe customer ID
+    if not user.stripe_customer_id:
+        raise HTTPException(status_code=404, detail="User has no Stripe customer ID")
 
-        # Format the invoice data
-        invoice_data = [
-            {
-                "invoice_link": invoice.hosted_invoice_url,
-                "date": invoice.created,
-                "amount": str(invoice.total / 100),  # Stripe amounts are in cents
-                "credits": sum(item.quantity for item in invoice.lines.data),
-            }
-            for invoice in invoices.data
-        ]
+    query = select(StripeInvoice).where(
+        StripeInvoice.customer_id == user.stripe_customer_id,
+        StripeInvoice.hosted_invoice_url.is_not(None),  # Drafts have no link yet
+    )
+    if cursor:
+        created, invoice_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                StripeInvoice.created < created,
+                and_(StripeInvoice.created == created, StripeInvoice.id < invoice_id),
+            )
+        )
 
-        return invoice_data
-    except stripe.error.StripeError as e:
-        raise HTTPException(status_code=500, detail=f"Stripe API error: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    result = await db.execute(
+        query.order_by(StripeInvoice.created.desc(), StripeInvoice.id.desc()).limit(
+            limit + 1
+        )
+    )
+    invoices = result.scalars().all()
+
+    if len(invoices) > limit:
+        invoices = invoices[:limit]
+        last = invoices[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created, last.id)
+
+    return [
+        {
+            "invoice_link": invoice.hosted_invoice_url,
+            "date": invoice.created,
+            "amount": str(invoice.total / 100),  # Stripe amounts are in cents
+            "credits": invoice.credits,
+        }
+        for invoice in invoices
+    ]
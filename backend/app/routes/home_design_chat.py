@@ -1,9 +1,23 @@
-from typing import List, Dict, Any, AsyncGenerator
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from typing import List, Dict, Any, AsyncGenerator, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_async_session
+from app.conditional import (
+    is_not_modified,
+    make_etag,
+    not_modified_response,
+    validator_headers,
+)
+from app.conversations import (
+    append_conversation_messages,
+    attach_image_to_last_assistant_message,
+)
+from app.database import get_async_session, get_read_session
+from app.metrics import SSE_CONNECTIONS, observe_dependency, track_image_generation
+from app.background import image_generations, server_shutdown
+from app.http_client import get_http_client
+from app.providers import fal_client, get_claude_client, get_s3_client
 from app.models import (
     HomeDesignProject,
     HomeDesignConversation,
@@ -12,6 +26,7 @@ from app.models import (
     OAuthAccount,
 )
 from fastapi_users.db import SQLAlchemyUserDatabase
+from app.serializers import CONVERSATION_LIST, EDIT_LIST, json_list_response
 from app.schemas import (
     HomeDesignChatRequest,
     HomeDesignChatResponse,
@@ -23,14 +38,9 @@ from app.schemas import (
 from app.users import current_active_user
 from uuid import uuid4
 import asyncio
-import aioboto3
-from botocore.exceptions import NoCredentialsError
-import aiohttp
 from app.config import settings
-import fal_client
 import os
 from datetime import datetime
-import anthropic
 import json
 import weakref
 from collections import defaultdict
@@ -39,9 +49,6 @@ import jwt
 
 router = APIRouter(tags=["home-design-chat"])
 
-# Initialize Claude client (ASYNC version)
-claude_client = anthropic.AsyncAnthropic(api_key=settings.CLAUDE_API_KEY)
-
 bucket_name = "homeideasai"
 
 
@@ -86,12 +93,8 @@ async def upload_to_s3(
     file_data: bytes, key: str, content_type: str = "image/png"
 ) -> str:
     """Upload file data to S3 asynchronously"""
-    session = aioboto3.Session()
-    async with session.client(
-        "s3",
-        aws_access_key_id=settings.S3_AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.S3_AWS_SECRET_ACCESS_KEY,
-    ) as s3_client:
+    s3_client = await get_s3_client()
+    with observe_dependency("s3"):
         await s3_client.put_object(
             Bucket=bucket_name,
             Key=key,
@@ -102,6 +105,7 @@ async def upload_to_s3(
 
 
 # Background task for image generation
+@track_image_generation
 async def process_image_generation_background(
     project_id: str,
     user_id: str,
@@ -150,22 +154,10 @@ async def process_image_generation_background(
                 )
                 db.add(edit)
 
-                # Update conversation with generated image
-                conv_result = await db.execute(
-                    select(HomeDesignConversation).where(
-                        HomeDesignConversation.id == conversation_id
-                    )
+                # Update the last assistant message with the generated image
+                await attach_image_to_last_assistant_message(
+                    db, conversation_id, new_image_url
                 )
-                conversation = conv_result.scalar_one_or_none()
-                if conversation and conversation.messages:
-                    # Update the last assistant message with the image
-                    messages = conversation.messages
-                    for i in range(len(messages) - 1, -1, -1):
-                        if messages[i]["role"] == "assistant":
-                            messages[i]["image_url"] = new_image_url
-                            break
-                    conversation.messages = messages
-                    conversation.updated_at = datetime.utcnow()
 
                 await db.commit()
 
@@ -200,11 +192,12 @@ async def process_image_generation_background(
 @router.post(
     "/chat",
     response_model=HomeDesignChatResponse,
-    responses={400: {"model": ErrorResponse}},
+    responses={400: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
+    # Replies may queue an image generation, which is refused while draining
+    dependencies=[Depends(image_generations.require_accepting)],
 )
 async def home_design_chat(
     request: HomeDesignChatRequest,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_async_session),
     user: User = Depends(current_active_user),
 ) -> HomeDesignChatResponse:
@@ -229,6 +222,7 @@ async def home_design_chat(
 
         # Get conversation history if conversation_id is provided
         conversation_history = []
+        conversation = None
         if request.conversation_id:
             conv_result = await db.execute(
                 select(HomeDesignConversation).where(
@@ -250,7 +244,6 @@ async def home_design_chat(
             project.room_type,
             project.style_preference,
             project.current_image_url,
-            background_tasks,  # Pass background tasks to handle tool calls directly
             request.project_id,
             str(user.id),
             conversation_id,
@@ -261,7 +254,7 @@ async def home_design_chat(
 
         # Create or update conversation
         # Add user message and assistant response to history
-        new_messages = conversation_history + [
+        new_messages = [
             {
                 "role": "user",
                 "content": request.message,
@@ -274,10 +267,9 @@ async def home_design_chat(
             },
         ]
 
-        if request.conversation_id:
-            # Update existing conversation
-            conversation.messages = new_messages
-            conversation.updated_at = datetime.utcnow()
+        if conversation:
+            # Append to the stored array in place instead of rewriting it
+            await append_conversation_messages(db, conversation.id, new_messages)
         else:
             # Create new conversation
             conversation = HomeDesignConversation(
@@ -292,8 +284,10 @@ async def home_design_chat(
         # Handle different response types
         image_url = None
         if agentic_response["type"] == "design_generation_queued":
-            # Background task has already been queued in get_agentic_claude_response
-            # Deduct credit for queued generation
+            # Refuse (before charging) if the worker began shutting down while
+            # Claude was answering; the client retries on another worker
+            image_generations.require_accepting()
+            # Deduct credit for queued generation; it starts after the commit
             user.credits = max(0, user.credits - 1)
 
         elif (
@@ -322,6 +316,13 @@ async def home_design_chat(
 
         await db.commit()
 
+        if agentic_response["type"] == "design_generation_queued":
+            # Only now are the conversation and the paid credit stored. It was
+            # admitted above, so it runs even if shutdown began during the commit.
+            image_generations.track(
+                process_image_generation_background(**agentic_response["generation"])
+            )
+
         # Build response based on agentic response type
         response_data = {
             "message": ChatMessage(
@@ -382,17 +383,18 @@ Return a JSON object with this exact structure:
 
 Make the options specific to their request, not generic design styles."""
 
-        response = await claude_client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=800,
-            system=system_prompt,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"Generate specific design options for: {user_request or 'this space'}",
-                }
-            ],
-        )
+        with observe_dependency("claude"):
+            response = await get_claude_client().messages.create(
+                model="claude-sonnet-4-20250514",
+                max_tokens=800,
+                system=system_prompt,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": f"Generate specific design options for: {user_request or 'this space'}",
+                    }
+                ],
+            )
 
         # Parse Claude's response
         response_text = response.content[0].text if response.content else ""
@@ -483,7 +485,6 @@ async def get_agentic_claude_response(
     room_type: str,
     style_preference: str,
     project_image_url: str,
-    background_tasks: BackgroundTasks = None,
     project_id: str = None,
     user_id: str = None,
     conversation_id: str = None,
@@ -560,13 +561,14 @@ For `provide_design_options`, make your analysis_note specific to what they're a
 **The image is already available - proceed with analysis and design work immediately.**"""
 
     try:
-        response = await claude_client.messages.create(
-            model="claude-sonnet-4-20250514",  # Using Claude Sonnet 4!
-            max_tokens=1000,
-            system=system_prompt,
-            messages=messages,
-            tools=tools,
-        )
+        with observe_dependency("claude"):
+            response = await get_claude_client().messages.create(
+                model="claude-sonnet-4-20250514",  # Using Claude Sonnet 4!
+                max_tokens=1000,
+                system=system_prompt,
+                messages=messages,
+                tools=tools,
+            )
 
         # Handle tool calls - iterate through all content blocks
         if response.content and len(response.content) > 0:
@@ -592,33 +594,28 @@ For `provide_design_options`, make your analysis_note specific to what they're a
                         }
 
                     elif tool_name == "generate_design_transformation":
-                        # Queue the image generation as a background task if background_tasks is provided
-                        if (
-                            background_tasks
-                            and project_id
-                            and user_id
-                            and conversation_id
-                        ):
+                        # Queue the image generation in the background when
+                        # there is a conversation to attach the result to. The
+                        # caller starts it once the credit is committed.
+                        if project_id and user_id and conversation_id:
                             transformation_request = tool_input.get(
                                 "transformation_request", current_message
                             )
 
-                            background_tasks.add_task(
-                                process_image_generation_background,
-                                project_id=project_id,
-                                user_id=user_id,
-                                transformation_request=transformation_request,
-                                image_url=project_image_url,
-                                room_type=room_type,
-                                style_preference=style_preference,
-                                conversation_id=conversation_id,
-                                prompt=current_message,
-                            )
-
                             return {
                                 "type": "design_generation_queued",
                                 "message": f"{tool_input.get('style_note', 'I\'m creating your transformed design!')}\n\nI'm generating your design transformation now. This may take a few moments - you'll see the result appear shortly.",
                                 "processing": True,
+                                "generation": {
+                                    "project_id": project_id,
+                                    "user_id": user_id,
+                                    "transformation_request": transformation_request,
+                                    "image_url": project_image_url,
+                                    "room_type": room_type,
+                                    "style_preference": style_preference,
+                                    "conversation_id": conversation_id,
+                                    "prompt": current_message,
+                                },
                             }
                         else:
                             # Fallback to synchronous generation if no background task support
@@ -672,19 +669,20 @@ async def edit_image_with_nano_banana(image_url: str, prompt: str) -> str:
         # Add additional constraints for better editing
         enhanced_prompt = f"{prompt}. IMPORTANT: Preserve the exact camera angle, room layout, and all elements not mentioned in the edit request. Do not change the overall room perspective or add/remove major architectural elements."
 
-        handler = await fal_client.submit_async(
-            "fal-ai/nano-banana/edit",
-            arguments={
-                "prompt": enhanced_prompt,
-                "image_urls": [image_url],  # Note: expects array of URLs
-            },
-        )
+        with observe_dependency("fal"):
+            handler = await fal_client.submit_async(
+                "fal-ai/nano-banana/edit",
+                arguments={
+                    "prompt": enhanced_prompt,
+                    "image_urls": [image_url],  # Note: expects array of URLs
+                },
+            )
 
-        # Wait for completion
-        async for event in handler.iter_events(with_logs=True):
-            print(event)
+            # Wait for completion
+            async for event in handler.iter_events(with_logs=True):
+                print(event)
 
-        result = await handler.get()
+            result = await handler.get()
         edited_image_url = result["images"][0]["url"]
 
         # Download and upload to our S3
@@ -717,19 +715,20 @@ async def edit_image_with_flux_pro(image_url: str, prompt: str) -> str:
         # Add additional constraints for Flux Pro as well
         enhanced_prompt = f"{prompt}. IMPORTANT: Preserve the exact camera angle, room layout, and all elements not mentioned in the edit request. Do not change the overall room perspective or add/remove major architectural elements."
 
-        handler = await fal_client.submit_async(
-            "fal-ai/flux-pro",
-            arguments={
-                "prompt": enhanced_prompt,
-                "image_url": image_url,
-            },
-        )
+        with observe_dependency("fal"):
+            handler = await fal_client.submit_async(
+                "fal-ai/flux-pro",
+                arguments={
+                    "prompt": enhanced_prompt,
+                    "image_url": image_url,
+                },
+            )
 
-        # Wait for completion
-        async for event in handler.iter_events(with_logs=True):
-            print(event)
+            # Wait for completion
+            async for event in handler.iter_events(with_logs=True):
+                print(event)
 
-        result = await handler.get()
+            result = await handler.get()
         edited_image_url = result["images"][0]["url"]
 
         # Download and upload to our S3
@@ -748,31 +747,56 @@ async def edit_image_with_flux_pro(image_url: str, prompt: str) -> str:
 
 async def download_image(url: str) -> bytes:
     """Download image data from a URL"""
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            response.raise_for_status()
-            return await response.read()
+    response = await get_http_client().get(url, follow_redirects=True)
+    response.raise_for_status()
+    return response.content
+
+
+async def get_children_version(
+    db: AsyncSession, model, timestamp_column, project_id: str, user_id
+) -> Tuple[str, Optional[datetime]]:
+    """ETag and Last-Modified for a project's conversations or edits.
+
+    One aggregate over the (project_id, timestamp) index that also checks
+    ownership; raises 404 when the user has no such project.
+    """
+    result = await db.execute(
+        select(func.count(model.id), func.max(timestamp_column))
+        .select_from(HomeDesignProject)
+        .outerjoin(model, model.project_id == HomeDesignProject.id)
+        .where(HomeDesignProject.id == project_id, HomeDesignProject.user_id == user_id)
+        .group_by(HomeDesignProject.id)
+    )
+    version = result.one_or_none()
+    if not version:
+        raise HTTPException(status_code=404, detail="Project not found")
+    count, last_modified = version
+    return make_etag(project_id, count, last_modified), last_modified
 
 
 @router.get(
-    "/conversations/{project_id}", response_model=List[HomeDesignConversationRead]
+    "/conversations/{project_id}",
+    response_model=List[HomeDesignConversationRead],
+    responses={304: {"description": "Not modified"}},
 )
 async def get_project_conversations(
     project_id: str,
-    db: AsyncSession = Depends(get_async_session),
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
     user: User = Depends(current_active_user),
 ):
-    """Get all conversations for a project"""
-    # Verify project ownership
-    project_result = await db.execute(
-        select(HomeDesignProject).where(
-            HomeDesignProject.id == project_id, HomeDesignProject.user_id == user.id
-        )
+    """Get all conversations for a project, or 304 when none changed"""
+    # Verifies project ownership too
+    etag, last_modified = await get_children_version(
+        db,
+        HomeDesignConversation,
+        HomeDesignConversation.updated_at,
+        project_id,
+        user.id,
     )
-    project = project_result.scalar_one_or_none()
-
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    headers = validator_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(headers)
 
     # Get conversations
     result = await db.execute(
@@ -782,26 +806,28 @@ async def get_project_conversations(
     )
     conversations = result.scalars().all()
 
-    return conversations
+    return json_list_response(CONVERSATION_LIST, conversations, headers)
 
 
-@router.get("/edits/{project_id}", response_model=List[HomeDesignEditRead])
+@router.get(
+    "/edits/{project_id}",
+    response_model=List[HomeDesignEditRead],
+    responses={304: {"description": "Not modified"}},
+)
 async def get_project_edits(
     project_id: str,
-    db: AsyncSession = Depends(get_async_session),
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
     user: User = Depends(current_active_user),
 ):
-    """Get all edits for a project"""
-    # Verify project ownership
-    project_result = await db.execute(
-        select(HomeDesignProject).where(
-            HomeDesignProject.id == project_id, HomeDesignProject.user_id == user.id
-        )
+    """Get all edits for a project, or 304 when there are no new ones"""
+    # Edits are never modified, so their count and newest created_at version them
+    etag, last_modified = await get_children_version(
+        db, HomeDesignEdit, HomeDesignEdit.created_at, project_id, user.id
     )
-    project = project_result.scalar_one_or_none()
-
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    headers = validator_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(headers)
 
     # Get edits
     result = await db.execute(
@@ -811,7 +837,7 @@ async def get_project_edits(
     )
     edits = result.scalars().all()
 
-    return edits
+    return json_list_response(EDIT_LIST, edits, headers)
 
 
 @router.post("/analyze-image")
@@ -954,6 +980,7 @@ async def project_events_stream(
 
     async def event_generator() -> AsyncGenerator[str, None]:
         """Generate SSE formatted messages"""
+        SSE_CONNECTIONS.inc()
         try:
             # Send initial connection message
             connection_data = {"type": "connected", "project_id": project_id}
@@ -964,7 +991,13 @@ async def project_events_stream(
                 while True:
                     try:
                         # Wait for events with timeout to send periodic keepalive
-                        event_data = await asyncio.wait_for(queue.get(), timeout=30.0)
+                        event_data = await server_shutdown.wait_for(
+                            queue.get(), timeout=30.0
+                        )
+                        if event_data is None:
+                            # The worker is stopping; ending the stream lets it
+                            # exit and the client reconnects to another worker
+                            break
                         yield f"data: {json.dumps(event_data)}\n\n"
                     except asyncio.TimeoutError:
                         # Send keepalive
@@ -979,6 +1012,8 @@ async def project_events_stream(
         except Exception as e:
             print(f"Error in event generator: {e}")
             yield f"data: {json.dumps({'type': 'error', 'message': 'Stream error'})}\n\n"
+        finally:
+            SSE_CONNECTIONS.dec()
 
     return StreamingResponse(
         event_generator(),
@@ -1,9 +1,29 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy import select
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    UploadFile,
+    File,
+    Form,
+    Query,
+    Request,
+    Response,
+)
+from sqlalchemy import and_, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_async_session
+from app.conditional import (
+    is_not_modified,
+    make_etag,
+    not_modified_response,
+    validator_headers,
+)
+from app.database import get_async_session, get_read_session
+from app.metrics import observe_dependency
 from app.models import HomeDesignProject, User
+from app.providers import botocore_exceptions, get_s3_client
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.serializers import PROJECT_LIST, json_list_response
 from app.schemas import (
     HomeDesignProjectCreate,
     HomeDesignProjectRead,
@@ -12,20 +32,10 @@ from app.schemas import (
     ErrorResponse,
 )
 from app.users import current_active_user
-from uuid import uuid4
-import aiohttp
-import boto3
-from botocore.exceptions import NoCredentialsError
-from app.config import settings
+from uuid import UUID, uuid4
 
 router = APIRouter(tags=["home-design-projects"])
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=settings.S3_AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.S3_AWS_SECRET_ACCESS_KEY,
-)
-
 bucket_name = "homeideasai"
 
 
@@ -33,6 +43,7 @@ bucket_name = "homeideasai"
 async def upload_image(
     file: UploadFile = File(...),
     user: User = Depends(current_active_user),
+    s3_client=Depends(get_s3_client),
 ):
     """Upload an image to S3 for home design projects"""
     if not file.content_type.startswith("image/"):
@@ -48,15 +59,16 @@ async def upload_image(
 
     try:
         # Upload to S3
-        s3_client.put_object(
-            Bucket=bucket_name,
-            Key=key,
-            Body=content,
-            ContentType=file.content_type,
-        )
+        with observe_dependency("s3"):
+            await s3_client.put_object(
+                Bucket=bucket_name,
+                Key=key,
+                Body=content,
+                ContentType=file.content_type,
+            )
         image_url = f"https://cdn.{bucket_name}.com/{key}"
         return ImageUploadResponse(image_url=image_url)
-    except NoCredentialsError:
+    except botocore_exceptions.NoCredentialsError:
         raise HTTPException(status_code=500, detail="AWS credentials not found")
 
 
@@ -91,30 +103,80 @@ async def create_project(
 
 @router.get("/projects", response_model=List[HomeDesignProjectRead])
 async def get_user_projects(
-    db: AsyncSession = Depends(get_async_session),
+    db: AsyncSession = Depends(get_read_session),
     user: User = Depends(current_active_user),
-    skip: int = 0,
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: str | None = None,
+    skip: int = Query(0, ge=0, deprecated=True),
 ):
-    """Get user's home design projects"""
+    """Get user's home design projects, most recently updated first.
+
+    Pass the X-Next-Cursor response header back as `cursor` to fetch the next
+    page. `skip` is kept for older clients and ignored when a cursor is given.
+    """
+    query = select(HomeDesignProject).where(HomeDesignProject.user_id == user.id)
+    if cursor:
+        updated_at, project_id = decode_cursor(cursor, UUID)
+        query = query.where(
+            or_(
+                HomeDesignProject.updated_at < updated_at,
+                and_(
+                    HomeDesignProject.updated_at == updated_at,
+                    HomeDesignProject.id < project_id,
+                ),
+            )
+        )
+    elif skip:
+        query = query.offset(skip)
+
     result = await db.execute(
-        select(HomeDesignProject)
-        .where(HomeDesignProject.user_id == user.id)
-        .order_by(HomeDesignProject.updated_at.desc())
-        .offset(skip)
-        .limit(limit)
+        query.order_by(
+            HomeDesignProject.updated_at.desc(), HomeDesignProject.id.desc()
+        ).limit(limit + 1)
     )
     projects = result.scalars().all()
-    return projects
 
+    headers = {}
+    if len(projects) > limit:
+        projects = projects[:limit]
+        last = projects[-1]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(last.updated_at, last.id)
 
-@router.get("/projects/{project_id}", response_model=HomeDesignProjectRead)
+    return json_list_response(PROJECT_LIST, projects, headers)
+
+
+@router.get(
+    "/projects/{project_id}",
+    response_model=HomeDesignProjectRead,
+    responses={304: {"description": "Not modified"}},
+)
 async def get_project(
     project_id: str,
-    db: AsyncSession = Depends(get_async_session),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_session),
     user: User = Depends(current_active_user),
 ):
-    """Get a specific project"""
+    """Get a specific project.
+
+    Conditional requests (If-None-Match, If-Modified-Since) are checked
+    against the project's updated_at before the row is loaded, and answered
+    with 304 when nothing changed.
+    """
+    if "If-None-Match" in request.headers or "If-Modified-Since" in request.headers:
+        result = await db.execute(
+            select(HomeDesignProject.id, HomeDesignProject.updated_at).where(
+                HomeDesignProject.id == project_id,
+                HomeDesignProject.user_id == user.id,
+            )
+        )
+        version = result.one_or_none()
+        if not version:
+            raise HTTPException(status_code=404, detail="Project not found")
+        etag = make_etag(version.id, version.updated_at)
+        if is_not_modified(request, etag, version.updated_at):
+            return not_modified_response(validator_headers(etag, version.updated_at))
+
     result = await db.execute(
         select(HomeDesignProject).where(
             HomeDesignProject.id == project_id, HomeDesignProject.user_id == user.id
@@ -125,6 +187,9 @@ async def get_project(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
+    response.headers.update(
+        validator_headers(make_etag(project.id, project.updated_at), project.updated_at)
+    )
     return project
 
 
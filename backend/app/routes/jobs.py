@@ -0,0 +1,24 @@
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_session
+from app.models import BackgroundJob, User
+from app.schemas import BackgroundJobRead
+from app.users import current_active_user
+
+router = APIRouter(tags=["jobs"])
+
+
+@router.get("/{job_id}", response_model=BackgroundJobRead)
+async def get_job(
+    job_id: UUID,
+    user: User = Depends(current_active_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    job = await db.get(BackgroundJob, job_id)
+    # Only whoever started a job can see it; scheduled jobs are for superusers
+    if job is None or not (user.is_superuser or job.user_id == user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
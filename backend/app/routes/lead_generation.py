@@ -1,18 +1,62 @@
-from fastapi import APIRouter, HTTPException, Request
-import requests
-from app.config import settings
-import re
+import json
+from typing import List
+
+from fastapi import APIRouter, File, HTTPException, Request, Depends, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import get_async_session
+from app.jobs import JobContext, create_job, register_job
+from app.lead_clients import (
+    BaserowClient,
+    CachedInstagramAnalyticsClient,
+    build_profile_fields,
+    extract_instagram_username,
+    get_baserow_client,
+    get_instagram_client,
+)
+from app.lead_imports import import_instagram_urls, parse_csv_urls
+from app.lead_sweeps import remove_duplicates, sync_leads, update_empty_names
+from app.leads import find_lead, remove_leads, upsert_leads
+from app.models import User
+from app.users import current_active_user
 
 router = APIRouter(tags=["lead-generation"])
 
+BASEROW_DATABASE_ID = "53215"
+BASEROW_TABLE_ID = "419321"
+BASEROW_WORKSPACE_ID = "753826"
+
+
+def baserow_row_url(row_id) -> str:
+    return f"https://baserow.io/database/{BASEROW_DATABASE_ID}/table/{BASEROW_TABLE_ID}/{BASEROW_WORKSPACE_ID}/row/{row_id}"
+
 
 @router.post("/baserow/webhook")
-async def baserow_webhook(request: Request):
+async def baserow_webhook(
+    request: Request,
+    db: AsyncSession = Depends(get_async_session),
+    baserow: BaserowClient = Depends(get_baserow_client),
+    instagram: CachedInstagramAnalyticsClient = Depends(get_instagram_client),
+):
     data = await request.json()
 
     # Extract necessary information from the webhook data
     table_id = data.get("table_id")
+
+    # Keep the local leads index in step with the table
+    if str(table_id) == BASEROW_TABLE_ID:
+        if data.get("event_type") == "rows.deleted":
+            await remove_leads(db, data.get("row_ids", []))
+            await db.commit()
+            return {"message": "Leads removed"}
+        # The Instagram Page of an updated row may have changed
+        await remove_leads(db, [item["id"] for item in data["items"]])
+        await upsert_leads(db, data["items"])
+        await db.commit()
+
     row_id = data["items"][0]["id"]
     username = (
         data["items"][0].get("Instagram Page", "").rstrip("/").split("/")[-1]
@@ -22,209 +66,74 @@ async def baserow_webhook(request: Request):
         return {"message": "Instagram username not found in the webhook data"}
 
     # Fetch Instagram analytics data
-    analytics_data = fetch_instagram_analytics(username)
+    analytics_data = await instagram.fetch(username)
 
     if not analytics_data:
         return {"message": "Failed to fetch Instagram analytics"}
 
-    # Extract email from Bio if present
-    bio = analytics_data.get("biography", "")
-    email_match = re.search(r"[\w\.-]+@[\w\.-]+", bio)
-    contact_email = email_match.group(0) if email_match else ""
+    # Update the row in Baserow
+    payload = build_profile_fields(analytics_data, default_name="Updated Name")
+    await baserow.update_row(table_id, row_id, payload)
 
-    # Prepare payload with all necessary fields
-    payload = {
-        "Name": analytics_data.get("name", "Updated Name"),
-        "Followers": analytics_data.get("followers_count", 0),
-        "Following": analytics_data.get("follows_count", 0),
-        "Bio": analytics_data.get("biography", ""),
-        "Media Count": analytics_data.get("media_count", 0),
-        "Engagement Rate": round(analytics_data.get("engagement_rate", 0.0), 4),
-        "Instagram Profile Website": analytics_data.get("website", ""),
-        "Contact Email": contact_email,
-    }
+    return {"message": "Row updated successfully"}
 
-    # Update the row in Baserow
-    baserow_url = f"https://api.baserow.io/api/database/rows/table/{table_id}/{row_id}/?user_field_names=true"
-    headers = {
-        "Authorization": f"Token {settings.BASEROW_API_TOKEN}",
-        "Content-Type": "application/json",
-    }
 
-    response = requests.patch(baserow_url, headers=headers, json=payload)
+@register_job("update-empty-names")
+async def run_update_empty_names(job: JobContext):
+    stats = await update_empty_names(
+        get_baserow_client(),
+        get_instagram_client(),
+        BASEROW_TABLE_ID,
+        checkpoint=job.checkpoint,
+        on_progress=job.save_progress,
+    )
+    return {"message": "Empty names updated successfully", **stats}
+
+
+@register_job("remove-duplicates")
+async def run_remove_duplicates(job: JobContext):
+    dry_run = job.params.get("dry_run", False)
+    report = await remove_duplicates(
+        get_baserow_client(),
+        BASEROW_TABLE_ID,
+        dry_run=dry_run,
+        checkpoint=job.checkpoint,
+        progress=job.progress,
+        on_progress=job.save_progress,
+    )
+    if dry_run:
+        return {"message": "Dry run: no rows were changed", **report}
+    return {
+        "message": "Duplicate rows removed and URLs normalized successfully",
+        **report,
+    }
 
-    if response.status_code != 200:
-        print(response.json())
-        raise HTTPException(
-            status_code=response.status_code, detail="Failed to update row"
-        )
 
-    return {"message": "Row updated successfully"}
+@register_job("sync-leads", every_seconds=settings.LEAD_SYNC_INTERVAL_SECONDS)
+async def run_sync_leads(job: JobContext):
+    return await sync_leads(get_baserow_client(), BASEROW_TABLE_ID)
 
 
-def fetch_instagram_analytics(username: str) -> dict:
-    url = f"https://api.usetevy.com/instagram-analytics/{username}"
-    headers = {
-        # "Authorization": f"Bearer undefined",
-        "Content-Type": "application/json",
-    }
-    response = requests.get(url, headers=headers)
-
-    if response.status_code != 200:
-        print(response.json())
-        return None
-        # raise HTTPException(
-        #     status_code=response.status_code,
-        #     detail="Failed to fetch Instagram analytics",
-        # )
-
-    return response.json()
-
-
-@router.get("/baserow/update-empty-names")
-async def update_empty_names_in_baserow():
-    table_id = "419321"  # Replace with your actual table ID
-    base_url = f"https://api.baserow.io/api/database/rows/table/{table_id}/?user_field_names=true"
-    headers = {
-        "Authorization": f"Token {settings.BASEROW_API_TOKEN}",
-        "Content-Type": "application/json",
-    }
+@router.get("/baserow/update-empty-names", status_code=202)
+async def update_empty_names_in_baserow(
+    user: User = Depends(current_active_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    # The sweep runs as a background job; poll /jobs/{job_id} for progress
+    job = await create_job(db, "update-empty-names", user_id=user.id)
+    return {"job_id": job.id, "status": job.status}
 
-    page = 1
-    email_to_row_id = {}  # Dictionary to track emails and their corresponding row IDs
-
-    while True:
-        response = requests.get(f"{base_url}&page={page}", headers=headers)
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail="Failed to fetch rows from Baserow",
-            )
-
-        data = response.json()
-        rows = data.get("results", [])
-
-        if not rows:
-            break  # Exit loop if no more rows are returned
-
-        for row in rows:
-            if not row.get("Name"):  # Check if the "Name" field is empty
-                username = row.get("Instagram Page", "").rstrip("/").split("/")[-1]
-                if username:
-                    analytics_data = fetch_instagram_analytics(username)
-                    if analytics_data:
-                        # Extract email
-                        contact_email = (
-                            re.search(
-                                r"[\w\.-]+@[\w\.-]+",
-                                analytics_data.get("biography", "") or "",
-                            ).group(0)
-                            if re.search(
-                                r"[\w\.-]+@[\w\.-]+",
-                                analytics_data.get("biography", "") or "",
-                            )
-                            else ""
-                        )
-
-                        # Update the row with the fetched analytics data
-                        payload = {
-                            "Name": analytics_data.get("name", "Updated Name"),
-                            "Followers": analytics_data.get("followers_count", 0),
-                            "Following": analytics_data.get("follows_count", 0),
-                            "Bio": analytics_data.get("biography", ""),
-                            "Media Count": analytics_data.get("media_count", 0),
-                            "Engagement Rate": round(
-                                analytics_data.get("engagement_rate", 0.0), 4
-                            ),
-                            "Instagram Profile Website": analytics_data.get(
-                                "website", ""
-                            ),
-                            "Contact Email": contact_email,
-                        }
-                        row_id = row["id"]
-                        update_url = f"https://api.baserow.io/api/database/rows/table/{table_id}/{row_id}/?user_field_names=true"
-                        update_response = requests.patch(
-                            update_url, headers=headers, json=payload
-                        )
-                        if update_response.status_code != 200:
-                            print(update_response.json())
-                            raise HTTPException(
-                                status_code=update_response.status_code,
-                                detail="Failed to update row",
-                            )
-
-        page += 1  # Move to the next page
-
-
-@router.delete("/baserow/remove-duplicates")
-async def remove_duplicate_rows():
-    table_id = "419321"  # Replace with your actual table ID
-    base_url = f"https://api.baserow.io/api/database/rows/table/{table_id}/?user_field_names=true"
-    headers = {
-        "Authorization": f"Token {settings.BASEROW_API_TOKEN}",
-        "Content-Type": "application/json",
-    }
 
-    page = 1
-    url_to_row_id = (
-        {}
-    )  # Dictionary to track normalized URLs and their corresponding row IDs
-
-    while True:
-        response = requests.get(f"{base_url}&page={page}", headers=headers)
-        if response.status_code != 200:
-            print(response.json(), "page", page)
-            raise HTTPException(
-                status_code=response.status_code,
-                detail="Failed to fetch rows from Baserow",
-            )
-
-        data = response.json()
-        rows = data.get("results", [])
-
-        if not rows:
-            break  # Exit loop if no more rows are returned
-
-        for row in rows:
-            instagram_page = row.get("Instagram Page", "").rstrip("/")
-            if instagram_page:
-                # Normalize the Instagram page URL
-                normalized_url = instagram_page.replace(
-                    "https://instagram.com/", "https://www.instagram.com/"
-                )
-
-                if normalized_url != instagram_page:
-                    # Update the row with the normalized URL
-                    update_payload = {"Instagram Page": normalized_url}
-                    update_url = f"https://api.baserow.io/api/database/rows/table/{table_id}/{row['id']}/?user_field_names=true"
-                    update_response = requests.patch(
-                        update_url, headers=headers, json=update_payload
-                    )
-                    if update_response.status_code != 200:
-                        print(update_response.json())
-                        raise HTTPException(
-                            status_code=update_response.status_code,
-                            detail="Failed to update row with normalized URL",
-                        )
-
-                # Check for duplicate URL
-                if normalized_url in url_to_row_id:
-                    # Delete the current row if duplicate URL is found
-                    delete_url = f"https://api.baserow.io/api/database/rows/table/{table_id}/{row['id']}/"
-                    delete_response = requests.delete(delete_url, headers=headers)
-                    if delete_response.status_code != 204:
-                        print(delete_response.json())
-                        raise HTTPException(
-                            status_code=delete_response.status_code,
-                            detail="Failed to delete duplicate row",
-                        )
-                else:
-                    # Store normalized URL and row ID
-                    url_to_row_id[normalized_url] = row["id"]
-
-        page += 1  # Move to the next page
-
-    return {"message": "Duplicate rows removed and URLs normalized successfully"}
+@router.delete("/baserow/remove-duplicates", status_code=202)
+async def remove_duplicate_rows(
+    dry_run: bool = False,
+    user: User = Depends(current_active_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    job = await create_job(
+        db, "remove-duplicates", {"dry_run": dry_run}, user_id=user.id
+    )
+    return {"job_id": job.id, "status": job.status}
 
 
 class InstagramURLRequest(BaseModel):
@@ -232,88 +141,105 @@ class InstagramURLRequest(BaseModel):
 
 
 @router.post("/process-instagram-url")
-async def process_instagram_url(request: InstagramURLRequest):
+async def process_instagram_url(
+    request: InstagramURLRequest,
+    db: AsyncSession = Depends(get_async_session),
+    baserow: BaserowClient = Depends(get_baserow_client),
+    instagram: CachedInstagramAnalyticsClient = Depends(get_instagram_client),
+):
     # Extract username from the URL, handling @ prefix
-    instagram_url = request.instagram_url.strip()
-    if instagram_url.startswith("@"):
-        instagram_url = instagram_url[1:]  # Remove the @ symbol
-
-    username = instagram_url.rstrip("/").split("/")[-1].split("?")[0]
+    username = extract_instagram_username(request.instagram_url)
     if not username:
         raise HTTPException(status_code=400, detail="Invalid Instagram URL")
 
-    # Check if the profile exists in Baserow
-    database_id = "53215"
-    table_id = "419321"
-    workspace_id = "753826"
-    baserow_url = f"https://api.baserow.io/api/database/rows/table/{table_id}/?user_field_names=true"
-    headers = {
-        "Authorization": f"Token {settings.BASEROW_API_TOKEN}",
-        "Content-Type": "application/json",
-    }
-
-    # Search for the profile in Baserow
-    search_url = f"{baserow_url}&search={username}"
-    response = requests.get(search_url, headers=headers)
-
-    if response.status_code != 200:
-        raise HTTPException(
-            status_code=response.status_code, detail="Failed to search Baserow"
-        )
-
-    existing_rows = response.json().get("results", [])
+    # Look the profile up in the local leads index
+    lead = await find_lead(db, username)
 
     # Fetch Instagram analytics
-    analytics_data = fetch_instagram_analytics(username)
+    analytics_data = await instagram.fetch(username)
     if not analytics_data:
         raise HTTPException(
             status_code=404, detail="Failed to fetch Instagram analytics"
         )
 
-    # Extract email from Bio if present
-    bio = analytics_data.get("biography", "")
-    email_match = re.search(r"[\w\.-]+@[\w\.-]+", bio)
-    contact_email = email_match.group(0) if email_match else ""
-
     # Prepare payload
     payload = {
         "Instagram Page": f"https://www.instagram.com/{username}",
-        "Name": analytics_data.get("name", ""),
-        "Followers": analytics_data.get("followers_count", 0),
-        "Following": analytics_data.get("follows_count", 0),
-        "Bio": analytics_data.get("biography", ""),
-        "Media Count": analytics_data.get("media_count", 0),
-        "Engagement Rate": round(analytics_data.get("engagement_rate", 0.0), 4),
-        "Instagram Profile Website": analytics_data.get("website", ""),
-        "Contact Email": contact_email,
+        **build_profile_fields(analytics_data),
     }
 
-    if existing_rows:
+    if lead is not None:
         # Update existing row
-        row_id = existing_rows[0]["id"]
-        update_url = f"https://api.baserow.io/api/database/rows/table/{table_id}/{row_id}/?user_field_names=true"
-        response = requests.patch(update_url, headers=headers, json=payload)
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code, detail="Failed to update existing row"
-            )
-        row_url = f"https://baserow.io/database/{database_id}/table/{table_id}/{workspace_id}/row/{row_id}"
-        return {
-            "message": "Profile updated successfully",
-            "data": response.json(),
-            "row_url": row_url,
-        }
-    else:
-        # Create new row
-        response = requests.post(baserow_url, headers=headers, json=payload)
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code, detail="Failed to create new row"
-            )
-        row_id = response.json().get("id")
-        row_url = f"https://baserow.io/database/{database_id}/table/{table_id}/{workspace_id}/row/{row_id}"
-        return {
-            "message": "Profile added successfully",
-            "data": response.json(),
-            "row_url": row_url,
-        }
+        row_id = lead.baserow_row_id
+        try:
+            data = await baserow.update_row(BASEROW_TABLE_ID, row_id, payload)
+            return {
+                "message": "Profile updated successfully",
+                "data": data,
+                "row_url": baserow_row_url(row_id),
+            }
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+            # The row was deleted in Baserow since it was indexed
+            await remove_leads(db, [row_id])
+
+    # Create new row
+    data = await baserow.create_row(BASEROW_TABLE_ID, payload)
+    await upsert_leads(db, [data])
+    await db.commit()
+    return {
+        "message": "Profile added successfully",
+        "data": data,
+        "row_url": baserow_row_url(data.get("id")),
+    }
+
+
+class BulkImportRequest(BaseModel):
+    instagram_urls: List[str]
+
+
+def stream_import_results(
+    urls: List[str],
+    baserow: BaserowClient,
+    instagram: CachedInstagramAnalyticsClient,
+) -> StreamingResponse:
+    if len(urls) > settings.LEAD_IMPORT_MAX_URLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.LEAD_IMPORT_MAX_URLS} URLs can be imported at once",
+        )
+
+    async def results():
+        async for result in import_instagram_urls(
+            baserow, instagram, BASEROW_TABLE_ID, urls
+        ):
+            if "row_id" in result:
+                result["row_url"] = baserow_row_url(result["row_id"])
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.post("/bulk-import")
+async def bulk_import_instagram_urls(
+    request: BulkImportRequest,
+    baserow: BaserowClient = Depends(get_baserow_client),
+    instagram: CachedInstagramAnalyticsClient = Depends(get_instagram_client),
+):
+    """Import many Instagram URLs, streaming one NDJSON result line per URL"""
+    return stream_import_results(request.instagram_urls, baserow, instagram)
+
+
+@router.post("/bulk-import/csv")
+async def bulk_import_instagram_csv(
+    file: UploadFile = File(...),
+    baserow: BaserowClient = Depends(get_baserow_client),
+    instagram: CachedInstagramAnalyticsClient = Depends(get_instagram_client),
+):
+    """Import the Instagram URLs of a CSV file, streaming results as NDJSON"""
+    try:
+        urls = parse_csv_urls(await file.read())
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded CSV")
+    return stream_import_results(urls, baserow, instagram)
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends, Body
 from sqlalchemy.orm import Session
-from app.models import Waitlist, User
+from app.models import User, Waitlist
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.database import get_async_session
-from app.users import get_user_manager, UserManager
+from app.jobs import JobContext, create_job, register_job
+from app.loops import dispatch_account_created_events
+from app.users import current_active_user
 
 router = APIRouter(tags=["waitlist"])
 
@@ -31,20 +33,24 @@ async def add_to_waitlist(
     return {"message": "Email added to waitlist successfully"}
 
 
-@router.post("/trigger-account-created")
+@register_job("trigger-account-created")
+async def run_trigger_account_created(job: JobContext):
+    stats = await dispatch_account_created_events(
+        idempotency_prefix=f"job-{job.job_id}",
+        checkpoint=job.checkpoint,
+        on_progress=job.save_progress,
+    )
+    return {
+        "message": f"Account created sequence triggered for {stats['events_sent']} users",
+        **stats,
+    }
+
+
+@router.post("/trigger-account-created", status_code=202)
 async def trigger_account_created_for_all(
+    user: User = Depends(current_active_user),
     db: AsyncSession = Depends(get_async_session),
-    user_manager: UserManager = Depends(get_user_manager),
 ):
-    # Get all users
-    result = await db.execute(select(User))
-    users = result.scalars().unique().all()
-
-    processed_count = 0
-    for user in users:
-        await user_manager.trigger_account_created(user)
-        processed_count += 1
-
-    return {
-        "message": f"Account created sequence triggered for {processed_count} users"
-    }
+    # Runs as a background job; poll /jobs/{job_id} for progress
+    job = await create_job(db, "trigger-account-created", user_id=user.id)
+    return {"job_id": job.id, "status": job.status}
@@ -186,3 +186,19 @@ class CancelSubscriptionResponse(BaseModel):
     success: bool
     message: str
     cancel_at_period_end: bool
+
+
+# Background job Schemas
+class BackgroundJobRead(BaseModel):
+    id: UUID
+    kind: str
+    status: str
+    progress: Optional[Dict[str, Any]] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,35 @@
+from typing import Any, Iterable, List, Mapping, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from .schemas import (
+    HomeDesignConversationRead,
+    HomeDesignEditRead,
+    HomeDesignProjectRead,
+)
+
+# Built once at import; each adapter holds the compiled pydantic-core validator
+# and serializer for its list type
+PROJECT_LIST = TypeAdapter(List[HomeDesignProjectRead])
+CONVERSATION_LIST = TypeAdapter(List[HomeDesignConversationRead])
+EDIT_LIST = TypeAdapter(List[HomeDesignEditRead])
+
+
+def json_list_response(
+    adapter: TypeAdapter,
+    rows: Iterable[Any],
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """Validate ORM rows and encode them to JSON bytes inside pydantic-core.
+
+    Returning a Response skips FastAPI's response_model pass (validate, dump to
+    Python objects, jsonable_encoder, json.dumps). The route keeps its
+    response_model for the OpenAPI schema.
+    """
+    items = adapter.validate_python(list(rows), from_attributes=True)
+    return Response(
+        content=adapter.dump_json(items),
+        media_type="application/json",
+        headers=headers,
+    )
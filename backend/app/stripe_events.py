@@ -0,0 +1,232 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .config import settings
+from .database import async_session_maker
+from .metrics import STRIPE_EVENTS_FAILED
+from .models import StripeEvent
+
+
+def get_event_customer_id(event: Dict[str, Any]) -> Optional[str]:
+    """Return the Stripe customer an event belongs to, used to order processing"""
+    obj = event["data"]["object"]
+    if obj.get("object") == "customer":
+        return obj.get("id")
+    customer = obj.get("customer")
+    if isinstance(customer, dict):
+        return customer.get("id")
+    return customer
+
+
+async def record_stripe_event(db: AsyncSession, payload: bytes) -> bool:
+    """Persist a verified webhook event, ignoring redeliveries of the same event ID.
+
+    Returns True if the event was new.
+    """
+    event = json.loads(payload)
+    stmt = (
+        insert(StripeEvent)
+        .values(
+            id=event["id"],
+            type=event["type"],
+            customer_id=get_event_customer_id(event),
+            payload=event,
+            stripe_created_at=datetime.utcfromtimestamp(event["created"]),
+            attempts=0,
+        )
+        .on_conflict_do_nothing(index_elements=[StripeEvent.id])
+    )
+    result = await db.execute(stmt)
+    await db.commit()
+
+    created = result.rowcount > 0
+    if created:
+        stripe_event_consumer.notify()
+    return created
+
+
+def _pending_filter():
+    return (
+        StripeEvent.processed_at.is_(None),
+        StripeEvent.attempts < settings.STRIPE_EVENT_MAX_ATTEMPTS,
+    )
+
+
+def _due_filter():
+    return (*_pending_filter(), StripeEvent.available_at <= func.now())
+
+
+def retry_delay(attempts: int) -> timedelta:
+    seconds = settings.STRIPE_EVENT_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+    return timedelta(
+        seconds=min(seconds, settings.STRIPE_EVENT_RETRY_MAX_BACKOFF_SECONDS)
+    )
+
+
+async def process_customer_events(
+    customer_id: Optional[str],
+    session_maker: async_sessionmaker = async_session_maker,
+    event_id: Optional[str] = None,
+) -> int:
+    """Apply the pending events of one customer in the order Stripe created them.
+
+    The whole batch runs in one transaction guarded by an advisory lock on the
+    customer, so workers never interleave events for the same customer and an
+    event is only marked processed together with the changes it made. Events
+    without a customer are processed individually by event ID.
+
+    A failed event is retried with exponential backoff, and the customer's
+    later events wait for it. After STRIPE_EVENT_MAX_ATTEMPTS it is given up
+    on (logged and counted in stripe_events_failed_total) and the rest go on.
+    """
+    from app.routes.billing import apply_stripe_event
+
+    lock_key = customer_id or event_id
+    processed = 0
+
+    async with session_maker() as db:
+        locked = await db.scalar(
+            text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"),
+            {"key": f"stripe_events:{lock_key}"},
+        )
+        if not locked:
+            # Another worker is already processing this customer
+            await db.rollback()
+            return 0
+
+        query = select(
+            StripeEvent, (StripeEvent.available_at <= func.now()).label("due")
+        ).where(*_pending_filter())
+        if customer_id is None:
+            query = query.where(StripeEvent.id == event_id)
+        else:
+            query = query.where(StripeEvent.customer_id == customer_id)
+        result = await db.execute(
+            query.order_by(StripeEvent.stripe_created_at, StripeEvent.id)
+        )
+        for stripe_event, due in result.all():
+            if not due:
+                # Backing off after a failure; later events wait behind it
+                break
+            try:
+                async with db.begin_nested():
+                    await apply_stripe_event(stripe_event.payload, db)
+            except Exception as e:
+                print(f"Error processing Stripe event {stripe_event.id}: {e}")
+                stripe_event.attempts += 1
+                stripe_event.last_error = str(e)
+                if stripe_event.attempts >= settings.STRIPE_EVENT_MAX_ATTEMPTS:
+                    print(
+                        f"ERROR: Giving up on Stripe event {stripe_event.id} "
+                        f"({stripe_event.type}) after {stripe_event.attempts} "
+                        f"attempts: {e}"
+                    )
+                    STRIPE_EVENTS_FAILED.labels(type=stripe_event.type).inc()
+                else:
+                    stripe_event.available_at = func.now() + retry_delay(
+                        stripe_event.attempts
+                    )
+                # Later events for this customer must wait for this one
+                break
+
+            stripe_event.attempts += 1
+            stripe_event.last_error = None
+            stripe_event.processed_at = datetime.utcnow()
+            processed += 1
+
+        await db.commit()
+
+    return processed
+
+
+async def process_pending_stripe_events(
+    session_maker: async_sessionmaker = async_session_maker,
+) -> int:
+    """Process a batch of pending events, one customer at a time per worker"""
+    async with session_maker() as db:
+        result = await db.execute(
+            select(StripeEvent.customer_id)
+            .where(*_due_filter())
+            .group_by(StripeEvent.customer_id)
+            .order_by(func.min(StripeEvent.stripe_created_at))
+            .limit(settings.STRIPE_EVENT_BATCH_SIZE)
+        )
+        customer_ids = result.scalars().all()
+
+    processed = 0
+    for customer_id in customer_ids:
+        if customer_id is None:
+            # Customer-less events are independent of each other
+            processed += await _process_customerless_events(session_maker)
+        else:
+            processed += await process_customer_events(customer_id, session_maker)
+    return processed
+
+
+async def _process_customerless_events(session_maker: async_sessionmaker) -> int:
+    async with session_maker() as db:
+        result = await db.execute(
+            select(StripeEvent.id)
+            .where(StripeEvent.customer_id.is_(None), *_due_filter())
+            .order_by(StripeEvent.stripe_created_at)
+            .limit(settings.STRIPE_EVENT_BATCH_SIZE)
+        )
+        event_ids = result.scalars().all()
+
+    processed = 0
+    for event_id in event_ids:
+        processed += await process_customer_events(
+            None, session_maker, event_id=event_id
+        )
+    return processed
+
+
+class StripeEventConsumer:
+    """Background loop applying stored Stripe events outside the webhook request"""
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                processed = await process_pending_stripe_events()
+            except Exception as e:
+                print(f"Error in Stripe event consumer: {e}")
+                processed = 0
+
+            if processed:
+                continue
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.STRIPE_EVENT_POLL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+
+
+stripe_event_consumer = StripeEventConsumer()
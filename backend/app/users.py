@@ -1,7 +1,8 @@
 import json
 import re
 import uuid
-from typing import Optional
+from email.message import EmailMessage
+from typing import Any, Dict, Optional
 
 from fastapi import Depends, Request, Response, Body
 from fastapi_users import (
@@ -10,6 +11,8 @@ from fastapi_users import (
     InvalidPasswordException,
     UUIDIDMixin,
 )
+from fastapi_users.exceptions import UserNotExists
+from fastapi_users.jwt import generate_jwt
 from fastapi_users.authentication import (
     AuthenticationBackend,
     BearerTransport,
@@ -19,11 +22,21 @@ from fastapi_users.db import SQLAlchemyUserDatabase
 from httpx_oauth.clients.google import GoogleOAuth2
 
 from .config import settings
-from .database import get_user_db
-from .email import send_reset_password_email, send_verification_email
-from .models import User
+from .database import async_session_maker, get_user_db
+from .email import (
+    AUTH_EMAIL_TOPIC,
+    RESET_PASSWORD_EMAIL,
+    VERIFICATION_EMAIL,
+    reset_password_message,
+    send_reset_password_email,
+    send_verification_email,
+    smtp_pool,
+    verification_message,
+)
+from .loops import account_created_event, enqueue_loops_event
+from .models import OAuthAccount, User
+from .outbox import outbox_dispatcher, register_outbox_handler
 from .schemas import UserCreate
-import requests
 
 
 AUTH_URL_PATH = "auth"
@@ -41,8 +54,6 @@ google_oauth_client = GoogleOAuth2(
     ],
 )
 
-url = "https://app.loops.so/api/v1/events/send"
-
 
 class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     reset_password_token_secret = settings.RESET_PASSWORD_SECRET_KEY
@@ -57,13 +68,13 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     async def on_after_forgot_password(
         self, user: User, token: str, request: Optional[Request] = None
     ):
-        await send_reset_password_email(user, token)
+        await send_reset_password_email(self.user_db.session, user)
 
     async def on_after_request_verify(
         self, user: User, token: str, request: Optional[Request] = None
     ):
-        print(f"Verification requested for user {user.id}. Verification token: {token}")
-        await send_verification_email(user, token)
+        print(f"Verification requested for user {user.id}.")
+        await send_verification_email(self.user_db.session, user)
 
     async def on_after_verify(
         self,
@@ -75,24 +86,39 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
         await self.give_credits(user)
 
     async def give_credits(self, user: User):
+        # The Loops event is committed together with the credits and sent by
+        # the outbox dispatcher
+        enqueue_loops_event(
+            self.user_db.session, account_created_event(user.id, user.email)
+        )
         await self.user_db.update(user, {"credits": user.credits + 3})
-        await self.trigger_account_created(user)
-
-    async def trigger_account_created(self, user: User):
-        payload = {
-            "email": user.email,
-            "userId": str(user.id),
-            "nailsCustomerId": str(user.id),
-            "eventName": "Nails Deisgn AI Account Created",
-            "eventProperties": {},
-            "mailingLists": {},
+        outbox_dispatcher.notify()
+
+    # Same claims as forgot_password/request_verify; the emails mint their own
+    # token when the outbox sends them instead of storing the one passed above
+    def reset_password_token(self, user: User) -> str:
+        token_data = {
+            "sub": str(user.id),
+            "password_fgpt": self.password_helper.hash(user.hashed_password),
+            "aud": self.reset_password_token_audience,
         }
-        headers = {
-            "Authorization": f"Bearer {settings.LOOPS_API_KEY}",
-            "Content-Type": "application/json",
+        return generate_jwt(
+            token_data,
+            self.reset_password_token_secret,
+            self.reset_password_token_lifetime_seconds,
+        )
+
+    def verification_token(self, user: User) -> str:
+        token_data = {
+            "sub": str(user.id),
+            "email": user.email,
+            "aud": self.verification_token_audience,
         }
-        response = requests.request("POST", url, json=payload, headers=headers)
-        print(response.text)
+        return generate_jwt(
+            token_data,
+            self.verification_token_secret,
+            self.verification_token_lifetime_seconds,
+        )
 
     async def validate_password(
         self,
@@ -114,6 +140,38 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
             raise InvalidPasswordException(reason=errors)
 
 
+def build_auth_email(
+    user_manager: UserManager, user: User, kind: str
+) -> Optional[EmailMessage]:
+    if kind == RESET_PASSWORD_EMAIL:
+        if not user.is_active:
+            return None
+        return reset_password_message(user, user_manager.reset_password_token(user))
+    if kind == VERIFICATION_EMAIL:
+        if not user.is_active or user.is_verified:
+            return None
+        return verification_message(user, user_manager.verification_token(user))
+    raise ValueError(f"Unknown auth email kind {kind}")
+
+
+@register_outbox_handler(AUTH_EMAIL_TOPIC)
+async def deliver_auth_email(payload: Dict[str, Any], message_id: int):
+    async with async_session_maker() as session:
+        user_manager = UserManager(SQLAlchemyUserDatabase(session, User, OAuthAccount))
+        try:
+            user = await user_manager.get(uuid.UUID(payload["user_id"]))
+        except UserNotExists:
+            print(
+                f"Skipping {payload['kind']} email for missing user {payload['user_id']}"
+            )
+            return
+        message = build_auth_email(user_manager, user, payload["kind"])
+    if message is None:
+        print(f"Skipping {payload['kind']} email for user {user.id}")
+        return
+    await smtp_pool.send(message)
+
+
 async def get_user_manager(user_db: SQLAlchemyUserDatabase = Depends(get_user_db)):
     yield UserManager(user_db)
 
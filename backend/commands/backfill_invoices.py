@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+
+import stripe
+
+from app.config import settings
+from app.database import async_session_maker
+from app.invoices import upsert_invoices
+
+BATCH_SIZE = 100
+
+
+def iter_stripe_invoices(customer_id=None):
+    params = {"limit": 100}
+    if customer_id:
+        params["customer"] = customer_id
+    return stripe.Invoice.list(**params).auto_paging_iter()
+
+
+async def backfill_invoices(customer_id=None, session_maker=async_session_maker):
+    """
+    Copies invoices from Stripe into the local invoices table.
+
+    Invoice webhooks keep the table current afterwards; this fills in invoices
+    created before the mirror existed or missed while the webhook was down.
+    """
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+
+    total = 0
+    batch = []
+    async with session_maker() as db:
+        for invoice in iter_stripe_invoices(customer_id):
+            if not invoice.get("customer"):
+                continue
+            batch.append(invoice.to_dict())
+            if len(batch) >= BATCH_SIZE:
+                await upsert_invoices(db, batch)
+                await db.commit()
+                total += len(batch)
+                batch = []
+
+        await upsert_invoices(db, batch)
+        await db.commit()
+        total += len(batch)
+
+    print(f"Backfilled {total} invoices")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the local invoice mirror")
+    parser.add_argument("--customer", help="Only backfill this Stripe customer ID")
+    args = parser.parse_args()
+    asyncio.run(backfill_invoices(args.customer))
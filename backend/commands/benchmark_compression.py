@@ -0,0 +1,155 @@
+import argparse
+import gzip
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+import brotli
+
+from app.compression import Encoder
+from app.serializers import CONVERSATION_LIST, EDIT_LIST
+from commands.benchmark_serialization import build_conversations
+
+# (encoding, level) pairs compared against sending the body as is
+SETTINGS: List[Tuple[str, int]] = [
+    ("identity", 0),
+    ("gzip", 1),
+    ("gzip", 6),
+    ("gzip", 9),
+    ("br", 1),
+    ("br", 4),
+    ("br", 6),
+    ("br", 11),
+]
+
+# Link speeds the delivery estimate is computed for, in megabits per second
+BANDWIDTHS_MBPS = (5, 50)
+
+
+def build_edits(count: int) -> List[SimpleNamespace]:
+    """Edit rows shaped like the ORM objects GET /home-design/edits returns"""
+    project_id = uuid.uuid4()
+    started = datetime(2025, 1, 1)
+    return [
+        SimpleNamespace(
+            id=uuid.uuid4(),
+            project_id=project_id,
+            conversation_id=uuid.uuid4(),
+            prompt="Transform this living room into a warm mid-century modern space "
+            f"with walnut furniture and a mustard accent chair ({index})",
+            before_image_url=f"https://cdn.homeideasai.com/edits/{uuid.uuid4()}.png",
+            after_image_url=f"https://cdn.homeideasai.com/edits/{uuid.uuid4()}.png",
+            edit_type="ai_design_transformation",
+            created_at=started + timedelta(minutes=index),
+        )
+        for index in range(count)
+    ]
+
+
+def build_payloads(conversations: int, messages: int, edits: int) -> Dict[str, bytes]:
+    conversation_rows = build_conversations(conversations, messages)
+    edit_rows = build_edits(edits)
+    return {
+        "conversations": CONVERSATION_LIST.dump_json(
+            CONVERSATION_LIST.validate_python(conversation_rows, from_attributes=True)
+        ),
+        "edits": EDIT_LIST.dump_json(
+            EDIT_LIST.validate_python(edit_rows, from_attributes=True)
+        ),
+    }
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "identity":
+        return body
+    return Encoder(encoding, gzip_level=level, brotli_quality=level).compress(
+        body, final=True
+    )
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "br":
+        return brotli.decompress(body)
+    return body
+
+
+def benchmark_compression(
+    conversations: int = 20, messages: int = 40, edits: int = 200, repeat: int = 20
+) -> Dict[str, List[Dict[str, float]]]:
+    """Size and time of each setting on each payload"""
+    results = {}
+    for payload, body in build_payloads(conversations, messages, edits).items():
+        rows = []
+        for encoding, level in SETTINGS:
+            compressed = compress(body, encoding, level)
+            if decompress(compressed, encoding) != body:
+                raise AssertionError(f"{encoding} {level} did not round-trip")
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                compress(body, encoding, level)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            compress_ms = timings[len(timings) // 2] * 1000
+
+            row = {
+                "encoding": encoding,
+                "level": level,
+                "bytes": len(compressed),
+                "ratio": len(body) / len(compressed),
+                "compress_ms": compress_ms,
+            }
+            for mbps in BANDWIDTHS_MBPS:
+                transfer_ms = len(compressed) * 8 / (mbps * 1_000_000) * 1000
+                row[f"total_ms_{mbps}mbps"] = compress_ms + transfer_ms
+            rows.append(row)
+        results[payload] = rows
+    return results
+
+
+def print_report(results: Dict[str, List[Dict[str, float]]]):
+    for payload, rows in results.items():
+        print(f"\n{payload} ({rows[0]['bytes'] / 1000:.0f} KB uncompressed)")
+        header = f"{'setting':<12}{'KB':>8}{'ratio':>8}{'compress ms':>13}"
+        for mbps in BANDWIDTHS_MBPS:
+            header += f"{f'@{mbps}Mbps ms':>13}"
+        print(header)
+        for row in rows:
+            setting = (
+                row["encoding"]
+                if row["encoding"] == "identity"
+                else f"{row['encoding']}-{row['level']}"
+            )
+            line = (
+                f"{setting:<12}{row['bytes'] / 1000:>8.1f}{row['ratio']:>8.1f}"
+                f"{row['compress_ms']:>13.2f}"
+            )
+            for mbps in BANDWIDTHS_MBPS:
+                line += f"{row[f'total_ms_{mbps}mbps']:>13.1f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare gzip and brotli levels on the largest response types"
+    )
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(
+        "Delivery estimate = compression time + transfer time at the given link "
+        "speed (decompression and latency excluded)"
+    )
+    print_report(
+        benchmark_compression(
+            args.conversations, args.messages, args.edits, args.repeat
+        )
+    )
@@ -0,0 +1,148 @@
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.schemas import HomeDesignConversationRead
+from app.serializers import CONVERSATION_LIST
+
+ASSISTANT_REPLY = (
+    "I love the natural light in this space! To warm it up, I'd suggest swapping "
+    "the cool grey walls for a soft greige, adding a jute rug to anchor the seating "
+    "area, and layering in brass accents through the lighting and hardware. "
+)
+
+
+def build_conversations(
+    conversations: int, messages_per_conversation: int
+) -> List[SimpleNamespace]:
+    """Conversation rows shaped like the ORM objects the route returns"""
+    started = datetime(2025, 1, 1)
+    rows = []
+    for index in range(conversations):
+        messages: List[Dict[str, Any]] = []
+        for turn in range(messages_per_conversation // 2):
+            timestamp = (started + timedelta(minutes=turn)).isoformat()
+            messages.append(
+                {
+                    "role": "user",
+                    "content": f"Can you make the living room feel cozier? ({turn})",
+                    "timestamp": timestamp,
+                }
+            )
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": ASSISTANT_REPLY * 3,
+                    "timestamp": timestamp,
+                    "image_url": f"https://cdn.homeideasai.com/edits/{uuid.uuid4()}.png",
+                }
+            )
+        rows.append(
+            SimpleNamespace(
+                id=uuid.uuid4(),
+                project_id=uuid.uuid4(),
+                messages=messages,
+                created_at=started,
+                updated_at=started + timedelta(days=index),
+            )
+        )
+    return rows
+
+
+def response_model_json(rows) -> bytes:
+    """What FastAPI does for a response_model with the default JSONResponse"""
+    items = [HomeDesignConversationRead.model_validate(row) for row in rows]
+    content = jsonable_encoder([item.model_dump(mode="json") for item in items])
+    return JSONResponse(content).body
+
+
+def response_model_orjson(rows) -> bytes:
+    """The same response_model pass, rendered by ORJSONResponse"""
+    items = [HomeDesignConversationRead.model_validate(row) for row in rows]
+    content = jsonable_encoder([item.model_dump(mode="json") for item in items])
+    return ORJSONResponse(content).body
+
+
+def type_adapter_json(rows) -> bytes:
+    """Validation and encoding in one compiled TypeAdapter, as the routes do now"""
+    return CONVERSATION_LIST.dump_json(
+        CONVERSATION_LIST.validate_python(rows, from_attributes=True)
+    )
+
+
+SERIALIZERS: Dict[str, Callable[[Any], bytes]] = {
+    "response_model + json": response_model_json,
+    "response_model + orjson": response_model_orjson,
+    "TypeAdapter.dump_json": type_adapter_json,
+}
+
+
+def benchmark_serialization(
+    conversations: int = 20, messages_per_conversation: int = 40, repeat: int = 50
+) -> Dict[str, Dict[str, float]]:
+    """Time each serializer on the same payload; returns per-serializer stats"""
+    rows = build_conversations(conversations, messages_per_conversation)
+
+    outputs = {name: serialize(rows) for name, serialize in SERIALIZERS.items()}
+    expected = json.loads(outputs["response_model + json"])
+    for name, body in outputs.items():
+        if json.loads(body) != expected:
+            raise AssertionError(f"{name} produced a different payload")
+
+    results = {}
+    for name, serialize in SERIALIZERS.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            serialize(rows)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        median = timings[len(timings) // 2]
+        size = len(outputs[name])
+        results[name] = {
+            "median_ms": median * 1000,
+            "p95_ms": timings[int(len(timings) * 0.95) - 1] * 1000,
+            "responses_per_second": 1 / median,
+            "mb_per_second": size / median / 1_000_000,
+            "bytes": size,
+        }
+    return results
+
+
+def print_report(results: Dict[str, Dict[str, float]]):
+    baseline = results["response_model + json"]["median_ms"]
+    print(
+        f"{'serializer':<26}{'median ms':>11}{'p95 ms':>10}"
+        f"{'resp/s':>10}{'MB/s':>9}{'speedup':>9}"
+    )
+    for name, stats in results.items():
+        print(
+            f"{name:<26}{stats['median_ms']:>11.2f}{stats['p95_ms']:>10.2f}"
+            f"{stats['responses_per_second']:>10.0f}{stats['mb_per_second']:>9.1f}"
+            f"{baseline / stats['median_ms']:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare JSON serialization paths on conversation list payloads"
+    )
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    results = benchmark_serialization(args.conversations, args.messages, args.repeat)
+    payload_kb = results["response_model + json"]["bytes"] / 1000
+    print(
+        f"{args.conversations} conversations x {args.messages} messages "
+        f"({payload_kb:.0f} KB), {args.repeat} runs each\n"
+    )
+    print_report(results)
@@ -0,0 +1,117 @@
+import argparse
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List
+
+# Provider SDKs that app.main must not import; they load in the lifespan
+LAZY_MODULES = (
+    "anthropic",
+    "fal_client",
+    "stripe",
+    "aioboto3",
+    "boto3",
+    "botocore",
+    "aiohttp",
+    "openai",
+    "requests",
+)
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+@dataclass
+class ImportRecord:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportRecord]:
+    """Parse the stderr of `python -X importtime`"""
+    records = []
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append(
+                ImportRecord(name, int(self_us), int(cumulative_us), len(indent) // 2)
+            )
+    return records
+
+
+def measure_import(module: str = "app.main") -> List[ImportRecord]:
+    """Import the module in a fresh interpreter and return its import tree"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def build_report(records: List[ImportRecord], module: str, top: int = 15) -> Dict:
+    """Total time, the packages costing the most, and eagerly imported SDKs"""
+    total_us = next(
+        (r.cumulative_us for r in records if r.name == module and r.depth == 0),
+        sum(r.self_us for r in records),
+    )
+    by_package: Dict[str, int] = defaultdict(int)
+    for record in records:
+        by_package[record.name.split(".")[0]] += record.self_us
+    imported = {record.name for record in records}
+    return {
+        "module": module,
+        "total_ms": total_us / 1000,
+        "modules": len(records),
+        "packages": sorted(by_package.items(), key=lambda item: -item[1])[:top],
+        "eager_providers": [name for name in LAZY_MODULES if name in imported],
+    }
+
+
+def print_report(report: Dict):
+    print(
+        f"import {report['module']}: {report['total_ms']:.0f} ms "
+        f"across {report['modules']} modules\n"
+    )
+    print(f"{'package':<32}{'ms':>9}{'share':>8}")
+    for package, self_us in report["packages"]:
+        share = self_us / 1000 / report["total_ms"] * 100
+        print(f"{package:<32}{self_us / 1000:>9.1f}{share:>7.1f}%")
+    if report["eager_providers"]:
+        print(f"\nImported eagerly: {', '.join(report['eager_providers'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report where `import app.main` spends its time"
+    )
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Report the fastest of this many imports"
+    )
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument(
+        "--max-ms", type=float, help="Exit with an error above this import time"
+    )
+    args = parser.parse_args()
+
+    report = min(
+        (
+            build_report(measure_import(args.module), args.module, args.top)
+            for _ in range(args.runs)
+        ),
+        key=lambda report: report["total_ms"],
+    )
+    print_report(report)
+
+    failed = bool(report["eager_providers"])
+    if args.max_ms is not None and report["total_ms"] > args.max_ms:
+        print(f"\nImport time {report['total_ms']:.0f} ms exceeds {args.max_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
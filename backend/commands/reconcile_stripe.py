@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import os
+from datetime import datetime
+
+import stripe
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.database import async_session_maker
+from app.invoices import upsert_invoices
+from app.models import User
+
+SUBSCRIPTION_FIELDS = [
+    "stripe_subscription_id",
+    "subscription_status",
+    "subscription_current_period_start",
+    "subscription_current_period_end",
+    "subscription_cancel_at_period_end",
+    "plan_id",
+]
+
+# Statuses where the subscription still entitles the user to the plan
+LIVE_STATUSES = {"active", "trialing", "past_due", "unpaid", "incomplete"}
+
+
+def list_page(resource, **params):
+    """Fetch one page of a Stripe list endpoint as plain dicts, and whether more follow"""
+    page = resource.list(limit=100, **params)
+    return [obj.to_dict() for obj in page.data], page.has_more
+
+
+def stripe_caller(concurrency):
+    """Run blocking Stripe SDK calls in worker threads, at most `concurrency` at once"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(function, *args, **kwargs):
+        async with semaphore:
+            return await asyncio.to_thread(function, *args, **kwargs)
+
+    return call
+
+
+async def iter_pages(call, resource, **params):
+    """Yield the pages of a Stripe listing one at a time"""
+    while True:
+        objects, has_more = await call(list_page, resource, **params)
+        if objects:
+            yield objects
+        if not has_more or not objects:
+            return
+        params["starting_after"] = objects[-1]["id"]
+
+
+async def fetch_customers_by_email(call):
+    """Index every Stripe customer by lower-cased email, paging through them once.
+
+    Emails shared by several customers are left out: a user is only linked by
+    email when exactly one customer matches.
+    """
+    customers_by_email = {}
+    shared = set()
+    async for customers in iter_pages(call, stripe.Customer):
+        for customer in customers:
+            email = (customer.get("email") or "").lower()
+            if not email:
+                continue
+            if email in customers_by_email:
+                shared.add(email)
+            customers_by_email[email] = {"id": customer["id"]}
+    for email in shared:
+        del customers_by_email[email]
+    return customers_by_email
+
+
+async def fetch_subscriptions_by_customer(call):
+    """Page through every Stripe subscription once, keeping one per customer"""
+    subscriptions_by_customer = {}
+    async for subscriptions in iter_pages(call, stripe.Subscription, status="all"):
+        pick_subscriptions(subscriptions, subscriptions_by_customer)
+    return subscriptions_by_customer
+
+
+def pick_subscriptions(subscriptions, by_customer=None):
+    """Pick the subscription that should be reflected on each customer's user row.
+
+    Pass by_customer to keep picking across pages.
+    """
+    if by_customer is None:
+        by_customer = {}
+    for subscription in subscriptions:
+        customer_id = subscription["customer"]
+        current = by_customer.get(customer_id)
+        rank = (subscription["status"] in LIVE_STATUSES, subscription["created"])
+        if current is None or rank > (
+            current["status"] in LIVE_STATUSES,
+            current["created"],
+        ):
+            by_customer[customer_id] = subscription
+    return by_customer
+
+
+def expected_subscription_state(subscription):
+    """Mirror what the subscription webhooks would have written for this subscription"""
+    if subscription is None or subscription["status"] not in LIVE_STATUSES:
+        return {
+            "stripe_subscription_id": None,
+            "subscription_status": "canceled",
+            "subscription_current_period_start": None,
+            "subscription_current_period_end": None,
+            "subscription_cancel_at_period_end": False,
+            "plan_id": None,
+        }
+    return {
+        "stripe_subscription_id": subscription["id"],
+        "subscription_status": subscription["status"],
+        "subscription_current_period_start": datetime.fromtimestamp(
+            subscription["current_period_start"]
+        ),
+        "subscription_current_period_end": datetime.fromtimestamp(
+            subscription["current_period_end"]
+        ),
+        "subscription_cancel_at_period_end": subscription.get(
+            "cancel_at_period_end", False
+        ),
+        "plan_id": subscription["items"]["data"][0]["price"]["id"],
+    }
+
+
+def diff_user(user_row, customers_by_email, subscriptions_by_customer):
+    """Return the column changes needed to bring a local user in line with Stripe"""
+    changes = {}
+    customer_id = user_row["stripe_customer_id"]
+
+    if not customer_id:
+        customer = customers_by_email.get(user_row["email"].lower())
+        if customer is None:
+            return changes
+        customer_id = customer["id"]
+        changes["stripe_customer_id"] = customer_id
+
+    subscription = subscriptions_by_customer.get(customer_id)
+    if subscription is None and not user_row["stripe_subscription_id"]:
+        # Never subscribed; leave the row alone
+        return changes
+
+    expected = expected_subscription_state(subscription)
+    if subscription is None or subscription["status"] not in LIVE_STATUSES:
+        if (
+            user_row["subscription_status"] in (None, "canceled")
+            and not user_row["stripe_subscription_id"]
+        ):
+            return changes
+
+    for field in SUBSCRIPTION_FIELDS:
+        if user_row[field] != expected[field]:
+            changes[field] = expected[field]
+    return changes
+
+
+async def apply_corrections(db, corrections):
+    """Apply corrections as one executemany UPDATE per distinct set of columns"""
+    groups = {}
+    for user_id, changes in corrections:
+        groups.setdefault(tuple(sorted(changes)), []).append({"id": user_id, **changes})
+    for rows in groups.values():
+        await db.execute(update(User), rows)
+
+
+async def fetch_user_rows(db, after_id, limit):
+    """Next batch of users by id, with the columns diff_user compares"""
+    columns = [User.id, User.email, User.stripe_customer_id] + [
+        getattr(User, field) for field in SUBSCRIPTION_FIELDS
+    ]
+    query = select(*columns).order_by(User.id).limit(limit)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    return (await db.execute(query)).mappings().all()
+
+
+async def reconcile_users(call, report, dry_run, batch_size, session_maker):
+    """Diff users a batch at a time against Stripe's customers and subscriptions.
+
+    Stripe is listed once up front, so the number of Stripe requests depends
+    on the size of the Stripe account, not on the number of local users.
+    """
+    customers_by_email, subscriptions_by_customer = await asyncio.gather(
+        fetch_customers_by_email(call), fetch_subscriptions_by_customer(call)
+    )
+
+    async with session_maker() as db:
+        last_id = None
+        while True:
+            rows = await fetch_user_rows(db, last_id, batch_size)
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+
+            corrections = []
+            for row in rows:
+                changes = diff_user(row, customers_by_email, subscriptions_by_customer)
+                if changes:
+                    corrections.append((row["id"], changes))
+                    report["changes"].append((row["email"], changes))
+            report["users_checked"] += len(rows)
+            report["users_corrected"] += len(corrections)
+
+            if corrections and not dry_run:
+                await apply_corrections(db, corrections)
+                await db.commit()
+
+
+async def sync_invoices(call, report, dry_run, session_maker):
+    """Upsert invoices into the local mirror page by page as they stream in"""
+    async with session_maker() as db:
+        async for invoices in iter_pages(call, stripe.Invoice):
+            invoices = [invoice for invoice in invoices if invoice.get("customer")]
+            report["invoices_synced"] += len(invoices)
+            if invoices and not dry_run:
+                await upsert_invoices(db, invoices)
+                await db.commit()
+
+
+async def reconcile_stripe(
+    dry_run=False,
+    concurrency=8,
+    batch_size=500,
+    session_maker=async_session_maker,
+):
+    """
+    Reconciles local subscription state and the invoice mirror with Stripe.
+
+    Credits are not touched: they are consumed locally and cannot be derived
+    from Stripe, so only subscription fields, customer IDs and invoices are
+    corrected.
+
+    Customers, subscriptions and invoices are each listed once, 100 per page,
+    with up to `concurrency` Stripe calls in flight. Local users are diffed
+    against the customer and subscription maps in batches of batch_size, while
+    invoices stream into the mirror one page at a time.
+    """
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    call = stripe_caller(concurrency)
+
+    report = {
+        "users_checked": 0,
+        "users_corrected": 0,
+        "invoices_synced": 0,
+        "changes": [],
+    }
+    await asyncio.gather(
+        reconcile_users(call, report, dry_run, batch_size, session_maker),
+        sync_invoices(call, report, dry_run, session_maker),
+    )
+
+    print_report(report, dry_run)
+    return report
+
+
+def print_report(report, dry_run):
+    prefix = "[dry run] " if dry_run else ""
+    for email, changes in report["changes"]:
+        print(f"{prefix}{email}: {changes}")
+    print(
+        f"{prefix}Checked {report['users_checked']} users, "
+        f"{'would correct' if dry_run else 'corrected'} {report['users_corrected']}, "
+        f"{'would sync' if dry_run else 'synced'} {report['invoices_synced']} invoices"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Reconcile local subscription and invoice state with Stripe"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report differences without writing"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Stripe requests in flight"
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--api-base",
+        default=os.getenv("STRIPE_API_BASE"),
+        help="Stripe API base URL, e.g. http://localhost:12111 for stripe-mock",
+    )
+    args = parser.parse_args()
+
+    if args.api_base:
+        stripe.api_base = args.api_base
+
+    asyncio.run(
+        reconcile_stripe(
+            dry_run=args.dry_run,
+            concurrency=args.concurrency,
+            batch_size=args.batch_size,
+        )
+    )
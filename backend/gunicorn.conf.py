@@ -0,0 +1,51 @@
+import gc
+import os
+import shutil
+import tempfile
+
+# Import the app once in the master and fork workers from it: workers boot
+# faster and share the imported code copy-on-write. Importing app.main opens
+# no connections and creates no provider clients; those are built per worker
+# in the application lifespan.
+preload_app = True
+
+# Time a worker gets to exit after SIGTERM: in-flight requests finish (SSE
+# streams end immediately), then running image generations get up to
+# GENERATION_DRAIN_SECONDS (45 by default) and clients are closed
+graceful_timeout = 90
+
+# Each worker writes its Prometheus samples here and /metrics aggregates them.
+# Set before the app is imported, which is when prometheus_client reads it.
+prometheus_multiproc_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "homeideasai-prometheus"),
+)
+os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def on_starting(server):
+    # Samples left by a previous run would be added to this one's
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir)
+
+
+def pre_fork(server, worker):
+    # Keep the garbage collector from touching (and so copying) the pages
+    # holding the preloaded app in each worker
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from app.database import engine, read_engine
+
+        # Drop any pooled connection inherited from the master without closing
+        # it, since closing would affect the master's copy
+        engine.sync_engine.dispose(close=False)
+        read_engine.sync_engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
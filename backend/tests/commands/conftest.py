@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture
+def mock_session_maker(mocker):
+    session = mocker.AsyncMock()
+    session.__aenter__.return_value = session
+    session.__aexit__.return_value = None
+    return mocker.Mock(return_value=session)
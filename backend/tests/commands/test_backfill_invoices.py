@@ -0,0 +1,24 @@
+import pytest
+
+from commands.backfill_invoices import backfill_invoices
+
+
+@pytest.mark.asyncio
+async def test_backfill_invoices_upserts_in_batches(mocker, mock_session_maker):
+    invoices = []
+    for i in range(150):
+        invoice = mocker.Mock()
+        invoice.get.return_value = "cus_1"
+        invoice.to_dict.return_value = {"id": f"in_{i}", "customer": "cus_1"}
+        invoices.append(invoice)
+    mocker.patch(
+        "commands.backfill_invoices.iter_stripe_invoices", return_value=iter(invoices)
+    )
+    mock_upsert = mocker.patch(
+        "commands.backfill_invoices.upsert_invoices", new_callable=mocker.AsyncMock
+    )
+
+    total = await backfill_invoices(session_maker=mock_session_maker)
+
+    assert total == 150
+    assert [len(call.args[1]) for call in mock_upsert.call_args_list] == [100, 50]
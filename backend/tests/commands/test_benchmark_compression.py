@@ -0,0 +1,12 @@
+from commands.benchmark_compression import SETTINGS, benchmark_compression
+
+
+def test_benchmark_compares_every_setting_on_every_payload():
+    results = benchmark_compression(conversations=2, messages=4, edits=5, repeat=1)
+
+    assert set(results) == {"conversations", "edits"}
+    for rows in results.values():
+        assert [(row["encoding"], row["level"]) for row in rows] == SETTINGS
+        identity = rows[0]
+        assert identity["ratio"] == 1
+        assert all(row["bytes"] < identity["bytes"] for row in rows[1:])
@@ -0,0 +1,28 @@
+from commands.benchmark_serialization import (
+    SERIALIZERS,
+    benchmark_serialization,
+    build_conversations,
+)
+
+
+def test_build_conversations_shape():
+    rows = build_conversations(conversations=2, messages_per_conversation=4)
+
+    assert len(rows) == 2
+    assert [m["role"] for m in rows[0].messages] == [
+        "user",
+        "assistant",
+        "user",
+        "assistant",
+    ]
+
+
+def test_benchmark_reports_every_serializer():
+    results = benchmark_serialization(
+        conversations=2, messages_per_conversation=4, repeat=2
+    )
+
+    assert set(results) == set(SERIALIZERS)
+    for stats in results.values():
+        assert stats["median_ms"] > 0
+        assert stats["bytes"] > 0
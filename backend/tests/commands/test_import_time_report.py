@@ -0,0 +1,57 @@
+from commands.import_time_report import (
+    LAZY_MODULES,
+    build_report,
+    measure_import,
+    parse_importtime,
+)
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _io
+import time:       300 |        300 |       sqlalchemy.sql
+import time:      1500 |       1800 |     sqlalchemy
+import time:        80 |         80 |     app.config
+import time:       400 |       2400 |   app
+import time:       200 |       2600 | app.main
+"""
+
+
+def test_parse_importtime_reads_depth_and_times():
+    records = parse_importtime(IMPORTTIME_OUTPUT)
+
+    assert [(r.name, r.self_us, r.cumulative_us, r.depth) for r in records] == [
+        ("_io", 120, 120, 2),
+        ("sqlalchemy.sql", 300, 300, 3),
+        ("sqlalchemy", 1500, 1800, 2),
+        ("app.config", 80, 80, 2),
+        ("app", 400, 2400, 1),
+        ("app.main", 200, 2600, 0),
+    ]
+
+
+def test_build_report_groups_self_time_by_package():
+    report = build_report(parse_importtime(IMPORTTIME_OUTPUT), "app.main", top=2)
+
+    assert report["total_ms"] == 2.6
+    assert report["packages"] == [("sqlalchemy", 1800), ("app", 680)]
+    assert report["eager_providers"] == []
+
+
+def test_build_report_flags_eager_provider_sdks():
+    records = parse_importtime(
+        IMPORTTIME_OUTPUT.replace("app.config", "botocore.exceptions").replace(
+            "     _io", "     botocore"
+        )
+    )
+
+    assert build_report(records, "app.main")["eager_providers"] == ["botocore"]
+
+
+def test_app_main_does_not_import_provider_sdks():
+    report = build_report(measure_import("app.main"), "app.main")
+
+    assert (
+        report["eager_providers"] == []
+    ), "Import these lazily through app.providers: " + ", ".join(
+        set(report["eager_providers"]) & set(LAZY_MODULES)
+    )
@@ -0,0 +1,175 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+
+import stripe
+
+from commands.reconcile_stripe import diff_user, pick_subscriptions, reconcile_stripe
+
+
+def make_user_row(**overrides):
+    row = {
+        "id": uuid.uuid4(),
+        "email": "user@example.com",
+        "stripe_customer_id": "cus_1",
+        "stripe_subscription_id": None,
+        "subscription_status": None,
+        "subscription_current_period_start": None,
+        "subscription_current_period_end": None,
+        "subscription_cancel_at_period_end": False,
+        "plan_id": None,
+    }
+    row.update(overrides)
+    return row
+
+
+def make_subscription(status="active", created=1700000000, sub_id="sub_1"):
+    return {
+        "id": sub_id,
+        "customer": "cus_1",
+        "status": status,
+        "created": created,
+        "current_period_start": created,
+        "current_period_end": created + 3600,
+        "cancel_at_period_end": False,
+        "items": {"data": [{"price": {"id": "price_pro"}}]},
+    }
+
+
+def test_pick_subscriptions_across_pages():
+    picked = pick_subscriptions([make_subscription("active", created=1)])
+    newer = make_subscription("active", created=2, sub_id="sub_new")
+
+    pick_subscriptions([newer], picked)
+
+    assert picked["cus_1"]["id"] == "sub_new"
+
+
+def test_pick_subscriptions_prefers_live_subscription():
+    old_active = make_subscription("active", created=1, sub_id="sub_old")
+    new_canceled = make_subscription("canceled", created=2, sub_id="sub_new")
+
+    picked = pick_subscriptions([old_active, new_canceled])
+
+    assert picked["cus_1"]["id"] == "sub_old"
+
+
+def test_diff_user_fills_missing_subscription():
+    subscription = make_subscription()
+
+    changes = diff_user(make_user_row(), {}, {"cus_1": subscription})
+
+    assert changes["stripe_subscription_id"] == "sub_1"
+    assert changes["subscription_status"] == "active"
+    assert changes["plan_id"] == "price_pro"
+    assert changes["subscription_current_period_end"] == datetime.fromtimestamp(
+        subscription["current_period_end"]
+    )
+
+
+def test_diff_user_clears_canceled_subscription():
+    row = make_user_row(
+        stripe_subscription_id="sub_1", subscription_status="active", plan_id="p"
+    )
+
+    changes = diff_user(row, {}, {"cus_1": make_subscription("canceled")})
+
+    assert changes == {
+        "stripe_subscription_id": None,
+        "subscription_status": "canceled",
+        "plan_id": None,
+    }
+
+
+@pytest.mark.parametrize(
+    "row, customers_by_email, expected",
+    [
+        (make_user_row(), {}, {}),
+        (
+            make_user_row(stripe_customer_id=None, email="User@Example.com"),
+            {"user@example.com": {"id": "cus_9"}},
+            {"stripe_customer_id": "cus_9"},
+        ),
+    ],
+)
+def test_diff_user_without_subscription(row, customers_by_email, expected):
+    assert diff_user(row, customers_by_email, {}) == expected
+
+
+@pytest.mark.asyncio
+async def test_reconcile_stripe_streams_users_and_invoices(mocker, mock_session_maker):
+    subscribed = make_user_row(email="a@example.com", stripe_customer_id="cus_1")
+    linked = make_user_row(email="B@example.com", stripe_customer_id=None)
+    unknown = make_user_row(email="c@example.com", stripe_customer_id=None)
+    mocker.patch(
+        "commands.reconcile_stripe.fetch_user_rows",
+        side_effect=[[subscribed, linked], [unknown], []],
+    )
+    in_flight = {"now": 0, "max": 0}
+    calls = []
+    pages = {
+        (stripe.Invoice, None): ([{"id": "in_2", "customer": "cus_1"}], True),
+        (stripe.Invoice, "in_2"): ([{"id": "in_1", "customer": None}], False),
+        (stripe.Customer, None): (
+            [
+                {"id": "cus_1", "email": "a@example.com"},
+                {"id": "cus_2", "email": "b@example.com"},
+            ],
+            True,
+        ),
+        (stripe.Customer, "cus_2"): (
+            [
+                # c@example.com matches two customers, so it is not linked
+                {"id": "cus_3", "email": "c@example.com"},
+                {"id": "cus_4", "email": "C@example.com"},
+                {"id": "cus_5", "email": None},
+            ],
+            False,
+        ),
+        (stripe.Subscription, None): ([make_subscription()], False),
+    }
+
+    def list_page(resource, **params):
+        calls.append((resource, params))
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        try:
+            return pages[resource, params.get("starting_after")]
+        finally:
+            in_flight["now"] -= 1
+
+    mocker.patch("commands.reconcile_stripe.list_page", side_effect=list_page)
+    # Sleep in the worker thread so calls overlap
+    to_thread = asyncio.to_thread
+
+    async def slow_to_thread(function, *args, **kwargs):
+        await asyncio.sleep(0.01)
+        return await to_thread(function, *args, **kwargs)
+
+    mocker.patch("commands.reconcile_stripe.asyncio.to_thread", slow_to_thread)
+    apply_corrections = mocker.patch(
+        "commands.reconcile_stripe.apply_corrections", new_callable=mocker.AsyncMock
+    )
+    upsert_invoices = mocker.patch(
+        "commands.reconcile_stripe.upsert_invoices", new_callable=mocker.AsyncMock
+    )
+
+    report = await reconcile_stripe(
+        concurrency=2, batch_size=2, session_maker=mock_session_maker
+    )
+
+    assert report["users_checked"] == 3
+    assert report["users_corrected"] == 2
+    assert report["invoices_synced"] == 1
+    (corrections,) = [call.args[1] for call in apply_corrections.call_args_list]
+    assert dict(corrections)[subscribed["id"]]["stripe_subscription_id"] == "sub_1"
+    assert dict(corrections)[linked["id"]] == {"stripe_customer_id": "cus_2"}
+    assert [call.args[1] for call in upsert_invoices.call_args_list] == [
+        [{"id": "in_2", "customer": "cus_1"}]
+    ]
+    assert in_flight["max"] <= 2
+    # Each listing is paged once, however many local users there are
+    assert len(calls) == 5
+    assert (stripe.Subscription, {"status": "all"}) in calls
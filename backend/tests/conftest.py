@@ -1,4 +1,6 @@
+from contextlib import contextmanager
 from httpx import AsyncClient, ASGITransport
+import pytest
 import pytest_asyncio
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from fastapi_users.db import SQLAlchemyUserDatabase
@@ -8,8 +10,9 @@ import uuid
 from app.config import settings
 from app.models import User, Base
 
-from app.database import get_user_db, get_async_session
+from app.database import get_user_db, get_async_session, get_read_session
 from app.main import web_app
+from app.query_stats import count_queries, instrument_engine
 from app.users import get_jwt_strategy
 
 
@@ -64,6 +67,7 @@ async def test_client(db_session):
     # Set up test database overrides
     web_app.dependency_overrides[get_user_db] = override_get_user_db
     web_app.dependency_overrides[get_async_session] = override_get_async_session
+    web_app.dependency_overrides[get_read_session] = override_get_async_session
 
     async with AsyncClient(
         transport=ASGITransport(app=web_app), base_url="http://localhost:8000"
@@ -101,3 +105,23 @@ async def authenticated_user(test_client, db_session):
         "user": user,
         "user_data": {"email": user_data["email"], "password": "TestPassword123#"},
     }
+
+
+@pytest.fixture(scope="function")
+def query_budget(engine):
+    """Fail a test when the block issues more statements than its budget.
+
+    Usage: `with query_budget(3): await test_client.get(...)`
+    """
+    instrument_engine(engine.sync_engine)
+
+    @contextmanager
+    def budget(max_queries: int):
+        with count_queries() as stats:
+            yield stats
+        issued = "\n".join(f"{n}x {sql}" for sql, n in stats.statements.most_common())
+        assert (
+            stats.count <= max_queries
+        ), f"Expected at most {max_queries} queries, got {stats.count}:\n{issued}"
+
+    return budget
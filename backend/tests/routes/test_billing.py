@@ -0,0 +1,205 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models import StripeEvent, StripeInvoice, User
+from app.routes.billing import complete_checkout_session
+from app.stripe_events import process_pending_stripe_events
+
+
+def make_subscription_event(event_id, customer_id, created=1700000000):
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": "customer.subscription.created",
+        "created": created,
+        "data": {
+            "object": {
+                "id": "sub_123",
+                "object": "subscription",
+                "customer": customer_id,
+                "status": "active",
+                "current_period_start": created,
+                "current_period_end": created + 30 * 24 * 3600,
+                "items": {"data": [{"price": {"id": "price_pro"}}]},
+            }
+        },
+    }
+
+
+@pytest.fixture
+def mock_construct_event(mocker):
+    def construct_event(payload, sig_header, secret):
+        return json.loads(payload)
+
+    return mocker.patch(
+        "app.routes.billing.stripe.Webhook.construct_event",
+        side_effect=construct_event,
+    )
+
+
+class TestStripeWebhook:
+    @pytest.mark.asyncio(loop_scope="function")
+    async def test_redelivered_event_is_stored_once(
+        self, test_client, db_session, mock_construct_event, mocker
+    ):
+        """Test that a redelivered event ID does not create a second row."""
+        mocker.patch("app.stripe_events.stripe_event_consumer.notify")
+        event = make_subscription_event("evt_1", "cus_1")
+
+        for _ in range(2):
+            response = await test_client.post(
+                "/billing/webhook",
+                content=json.dumps(event),
+                headers={"Stripe-Signature": "t=1,v1=test"},
+            )
+            assert response.status_code == status.HTTP_200_OK
+
+        result = await db_session.execute(select(StripeEvent))
+        events = result.scalars().all()
+        assert len(events) == 1
+        assert events[0].customer_id == "cus_1"
+        assert events[0].processed_at is None
+
+    @pytest.mark.asyncio(loop_scope="function")
+    async def test_event_grants_credits_once(self, engine, db_session):
+        """Test that processing a stored event twice only applies it once."""
+        user = User(
+            email="stripe@example.com",
+            hashed_password="x",
+            stripe_customer_id="cus_2",
+            credits=0,
+        )
+        db_session.add(user)
+        event = make_subscription_event("evt_2", "cus_2")
+        db_session.add(
+            StripeEvent(
+                id=event["id"],
+                type=event["type"],
+                customer_id="cus_2",
+                payload=event,
+                stripe_created_at=datetime.utcnow(),
+                attempts=0,
+            )
+        )
+        await db_session.commit()
+
+        session_maker = async_sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+        assert await process_pending_stripe_events(session_maker) == 1
+        assert await process_pending_stripe_events(session_maker) == 0
+
+        async with session_maker() as db:
+            refreshed = await db.get(User, user.id)
+            assert refreshed.credits == 200
+            assert refreshed.stripe_subscription_id == "sub_123"
+
+    @pytest.mark.asyncio(loop_scope="function")
+    async def test_failed_event_backs_off_and_holds_later_events(
+        self, engine, db_session, mocker
+    ):
+        """Test that a failing event is not retried at once and blocks its customer."""
+        apply = mocker.patch(
+            "app.routes.billing.apply_stripe_event",
+            side_effect=RuntimeError("Stripe is down"),
+        )
+        for event_id, created in [("evt_3", 1700000000), ("evt_4", 1700000001)]:
+            event = make_subscription_event(event_id, "cus_3", created)
+            db_session.add(
+                StripeEvent(
+                    id=event_id,
+                    type=event["type"],
+                    customer_id="cus_3",
+                    payload=event,
+                    stripe_created_at=datetime.utcfromtimestamp(created),
+                    attempts=0,
+                )
+            )
+        await db_session.commit()
+
+        session_maker = async_sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+        assert await process_pending_stripe_events(session_maker) == 0
+        assert await process_pending_stripe_events(session_maker) == 0
+        assert apply.call_count == 1
+
+        async with session_maker() as db:
+            first = await db.get(StripeEvent, "evt_3")
+            second = await db.get(StripeEvent, "evt_4")
+            assert first.attempts == 1
+            assert first.available_at > first.received_at
+            assert first.last_error == "Stripe is down"
+            assert second.attempts == 0
+
+
+class TestInvoices:
+    @pytest.mark.asyncio(loop_scope="function")
+    async def test_invoices_are_paginated_from_local_mirror(
+        self, test_client, db_session, authenticated_user
+    ):
+        """Test that invoices are served locally with keyset pagination."""
+        user = authenticated_user["user"]
+        user.stripe_customer_id = "cus_invoices"
+        for day in range(1, 4):
+            db_session.add(
+                StripeInvoice(
+                    id=f"in_{day}",
+                    customer_id="cus_invoices",
+                    status="paid",
+                    hosted_invoice_url=f"https://invoice.stripe.com/{day}",
+                    total=day * 1000,
+                    currency="usd",
+                    credits=day,
+                    created=datetime(2025, 1, day, tzinfo=timezone.utc),
+                )
+            )
+        await db_session.commit()
+
+        first_page = await test_client.get(
+            "/billing/invoices?limit=2", headers=authenticated_user["headers"]
+        )
+        assert first_page.status_code == status.HTTP_200_OK
+        assert [invoice["credits"] for invoice in first_page.json()] == [3, 2]
+        assert first_page.json()[0]["date"] == "2025-01-03T00:00:00Z"
+        cursor = first_page.headers["X-Next-Cursor"]
+
+        second_page = await test_client.get(
+            f"/billing/invoices?limit=2&cursor={cursor}",
+            headers=authenticated_user["headers"],
+        )
+        assert second_page.status_code == status.HTTP_200_OK
+        assert [invoice["credits"] for invoice in second_page.json()] == [1]
+        assert "X-Next-Cursor" not in second_page.headers
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "payment_status, expected_status", [("paid", "success"), ("unpaid", "pending")]
+)
+async def test_complete_checkout_session_only_reports_status(
+    mocker, payment_status, expected_status
+):
+    retrieve = mocker.patch(
+        "app.routes.billing.stripe.checkout.Session.retrieve",
+        return_value={
+            "payment_status": payment_status,
+            "amount_total": 1500,
+            "currency": "usd",
+        },
+    )
+    list_line_items = mocker.patch(
+        "app.routes.billing.stripe.checkout.Session.list_line_items"
+    )
+
+    response = await complete_checkout_session("cs_1")
+
+    assert response == {"status": expected_status, "amount": 15.0, "currency": "usd"}
+    retrieve.assert_called_once_with("cs_1")
+    # Credits come from the webhook only
+    list_line_items.assert_not_called()
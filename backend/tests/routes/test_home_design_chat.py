@@ -0,0 +1,84 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import HomeDesignProject, User
+from app.routes.home_design_chat import home_design_chat
+from app.schemas import HomeDesignChatRequest
+
+
+@pytest.fixture
+def chat(mocker):
+    user = User(id=uuid.uuid4(), email="chat@example.com", credits=2)
+    project = HomeDesignProject(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        name="Chat",
+        current_image_url="https://example.com/a.png",
+    )
+    events = []
+    db = mocker.Mock()
+    db.execute = mocker.AsyncMock(
+        return_value=mocker.Mock(scalar_one_or_none=mocker.Mock(return_value=project))
+    )
+    db.commit = mocker.AsyncMock(side_effect=lambda: events.append("commit"))
+    db.rollback = mocker.AsyncMock()
+    mocker.patch(
+        "app.routes.home_design_chat.get_agentic_claude_response",
+        mocker.AsyncMock(
+            return_value={
+                "type": "design_generation_queued",
+                "message": "Generating",
+                "processing": True,
+                "generation": {"project_id": str(project.id)},
+            }
+        ),
+    )
+    mocker.patch(
+        "app.routes.home_design_chat.process_image_generation_background",
+        mocker.Mock(return_value="generation"),
+    )
+    mocker.patch("app.routes.home_design_chat.image_generations.accepting", True)
+    spawn = mocker.patch(
+        "app.routes.home_design_chat.image_generations.track",
+        side_effect=lambda coroutine: events.append(("spawn", coroutine)),
+    )
+    request = HomeDesignChatRequest(project_id=str(project.id), message="Paint it")
+    return request, db, user, events, spawn
+
+
+@pytest.mark.asyncio
+async def test_generation_starts_after_the_credit_is_committed(chat):
+    request, db, user, events, spawn = chat
+
+    response = await home_design_chat(request, db=db, user=user)
+
+    assert response.type == "design_generation_queued"
+    assert user.credits == 1
+    assert events == ["commit", ("spawn", "generation")]
+
+
+@pytest.mark.asyncio
+async def test_generation_does_not_start_when_the_commit_fails(chat):
+    request, db, user, events, spawn = chat
+    db.commit.side_effect = RuntimeError("connection lost")
+
+    with pytest.raises(HTTPException) as error:
+        await home_design_chat(request, db=db, user=user)
+
+    assert error.value.status_code == 500
+    spawn.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_generation_is_refused_once_shutdown_began(chat, mocker):
+    request, db, user, events, spawn = chat
+    mocker.patch("app.routes.home_design_chat.image_generations.accepting", False)
+
+    with pytest.raises(HTTPException) as error:
+        await home_design_chat(request, db=db, user=user)
+
+    assert error.value.status_code == 503
+    assert events == []
+    assert user.credits == 2
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import pytest
+from fastapi import status
+
+from app.models import HomeDesignProject
+from app.pagination import encode_cursor
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_projects_are_paginated_by_cursor(
+    test_client, db_session, authenticated_user, query_budget
+):
+    """Projects page by (updated_at, id), and ties on updated_at do not repeat rows."""
+    user = authenticated_user["user"]
+    for index, day in enumerate([3, 2, 2, 1]):
+        db_session.add(
+            HomeDesignProject(
+                user_id=user.id,
+                name=f"Project {index}",
+                original_image_url="https://example.com/a.png",
+                current_image_url="https://example.com/a.png",
+                updated_at=datetime(2025, 1, day),
+            )
+        )
+    await db_session.commit()
+
+    first_page = await test_client.get(
+        "/home-design/projects?limit=2", headers=authenticated_user["headers"]
+    )
+    assert first_page.status_code == status.HTTP_200_OK
+    cursor = first_page.headers["X-Next-Cursor"]
+
+    # One query for the current user and one for the page, however deep it is
+    with query_budget(2):
+        second_page = await test_client.get(
+            f"/home-design/projects?limit=2&cursor={cursor}",
+            headers=authenticated_user["headers"],
+        )
+    assert second_page.status_code == status.HTTP_200_OK
+    assert "X-Next-Cursor" not in second_page.headers
+
+    projects = first_page.json() + second_page.json()
+    assert len({project["id"] for project in projects}) == 4
+    assert projects[-1]["name"] == "Project 3"
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_projects_reject_invalid_cursor(test_client, authenticated_user):
+    response = await test_client.get(
+        "/home-design/projects?cursor=not-a-cursor",
+        headers=authenticated_user["headers"],
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    tampered = encode_cursor(datetime(2025, 1, 1), "not-a-uuid")
+    response = await test_client.get(
+        f"/home-design/projects?cursor={tampered}",
+        headers=authenticated_user["headers"],
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_project_poll_without_changes_is_not_modified(
+    test_client, db_session, authenticated_user, query_budget
+):
+    project = HomeDesignProject(
+        user_id=authenticated_user["user"].id,
+        name="Living room",
+        original_image_url="https://example.com/a.png",
+        current_image_url="https://example.com/a.png",
+    )
+    db_session.add(project)
+    await db_session.commit()
+
+    first = await test_client.get(
+        f"/home-design/projects/{project.id}", headers=authenticated_user["headers"]
+    )
+    assert first.status_code == status.HTTP_200_OK
+    etag = first.headers["ETag"]
+
+    # The current user and the project's updated_at; the row itself is not loaded
+    with query_budget(2):
+        poll = await test_client.get(
+            f"/home-design/projects/{project.id}",
+            headers={**authenticated_user["headers"], "If-None-Match": etag},
+        )
+    assert poll.status_code == status.HTTP_304_NOT_MODIFIED
+    assert poll.content == b""
+    assert poll.headers["ETag"] == etag
+
+    project.current_image_url = "https://example.com/b.png"
+    await db_session.commit()
+
+    changed = await test_client.get(
+        f"/home-design/projects/{project.id}",
+        headers={**authenticated_user["headers"], "If-None-Match": etag},
+    )
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.headers["ETag"] != etag
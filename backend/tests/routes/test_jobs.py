@@ -0,0 +1,42 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import BackgroundJob, User
+from app.routes.jobs import get_job
+
+
+@pytest.fixture
+def job(mocker):
+    owner = User(id=uuid.uuid4(), email="owner@example.com", is_superuser=False)
+    job = BackgroundJob(id=uuid.uuid4(), kind="update-empty-names", user_id=owner.id)
+    db = mocker.Mock()
+    db.get = mocker.AsyncMock(return_value=job)
+    return job, owner, db
+
+
+@pytest.mark.asyncio
+async def test_owner_can_read_job(job):
+    job, owner, db = job
+
+    assert await get_job(job.id, user=owner, db=db) is job
+
+
+@pytest.mark.asyncio
+async def test_superuser_can_read_any_job(job):
+    job, _, db = job
+    admin = User(id=uuid.uuid4(), email="admin@example.com", is_superuser=True)
+
+    assert await get_job(job.id, user=admin, db=db) is job
+
+
+@pytest.mark.asyncio
+async def test_other_users_cannot_see_job(job):
+    job, _, db = job
+    other = User(id=uuid.uuid4(), email="other@example.com", is_superuser=False)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_job(job.id, user=other, db=db)
+
+    assert exc_info.value.status_code == 404
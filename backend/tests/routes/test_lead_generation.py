@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.models import Lead
+from app.routes.lead_generation import InstagramURLRequest, process_instagram_url
+
+
+class FakeBaserow:
+    def __init__(self, missing_rows=()):
+        self.missing_rows = set(missing_rows)
+        self.updated = []
+        self.created = []
+
+    async def update_row(self, table_id, row_id, payload):
+        if row_id in self.missing_rows:
+            raise HTTPException(status_code=404, detail="Failed to update row")
+        self.updated.append(row_id)
+        return {"id": row_id, **payload}
+
+    async def create_row(self, table_id, payload):
+        self.created.append(payload)
+        return {"id": 99, **payload}
+
+
+class FakeInstagram:
+    async def fetch(self, username):
+        return {"name": username.title(), "biography": ""}
+
+
+async def add_lead(db_session, username, row_id):
+    db_session.add(
+        Lead(
+            username=username,
+            baserow_row_id=row_id,
+            instagram_url=f"https://www.instagram.com/{username}",
+            synced_at=datetime(2025, 1, 1),
+        )
+    )
+    await db_session.commit()
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_process_instagram_url_updates_indexed_lead(db_session):
+    await add_lead(db_session, "home.ideas", 7)
+    baserow = FakeBaserow()
+
+    response = await process_instagram_url(
+        InstagramURLRequest(instagram_url="https://www.instagram.com/Home.Ideas/"),
+        db=db_session,
+        baserow=baserow,
+        instagram=FakeInstagram(),
+    )
+
+    assert response["message"] == "Profile updated successfully"
+    assert baserow.updated == [7]
+    assert baserow.created == []
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_process_instagram_url_recreates_row_deleted_in_baserow(db_session):
+    await add_lead(db_session, "home.ideas", 7)
+    baserow = FakeBaserow(missing_rows=[7])
+
+    response = await process_instagram_url(
+        InstagramURLRequest(instagram_url="@home.ideas"),
+        db=db_session,
+        baserow=baserow,
+        instagram=FakeInstagram(),
+    )
+
+    assert response["message"] == "Profile added successfully"
+    assert len(baserow.created) == 1
+    result = await db_session.execute(select(Lead.baserow_row_id))
+    assert result.scalars().all() == [99]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_process_instagram_url_creates_unindexed_lead(db_session):
+    baserow = FakeBaserow()
+
+    response = await process_instagram_url(
+        InstagramURLRequest(instagram_url="https://instagram.com/new.profile"),
+        db=db_session,
+        baserow=baserow,
+        instagram=FakeInstagram(),
+    )
+
+    assert response["message"] == "Profile added successfully"
+    assert baserow.updated == []
+    assert await db_session.get(Lead, "new.profile") is not None
@@ -0,0 +1,93 @@
+import asyncio
+import signal
+
+import pytest
+from fastapi import HTTPException
+
+from app.background import ShutdownSignal, TaskTracker
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_running_tasks():
+    tracker = TaskTracker("test")
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.01)
+        finished.append(True)
+
+    tracker.spawn(work())
+    cancelled = await tracker.drain(timeout=1)
+
+    assert cancelled == 0
+    assert finished == [True]
+    assert len(tracker) == 0
+
+
+@pytest.mark.asyncio
+async def test_drain_cancels_tasks_still_running_at_the_deadline():
+    tracker = TaskTracker("test")
+    task = tracker.spawn(asyncio.sleep(10))
+
+    cancelled = await tracker.drain(timeout=0.01)
+
+    assert cancelled == 1
+    assert task.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_no_new_work_is_accepted_while_draining():
+    tracker = TaskTracker("test")
+    await tracker.drain(timeout=0)
+
+    with pytest.raises(HTTPException) as error:
+        tracker.spawn(asyncio.sleep(0))
+    assert error.value.status_code == 503
+    with pytest.raises(HTTPException):
+        tracker.require_accepting()
+
+    tracker.start()
+    tracker.require_accepting()
+
+
+@pytest.mark.asyncio
+async def test_shutdown_wait_for_returns_result_or_times_out():
+    shutdown = ShutdownSignal()
+    queue = asyncio.Queue()
+    queue.put_nowait("event")
+
+    assert await shutdown.wait_for(queue.get(), timeout=1) == "event"
+    with pytest.raises(asyncio.TimeoutError):
+        await shutdown.wait_for(queue.get(), timeout=0.01)
+
+
+@pytest.mark.asyncio
+async def test_signal_ends_waits_and_reaches_the_server_handler():
+    shutdown = ShutdownSignal()
+    received = []
+    original = signal.signal(signal.SIGTERM, lambda *args: received.append(args[0]))
+    try:
+        shutdown.install()
+        waiting = asyncio.ensure_future(
+            shutdown.wait_for(asyncio.Queue().get(), timeout=10)
+        )
+        await asyncio.sleep(0)
+
+        signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+
+        assert await asyncio.wait_for(waiting, timeout=1) is None
+        assert shutdown.is_set()
+        assert received == [signal.SIGTERM]
+    finally:
+        signal.signal(signal.SIGTERM, original)
+
+
+def test_shutdown_stops_accepting_new_work():
+    shutdown = ShutdownSignal()
+    tracker = TaskTracker("test")
+    shutdown.add_callback(tracker.stop_accepting)
+
+    shutdown.set()
+
+    with pytest.raises(HTTPException):
+        tracker.require_accepting()
@@ -0,0 +1,99 @@
+import gzip
+import zlib
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.compression import CompressionMiddleware, Encoder, choose_encoding
+
+LARGE_BODY = "home design " * 500
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1000)
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse(LARGE_BODY)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/events")
+    async def events():
+        async def stream():
+            yield "data: " + LARGE_BODY + "\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+async def get(app, path, accept_encoding):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        return await client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip", "gzip"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("br;q=0, gzip;q=0", None),
+        ("*", "br"),
+        ("identity", None),
+        ("", None),
+    ],
+)
+def test_choose_encoding(accept_encoding, expected):
+    assert choose_encoding(accept_encoding) == expected
+
+
+def test_encoder_flushes_each_chunk():
+    encoder = Encoder("gzip", gzip_level=6, brotli_quality=4)
+    decoder = zlib.decompressobj(31)
+
+    first = decoder.decompress(encoder.compress(b"first chunk", final=False))
+    second = decoder.decompress(encoder.compress(b" second", final=True))
+
+    assert first == b"first chunk"
+    assert second == b" second"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "encoding, decompress", [("br", brotli.decompress), ("gzip", gzip.decompress)]
+)
+async def test_large_responses_are_compressed(app, encoding, decompress):
+    response = await get(app, "/large", encoding)
+
+    assert response.headers["Content-Encoding"] == encoding
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert int(response.headers["Content-Length"]) < len(LARGE_BODY)
+    # httpx decodes gzip and br transparently
+    assert response.text == LARGE_BODY
+
+
+@pytest.mark.asyncio
+async def test_small_responses_are_not_compressed(app):
+    response = await get(app, "/small", "br, gzip")
+
+    assert "Content-Encoding" not in response.headers
+    assert response.text == "ok"
+
+
+@pytest.mark.asyncio
+async def test_event_streams_are_not_compressed(app):
+    response = await get(app, "/events", "br, gzip")
+
+    assert "Content-Encoding" not in response.headers
+    assert response.text == "data: " + LARGE_BODY + "\n\n"
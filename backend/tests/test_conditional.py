@@ -0,0 +1,85 @@
+from datetime import datetime
+
+from fastapi import Request
+
+from app.conditional import is_not_modified, make_etag, validator_headers
+
+UPDATED_AT = datetime(2025, 3, 1, 12, 30, 15, 250000)
+
+
+def make_request(**headers):
+    return Request(
+        {
+            "type": "http",
+            "headers": [
+                (name.replace("_", "-").lower().encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+def test_make_etag_changes_with_version():
+    etag = make_etag("project", UPDATED_AT)
+
+    assert etag.startswith('W/"')
+    assert etag == make_etag("project", UPDATED_AT)
+    assert etag != make_etag("project", datetime(2025, 3, 1, 12, 30, 16))
+
+
+def test_validator_headers_format_last_modified_as_http_date():
+    headers = validator_headers('W/"abc"', UPDATED_AT)
+
+    assert headers["ETag"] == 'W/"abc"'
+    assert headers["Last-Modified"] == "Sat, 01 Mar 2025 12:30:15 GMT"
+    assert headers["Cache-Control"] == "private, no-cache"
+
+
+def test_if_none_match_uses_weak_comparison():
+    etag = make_etag("project", UPDATED_AT)
+    strong = etag.removeprefix("W/")
+
+    assert is_not_modified(make_request(if_none_match=etag), etag, UPDATED_AT)
+    assert is_not_modified(
+        make_request(if_none_match=f'"other", {strong}'), etag, UPDATED_AT
+    )
+    assert not is_not_modified(make_request(if_none_match='"other"'), etag, UPDATED_AT)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    etag = make_etag("project", UPDATED_AT)
+    request = make_request(
+        if_none_match='"other"',
+        if_modified_since="Sat, 01 Mar 2025 12:30:15 GMT",
+    )
+
+    assert not is_not_modified(request, etag, UPDATED_AT)
+
+
+def test_if_modified_since_needs_a_change_before_that_second():
+    etag = make_etag("project", UPDATED_AT)
+
+    assert is_not_modified(
+        make_request(if_modified_since="Sat, 01 Mar 2025 12:30:16 GMT"),
+        etag,
+        UPDATED_AT,
+    )
+    # Modified within the second the date names: it may be newer than the copy
+    assert not is_not_modified(
+        make_request(if_modified_since="Sat, 01 Mar 2025 12:30:15 GMT"),
+        etag,
+        UPDATED_AT,
+    )
+    assert is_not_modified(
+        make_request(if_modified_since="Sat, 01 Mar 2025 12:30:15 GMT"),
+        etag,
+        datetime(2025, 3, 1, 12, 30, 14, 999999),
+    )
+    assert not is_not_modified(
+        make_request(if_modified_since="Sat, 01 Mar 2025 12:30:14 GMT"),
+        etag,
+        UPDATED_AT,
+    )
+    assert not is_not_modified(
+        make_request(if_modified_since="not a date"), etag, UPDATED_AT
+    )
@@ -0,0 +1,110 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.conversations import (
+    append_conversation_messages,
+    attach_image_to_last_assistant_message,
+)
+from app.models import HomeDesignConversation, HomeDesignProject, User
+
+
+@pytest.mark.asyncio
+async def test_append_conversation_messages_is_a_single_update(mocker):
+    db = mocker.Mock()
+    db.execute = mocker.AsyncMock(return_value=mocker.Mock(rowcount=1))
+    messages = [{"role": "user", "content": "Paint it blue"}]
+
+    assert await append_conversation_messages(db, "conv-1", messages)
+
+    db.execute.assert_awaited_once()
+    statement = db.execute.call_args[0][0]
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("UPDATE home_design_conversations SET")
+    assert "messages=(home_design_conversations.messages || " in sql
+
+
+@pytest.mark.asyncio
+async def test_attach_image_reports_missing_conversation(mocker):
+    db = mocker.Mock()
+    db.execute = mocker.AsyncMock(return_value=mocker.Mock(rowcount=0))
+
+    attached = await attach_image_to_last_assistant_message(
+        db, "conv-1", "https://cdn.example.com/b.png"
+    )
+
+    assert not attached
+    assert db.execute.call_args[0][1] == {
+        "conversation_id": "conv-1",
+        "image_url": "https://cdn.example.com/b.png",
+    }
+
+
+@pytest_asyncio.fixture
+async def conversation(db_session):
+    user = User(id=uuid.uuid4(), email="chat@example.com", hashed_password="x")
+    project = HomeDesignProject(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        name="Chat",
+        original_image_url="https://example.com/a.png",
+        current_image_url="https://example.com/a.png",
+    )
+    conversation = HomeDesignConversation(
+        id=uuid.uuid4(), project_id=project.id, messages=[]
+    )
+    db_session.add_all([user, project, conversation])
+    await db_session.flush()
+    return conversation
+
+
+async def stored_messages(db_session, conversation_id):
+    result = await db_session.execute(
+        select(HomeDesignConversation.messages).where(
+            HomeDesignConversation.id == conversation_id
+        )
+    )
+    return result.scalar_one()
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_attach_image_sets_only_last_assistant_message(db_session, conversation):
+    messages = [
+        {"role": "user", "content": "Paint it blue"},
+        {"role": "assistant", "content": "Painting it blue"},
+        {"role": "user", "content": "Now green"},
+        {"role": "assistant", "content": "Painting it green"},
+        {"role": "user", "content": "Thanks"},
+    ]
+    assert await append_conversation_messages(db_session, conversation.id, messages)
+
+    attached = await attach_image_to_last_assistant_message(
+        db_session, conversation.id, "https://cdn.example.com/green.png"
+    )
+
+    assert attached
+    stored = await stored_messages(db_session, conversation.id)
+    assert [message.get("image_url") for message in stored] == [
+        None,
+        None,
+        None,
+        "https://cdn.example.com/green.png",
+        None,
+    ]
+    assert stored[3]["content"] == "Painting it green"
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_attach_image_without_assistant_message(db_session, conversation):
+    messages = [{"role": "user", "content": "Paint it blue"}]
+    assert await append_conversation_messages(db_session, conversation.id, messages)
+
+    attached = await attach_image_to_last_assistant_message(
+        db_session, conversation.id, "https://cdn.example.com/blue.png"
+    )
+
+    assert not attached
+    assert await stored_messages(db_session, conversation.id) == messages
@@ -1,12 +1,25 @@
+from unittest.mock import MagicMock
+
 import pytest
 from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine
+from fastapi import Request, Response
 from fastapi_users.db import SQLAlchemyUserDatabase
+from fastapi_users.jwt import generate_jwt
 
+from app.config import settings
 from app.database import (
+    RECENT_WRITE_COOKIE,
+    InstrumentedAsyncAdaptedQueuePool,
     async_session_maker,
     create_db_and_tables,
+    create_engine,
     get_async_session,
+    get_request_subject,
     get_user_db,
+    prewarm_pool,
+    recent_write_token,
+    track_writes,
+    wrote_recently,
 )
 from app.models import Base, User
 
@@ -96,13 +109,142 @@ def test_engine_creation(mocker):
 
     # Verify engine is created
     assert isinstance(engine, AsyncEngine)
+    assert isinstance(engine.pool, InstrumentedAsyncAdaptedQueuePool)
+    assert engine.pool.size() == settings.DATABASE_POOL_SIZE
 
     # Verify session maker is configured
     assert async_session_maker.kw["expire_on_commit"] is False
 
 
+def test_create_engine_configures_pool(mocker):
+    create_async_engine = mocker.patch("app.database.create_async_engine")
+    mocker.patch("app.database.instrument_engine")
+
+    create_engine("postgresql+asyncpg://db/test")
+
+    create_async_engine.assert_called_once_with(
+        "postgresql+asyncpg://db/test",
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        connect_args={
+            "prepared_statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
 @pytest.mark.asyncio
 async def test_session_maker_configuration():
     # Create a test session
     async with async_session_maker() as session:
         assert isinstance(session, AsyncSession)
+
+
+def test_instrumented_pool_records_checkouts():
+    pool = InstrumentedAsyncAdaptedQueuePool(
+        creator=MagicMock, pool_size=1, max_overflow=1
+    )
+
+    first = pool.connect()
+    second = pool.connect()
+    assert pool.checkedout() == 2
+    assert pool.overflow() == 1
+    first.close()
+    second.close()
+
+    assert pool.checkouts == 2
+    assert pool.checkout_wait_seconds_total >= pool.checkout_wait_seconds_max >= 0
+
+
+def make_request(authorization=None, cookie=None, method="GET"):
+    headers = []
+    if authorization:
+        headers.append((b"authorization", authorization.encode()))
+    if cookie:
+        headers.append((b"cookie", f"{RECENT_WRITE_COOKIE}={cookie}".encode()))
+    return Request({"type": "http", "method": method, "headers": headers})
+
+
+def test_get_request_subject_reads_bearer_token():
+    token = generate_jwt(
+        {"sub": "user-1", "aud": ["fastapi-users:auth"]},
+        settings.ACCESS_SECRET_KEY,
+        lifetime_seconds=60,
+    )
+
+    assert get_request_subject(make_request(f"Bearer {token}")) == "user-1"
+    assert get_request_subject(make_request("Bearer not-a-token")) is None
+    assert get_request_subject(make_request()) is None
+
+
+def test_recent_write_cookie_is_bound_to_user_and_expires(monkeypatch):
+    token = recent_write_token("user-2")
+    assert wrote_recently(make_request(cookie=token), "user-2")
+    assert not wrote_recently(make_request(cookie=token), "user-3")
+    assert not wrote_recently(make_request(cookie=token), None)
+    assert not wrote_recently(make_request(cookie="tampered"), "user-2")
+    assert not wrote_recently(make_request(), "user-2")
+
+    monkeypatch.setattr("app.database.settings.READ_YOUR_WRITES_SECONDS", -1.0)
+    expired = recent_write_token("user-2")
+    assert not wrote_recently(make_request(cookie=expired), "user-2")
+
+
+@pytest.mark.asyncio
+async def test_track_writes_sets_cookie_after_successful_writes(mocker):
+    mocker.patch("app.database.read_engine", mocker.Mock())
+    token = generate_jwt(
+        {"sub": "user-4", "aud": ["fastapi-users:auth"]},
+        settings.ACCESS_SECRET_KEY,
+        lifetime_seconds=60,
+    )
+
+    async def ok(request):
+        return Response(status_code=200)
+
+    async def failed(request):
+        return Response(status_code=400)
+
+    response = await track_writes(make_request(f"Bearer {token}", method="POST"), ok)
+    cookie = response.headers["set-cookie"]
+    assert cookie.startswith(f"{RECENT_WRITE_COOKIE}=")
+    assert "SameSite=none" in cookie and "Secure" in cookie
+    written = cookie.split(";")[0].split("=", 1)[1]
+    assert wrote_recently(make_request(cookie=written), "user-4")
+
+    response = await track_writes(make_request(f"Bearer {token}", method="GET"), ok)
+    assert "set-cookie" not in response.headers
+    response = await track_writes(
+        make_request(f"Bearer {token}", method="POST"), failed
+    )
+    assert "set-cookie" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_prewarm_pool_warms_replica_engine(mocker):
+    mocker.patch.object(settings, "DATABASE_POOL_SIZE", 3)
+
+    def mock_engine():
+        engine = mocker.Mock()
+        engine.connect.return_value.start = mocker.AsyncMock(
+            return_value=mocker.AsyncMock()
+        )
+        return engine
+
+    primary, replica = mock_engine(), mock_engine()
+    mocker.patch("app.database.engine", primary)
+    mocker.patch("app.database.read_engine", replica)
+
+    await prewarm_pool()
+
+    assert primary.connect.call_count == 3
+    assert replica.connect.call_count == 3
+
+    mocker.patch("app.database.read_engine", primary)
+    await prewarm_pool()
+
+    assert primary.connect.call_count == 6
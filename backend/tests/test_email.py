@@ -1,8 +1,18 @@
+import uuid
+
 import pytest
-from pathlib import Path
-from fastapi_mail import ConnectionConfig, MessageSchema
-from app.email import get_email_config, send_reset_password_email
-from app.models import User
+from app.email import (
+    AUTH_EMAIL_TOPIC,
+    RESET_PASSWORD_EMAIL,
+    VERIFICATION_EMAIL,
+    SMTPPool,
+    build_email_message,
+    load_email_templates,
+    send_reset_password_email,
+)
+from app.models import OutboxMessage, User
+from app.users import UserManager, build_auth_email
+from fastapi_users.jwt import decode_jwt
 
 
 @pytest.fixture
@@ -19,7 +29,7 @@ def mock_settings(mocker):
     mock.MAIL_SSL_TLS = False
     mock.USE_CREDENTIALS = True
     mock.VALIDATE_CERTS = True
-    mock.TEMPLATE_DIR = "email_templates"
+    mock.MAIL_TIMEOUT_SECONDS = 30
     mock.FRONTEND_URL = "http://test-frontend.com"
     return mock
 
@@ -27,63 +37,98 @@ def mock_settings(mocker):
 @pytest.fixture
 def mock_user():
     return User(
+        id=uuid.uuid4(),
         email="user@example.com",
+        hashed_password="hashed",
+        is_active=True,
+        is_verified=False,
     )
 
 
-def test_get_email_config(mock_settings):
-    config = get_email_config()
+def test_build_email_message_renders_template(mock_settings):
+    load_email_templates()
+
+    message = build_email_message(
+        to="user@example.com",
+        subject="Verify your email - HomeIdeasAI",
+        reply_to="rohan@homeideasai.com",
+        template="verify_email.html",
+        context={"username": "user@example.com", "link": "http://x/?token=<t>"},
+    )
 
-    assert isinstance(config, ConnectionConfig)
-    assert config.MAIL_USERNAME == "test_user"
-    assert config.MAIL_PASSWORD == "test_pass"
-    assert config.MAIL_FROM == "test@example.com"
-    assert config.MAIL_PORT == 587
-    assert config.MAIL_SERVER == "smtp.test.com"
-    assert config.MAIL_FROM_NAME == "Test Sender"
-    assert config.MAIL_STARTTLS
-    assert not config.MAIL_SSL_TLS
-    assert config.USE_CREDENTIALS
-    assert config.VALIDATE_CERTS
-    assert isinstance(config.TEMPLATE_FOLDER, Path)
+    assert message["From"] == "Test Sender <test@example.com>"
+    assert message["To"] == "user@example.com"
+    body = message.get_content()
+    assert "Hello user@example.com" in body
+    # Template values are HTML-escaped
+    assert "http://x/?token=&lt;t&gt;" in body
 
 
 @pytest.mark.asyncio
-async def test_send_reset_password_email(mock_settings, mock_user, mocker):
-    # Mock FastMail
-    mock_fastmail = mocker.patch("app.email.FastMail")
-    mock_fastmail_instance = mock_fastmail.return_value
-    mock_fastmail_instance.send_message = mocker.AsyncMock()
-
-    # Test data
-    test_token = "test-token-123"
-
-    # Call the function
-    await send_reset_password_email(mock_user, test_token)
-
-    # Verify FastMail was instantiated with correct config
-    mock_fastmail.assert_called_once()
-    config_arg = mock_fastmail.call_args[0][0]
-    assert isinstance(config_arg, ConnectionConfig)
-
-    # Verify send_message was called
-    mock_fastmail_instance.send_message.assert_called_once()
-
-    # Verify the message schema
-    message_arg = mock_fastmail_instance.send_message.call_args[0][0]
-    assert isinstance(message_arg, MessageSchema)
-    assert message_arg.subject == "Password recovery"
-    assert message_arg.recipients == [mock_user.email]
-
-    # Verify template body contains correct data
-    expected_link = (
-        f"http://test-frontend.com/password-recovery/confirm?token={test_token}"
-    )
-    assert message_arg.template_body == {
-        "username": mock_user.email,
-        "link": expected_link,
+async def test_send_reset_password_email_queues_outbox_message(
+    mock_settings, mock_user, mocker
+):
+    db = mocker.Mock()
+    db.commit = mocker.AsyncMock()
+    notify = mocker.patch("app.email.outbox_dispatcher.notify")
+
+    await send_reset_password_email(db, mock_user)
+
+    message = db.add.call_args[0][0]
+    assert isinstance(message, OutboxMessage)
+    assert message.topic == AUTH_EMAIL_TOPIC
+    # No token is stored; it is minted when the email is sent
+    assert message.payload == {
+        "kind": RESET_PASSWORD_EMAIL,
+        "user_id": str(mock_user.id),
     }
+    db.commit.assert_awaited_once()
+    notify.assert_called_once()
+
+
+def test_build_auth_email_mints_reset_token(mock_settings, mock_user, mocker):
+    load_email_templates()
+    user_manager = UserManager(mocker.Mock())
+
+    message = build_auth_email(user_manager, mock_user, RESET_PASSWORD_EMAIL)
+
+    assert message["To"] == mock_user.email
+    body = message.get_content()
+    token = body.split("password-recovery/confirm?token=")[1].split('"')[0]
+    data = decode_jwt(
+        token,
+        user_manager.reset_password_token_secret,
+        [user_manager.reset_password_token_audience],
+    )
+    assert data["sub"] == str(mock_user.id)
+
+
+def test_build_auth_email_skips_verified_users(mock_settings, mock_user, mocker):
+    mock_user.is_verified = True
+
+    message = build_auth_email(
+        UserManager(mocker.Mock()), mock_user, VERIFICATION_EMAIL
+    )
+
+    assert message is None
+
+
+@pytest.mark.asyncio
+async def test_smtp_pool_reuses_connections(mock_settings, mocker):
+    smtp = mocker.patch("app.email.aiosmtplib.SMTP")
+    connection = smtp.return_value
+    connection.is_connected = False
+
+    async def connect():
+        connection.is_connected = True
+
+    connection.connect = mocker.AsyncMock(side_effect=connect)
+    connection.send_message = mocker.AsyncMock()
+    pool = SMTPPool(size=1)
+
+    await pool.send("first")
+    await pool.send("second")
 
-    # Verify template name
-    template_name = mock_fastmail_instance.send_message.call_args[1]["template_name"]
-    assert template_name == "password_reset.html"
+    smtp.assert_called_once()
+    connection.connect.assert_awaited_once()
+    assert connection.send_message.await_count == 2
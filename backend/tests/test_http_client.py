@@ -0,0 +1,78 @@
+import time
+
+import httpx
+import pytest
+
+from app.http_client import RateLimiter, RetryTransport, get_retry_after
+
+
+def make_transport(responses, calls):
+    def handler(request):
+        calls.append(request)
+        return responses[len(calls) - 1]
+
+    return RetryTransport(
+        httpx.MockTransport(handler),
+        max_retries=2,
+        backoff_seconds=0,
+        max_backoff_seconds=0,
+    )
+
+
+@pytest.mark.asyncio
+async def test_retries_429_and_5xx_until_success():
+    calls = []
+    transport = make_transport(
+        [httpx.Response(429), httpx.Response(503), httpx.Response(200)], calls
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.get("https://api.baserow.io/rows")
+
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_post_on_5xx():
+    calls = []
+    transport = make_transport([httpx.Response(502), httpx.Response(200)], calls)
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.post("https://api.baserow.io/rows", json={})
+
+    assert response.status_code == 502
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries():
+    calls = []
+    transport = make_transport([httpx.Response(500)] * 3, calls)
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.get("https://api.baserow.io/rows")
+
+    assert response.status_code == 500
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({}, None),
+        ({"Retry-After": "7"}, 7.0),
+        ({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, 0.0),
+        ({"Retry-After": "soon"}, None),
+    ],
+)
+def test_get_retry_after(headers, expected):
+    assert get_retry_after(httpx.Response(429, headers=headers)) == expected
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_out_calls():
+    limiter = RateLimiter(rate=50)
+    started = time.monotonic()
+    for _ in range(5):
+        await limiter.wait()
+
+    # The first call passes immediately, the next four wait 20ms each
+    assert time.monotonic() - started >= 0.075
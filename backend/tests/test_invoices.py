@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+from app.invoices import invoice_values
+
+
+def test_invoice_values_keeps_created_in_utc():
+    values = invoice_values(
+        {
+            "id": "in_1",
+            "customer": "cus_1",
+            "total": 1500,
+            "created": 1735689600,
+            "lines": {"data": [{"quantity": 2}, {"quantity": 3}]},
+        }
+    )
+
+    assert values["created"] == datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert values["created"].tzinfo is timezone.utc
+    assert values["credits"] == 5
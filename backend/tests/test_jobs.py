@@ -0,0 +1,35 @@
+import pytest
+
+from app.jobs import _create_scheduled_jobs
+
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    monkeypatch.setattr("app.jobs.JOB_SCHEDULES", {"test-sync": 3600})
+
+
+@pytest.mark.asyncio
+async def test_scheduled_job_is_skipped_while_another_worker_holds_the_lock(
+    scheduled, mocker
+):
+    db = mocker.AsyncMock()
+    db.scalar.return_value = False
+    create_job = mocker.patch("app.jobs.create_job", new_callable=mocker.AsyncMock)
+
+    await _create_scheduled_jobs(db)
+
+    db.scalar.assert_awaited_once()
+    create_job.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_scheduled_job_is_created_under_the_lock_when_none_is_recent(
+    scheduled, mocker
+):
+    db = mocker.AsyncMock()
+    db.scalar.side_effect = [True, None]
+    create_job = mocker.patch("app.jobs.create_job", new_callable=mocker.AsyncMock)
+
+    await _create_scheduled_jobs(db)
+
+    create_job.assert_awaited_once_with(db, "test-sync")
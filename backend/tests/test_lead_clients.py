@@ -0,0 +1,160 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.lead_clients import (
+    CachedInstagramAnalyticsClient,
+    InstagramAnalyticsClient,
+    build_profile_fields,
+    extract_instagram_username,
+)
+from app.models import InstagramAnalyticsCache
+
+
+class FakeInstagram:
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    async def fetch(self, username):
+        self.calls.append(username)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.fixture
+def session_maker(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("https://www.instagram.com/home.ideas/", "home.ideas"),
+        ("@home.ideas", "home.ideas"),
+        ("https://instagram.com/home.ideas?igsh=abc", "home.ideas"),
+        ("", ""),
+    ],
+)
+def test_extract_instagram_username(value, expected):
+    assert extract_instagram_username(value) == expected
+
+
+def test_build_profile_fields_extracts_contact_email():
+    fields = build_profile_fields(
+        {
+            "name": "Home",
+            "biography": "Contact: hi@home.com",
+            "engagement_rate": 0.123456,
+        }
+    )
+
+    assert fields["Contact Email"] == "hi@home.com"
+    assert fields["Engagement Rate"] == 0.1235
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status_code", [429, 503])
+async def test_analytics_client_raises_on_transient_failures(status_code):
+    transport = httpx.MockTransport(lambda request: httpx.Response(status_code))
+    client = InstagramAnalyticsClient(httpx.AsyncClient(transport=transport))
+
+    with pytest.raises(HTTPException) as error:
+        await client.fetch("home.ideas")
+    assert error.value.status_code == status_code
+
+
+@pytest.mark.asyncio
+async def test_analytics_client_returns_none_for_missing_profile():
+    transport = httpx.MockTransport(lambda request: httpx.Response(404))
+    client = InstagramAnalyticsClient(httpx.AsyncClient(transport=transport))
+
+    assert await client.fetch("missing") is None
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_cache_serves_fresh_entries_without_upstream_call(session_maker):
+    upstream = FakeInstagram({"name": "Home"})
+    client = CachedInstagramAnalyticsClient(upstream, session_maker)
+
+    assert await client.fetch("@Home.Ideas") == {"name": "Home"}
+    assert await client.fetch("home.ideas") == {"name": "Home"}
+    assert upstream.calls == ["home.ideas"]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_cache_remembers_missing_profiles(session_maker):
+    upstream = FakeInstagram(None)
+    client = CachedInstagramAnalyticsClient(upstream, session_maker)
+
+    assert await client.fetch("missing") is None
+    assert await client.fetch("missing") is None
+    assert upstream.calls == ["missing"]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_cache_serves_stale_entry_and_refreshes(session_maker):
+    async with session_maker() as db:
+        db.add(
+            InstagramAnalyticsCache(
+                username="stale",
+                data={"name": "Old"},
+                fetched_at=datetime.utcnow() - timedelta(days=30),
+            )
+        )
+        await db.commit()
+    upstream = FakeInstagram({"name": "New"})
+    client = CachedInstagramAnalyticsClient(upstream, session_maker)
+
+    assert await client.fetch("stale") == {"name": "Old"}
+    await asyncio.gather(*CachedInstagramAnalyticsClient._refreshing.values())
+
+    async with session_maker() as db:
+        entry = await db.get(InstagramAnalyticsCache, "stale")
+        assert entry.data == {"name": "New"}
+
+
+@pytest.mark.parametrize(
+    "error",
+    [HTTPException(status_code=503), httpx.ReadTimeout("timed out")],
+)
+@pytest.mark.asyncio(loop_scope="function")
+async def test_failed_refresh_keeps_stale_entry(session_maker, error):
+    async with session_maker() as db:
+        db.add(
+            InstagramAnalyticsCache(
+                username="flaky",
+                data={"name": "Old"},
+                fetched_at=datetime.utcnow() - timedelta(days=30),
+            )
+        )
+        await db.commit()
+    upstream = FakeInstagram(error)
+    client = CachedInstagramAnalyticsClient(upstream, session_maker)
+
+    assert await client.fetch("flaky") == {"name": "Old"}
+    await asyncio.gather(*CachedInstagramAnalyticsClient._refreshing.values())
+
+    async with session_maker() as db:
+        entry = await db.get(InstagramAnalyticsCache, "flaky")
+        assert entry.data == {"name": "Old"}
+
+
+@pytest.mark.parametrize(
+    "error",
+    [HTTPException(status_code=429), httpx.ConnectTimeout("timed out")],
+)
+@pytest.mark.asyncio(loop_scope="function")
+async def test_transient_failures_are_not_cached(session_maker, error):
+    upstream = FakeInstagram(error)
+    client = CachedInstagramAnalyticsClient(upstream, session_maker)
+
+    assert await client.fetch("busy") is None
+    upstream.result = {"name": "Busy"}
+    assert await client.fetch("busy") == {"name": "Busy"}
+    assert upstream.calls == ["busy", "busy"]
@@ -0,0 +1,88 @@
+import pytest
+
+from app import lead_imports
+from app.lead_imports import import_instagram_urls, parse_csv_urls
+
+
+def test_parse_csv_urls_uses_header_column():
+    content = b"\xef\xbb\xbfname,Instagram Page\nA,https://instagram.com/a\nB,\nC,@c\n"
+
+    assert parse_csv_urls(content) == ["https://instagram.com/a", "@c"]
+
+
+def test_parse_csv_urls_without_header_uses_first_column():
+    assert parse_csv_urls(b"https://instagram.com/a\n\n@b,x\n") == [
+        "https://instagram.com/a",
+        "@b",
+    ]
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+
+class FakeBaserow:
+    def __init__(self):
+        self.created = []
+        self.updated = []
+
+    async def batch_create_rows(self, table_id, items):
+        self.created.append(items)
+        return [{"id": 100 + i, **item} for i, item in enumerate(items)]
+
+    async def batch_update_rows(self, table_id, items):
+        self.updated.append(items)
+        return items
+
+
+class FakeInstagram:
+    async def fetch(self, username):
+        if username == "missing":
+            return None
+        return {"name": username.title()}
+
+
+@pytest.mark.asyncio
+async def test_import_instagram_urls_dedupes_and_batches(monkeypatch):
+    indexed = []
+
+    async def get_lead_row_ids(db, usernames):
+        assert sorted(usernames) == ["existing", "missing", "new"]
+        return {"existing": 7}
+
+    async def upsert_leads(db, rows):
+        indexed.extend(rows)
+
+    monkeypatch.setattr(lead_imports, "get_lead_row_ids", get_lead_row_ids)
+    monkeypatch.setattr(lead_imports, "upsert_leads", upsert_leads)
+    baserow = FakeBaserow()
+
+    results = [
+        result
+        async for result in import_instagram_urls(
+            baserow,
+            FakeInstagram(),
+            "1",
+            ["https://instagram.com/New/", "@new", "", "@existing", "@missing"],
+            session_maker=FakeSession,
+        )
+    ]
+
+    statuses = {(result["input"], result["status"]) for result in results}
+    assert statuses == {
+        ("@new", "duplicate"),
+        ("", "invalid"),
+        ("@missing", "not_found"),
+        ("https://instagram.com/New/", "created"),
+        ("@existing", "updated"),
+    }
+    assert baserow.created[0][0]["Instagram Page"] == "https://www.instagram.com/New"
+    assert baserow.updated[0][0]["id"] == 7
+    assert [row["id"] for row in indexed] == [100]
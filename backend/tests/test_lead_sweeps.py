@@ -0,0 +1,254 @@
+import pytest
+from fastapi import HTTPException
+
+from app.lead_sweeps import remove_duplicates, update_empty_names
+
+
+class FakeBaserow:
+    def __init__(self, pages):
+        self.pages = pages
+        self.batches = []
+
+    async def list_rows(
+        self, table_id, page=1, search=None, size=None, order_by=None, after_id=None
+    ):
+        remaining = [
+            [row for row in rows if after_id is None or row["id"] > after_id]
+            for rows in self.pages
+        ]
+        remaining = [rows for rows in remaining if rows]
+        if not remaining:
+            return {"results": [], "next": None}
+        return {"results": remaining[0], "next": "more" if remaining[1:] else None}
+
+    async def batch_update_rows(self, table_id, items):
+        self.batches.append(items)
+        return items
+
+
+class FakeInstagram:
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.calls = []
+
+    async def fetch(self, username):
+        self.calls.append(username)
+        if username in self.missing:
+            return None
+        return {"name": username.title(), "biography": f"{username}@example.com"}
+
+
+@pytest.mark.asyncio
+async def test_update_empty_names_batches_updates():
+    pages = [
+        [
+            {
+                "id": page * 1000 + i,
+                "Name": "",
+                "Instagram Page": f"https://www.instagram.com/u{page}_{i}/",
+            }
+            for i in range(200)
+        ]
+        for page in range(2)
+    ]
+    pages[1].append({"id": 9999, "Name": "Already set", "Instagram Page": "x"})
+    baserow = FakeBaserow(pages)
+    instagram = FakeInstagram(missing={"u0_0"})
+
+    stats = await update_empty_names(baserow, instagram, "1", concurrency=5)
+
+    assert stats == {"pages": 2, "rows_checked": 401, "rows_updated": 399}
+    assert [len(batch) for batch in baserow.batches] == [200, 199]
+    assert "x" not in instagram.calls
+    first = baserow.batches[0][0]
+    assert first["id"] == 1
+    assert first["Name"] == "U0_1"
+    assert first["Contact Email"] == "u0_1@example.com"
+
+
+@pytest.mark.asyncio
+async def test_update_empty_names_resumes_from_checkpoint():
+    pages = [
+        [
+            {"id": page * 10 + i, "Name": "", "Instagram Page": f"u{page}_{i}"}
+            for i in range(3)
+        ]
+        for page in range(3)
+    ]
+    checkpoints = []
+
+    async def on_progress(checkpoint, progress):
+        checkpoints.append(checkpoint)
+
+    await update_empty_names(
+        FakeBaserow(pages), FakeInstagram(), "1", on_progress=on_progress
+    )
+    # Fewer than 200 updates stay unwritten, so the checkpoint does not move
+    assert checkpoints[-1] == {
+        "row_id": -1,
+        "stats": {"pages": 0, "rows_checked": 0, "rows_updated": 0},
+    }
+
+    baserow = FakeBaserow(pages)
+    instagram = FakeInstagram()
+    stats = await update_empty_names(
+        baserow,
+        instagram,
+        "1",
+        checkpoint={
+            "row_id": 10,
+            "stats": {"pages": 1, "rows_checked": 4, "rows_updated": 4},
+        },
+    )
+
+    assert instagram.calls == ["u1_1", "u1_2", "u2_0", "u2_1", "u2_2"]
+    assert [update["id"] for update in baserow.batches[0]] == [11, 12, 20, 21, 22]
+    assert stats == {"pages": 3, "rows_checked": 9, "rows_updated": 9}
+
+
+@pytest.mark.asyncio
+async def test_update_empty_names_checkpoint_stats_match_position():
+    pages = [
+        [
+            {"id": page * 1000 + i, "Name": "", "Instagram Page": f"u{page}_{i}"}
+            for i in range(200)
+        ]
+        for page in range(4)
+    ]
+    rows = [row for page in pages for row in page]
+    checkpoints = []
+
+    async def on_progress(checkpoint, progress):
+        checkpoints.append(checkpoint)
+
+    full = await update_empty_names(
+        FakeBaserow(pages),
+        FakeInstagram(missing={"u1_5"}),
+        "1",
+        on_progress=on_progress,
+    )
+
+    for checkpoint in checkpoints:
+        done = [row for row in rows if row["id"] <= checkpoint["row_id"]]
+        assert checkpoint["stats"]["rows_checked"] == len(done)
+        assert checkpoint["stats"]["rows_updated"] == len(
+            [row for row in done if row["Instagram Page"] != "u1_5"]
+        )
+
+    # Resuming from any checkpoint ends with the same totals as one full run
+    resumed = [checkpoint for checkpoint in checkpoints if checkpoint["row_id"] >= 0]
+    assert resumed
+    stats = await update_empty_names(
+        FakeBaserow(pages),
+        FakeInstagram(missing={"u1_5"}),
+        "1",
+        checkpoint=resumed[0],
+    )
+    assert stats == full == {"pages": 4, "rows_checked": 800, "rows_updated": 799}
+
+
+class FakeDedupeBaserow(FakeBaserow):
+    def __init__(self, pages, gone=()):
+        super().__init__(pages)
+        self.deleted = []
+        self.gone = set(gone)
+
+    async def batch_delete_rows(self, table_id, row_ids):
+        if self.gone.intersection(row_ids):
+            raise HTTPException(status_code=400, detail="Failed to batch delete rows")
+        self.deleted.extend(row_ids)
+
+    async def delete_row(self, table_id, row_id):
+        if row_id in self.gone:
+            raise HTTPException(status_code=404, detail="Failed to delete row")
+        self.deleted.append(row_id)
+
+
+def make_dedupe_pages():
+    return [
+        [
+            {"id": 1, "Instagram Page": "https://instagram.com/a/"},
+            {"id": 2, "Instagram Page": "https://www.instagram.com/b"},
+        ],
+        [
+            {"id": 3, "Instagram Page": "https://www.instagram.com/a"},
+            {"id": 4, "Instagram Page": ""},
+            {"id": 5, "Instagram Page": "https://instagram.com/b"},
+        ],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_remove_duplicates_reads_everything_then_batches_writes():
+    baserow = FakeDedupeBaserow(make_dedupe_pages())
+
+    report = await remove_duplicates(baserow, "1")
+
+    assert report["rows_checked"] == 5
+    assert baserow.batches == [
+        [{"id": 1, "Instagram Page": "https://www.instagram.com/a"}]
+    ]
+    assert baserow.deleted == [3, 5]
+
+
+@pytest.mark.asyncio
+async def test_remove_duplicates_dry_run_only_reports():
+    baserow = FakeDedupeBaserow(make_dedupe_pages())
+
+    report = await remove_duplicates(baserow, "1", dry_run=True)
+
+    assert report["rows_normalized"] == 1
+    assert report["rows_deleted"] == 2
+    assert report["duplicates"][0] == {
+        "id": 3,
+        "url": "https://www.instagram.com/a",
+        "kept_id": 1,
+    }
+    assert baserow.batches == []
+    assert baserow.deleted == []
+
+
+@pytest.mark.asyncio
+async def test_remove_duplicates_saves_plan_once_then_offsets():
+    baserow = FakeDedupeBaserow(make_dedupe_pages())
+    saved = []
+
+    async def on_progress(checkpoint, progress):
+        saved.append((checkpoint, progress))
+
+    await remove_duplicates(baserow, "1", on_progress=on_progress)
+
+    plans = [checkpoint for checkpoint, _ in saved if checkpoint is not None]
+    assert [plan["phase"] for plan in plans] == ["scan", "scan", "apply"]
+    assert plans[-1]["deletions"] == [3, 5]
+    # After the plan, each batch only saves progress
+    assert [checkpoint for checkpoint, _ in saved[3:]] == [None, None]
+    assert saved[-1][1]["rows_normalized"] == 1
+    assert saved[-1][1]["rows_deleted"] == 2
+
+
+@pytest.mark.asyncio
+async def test_remove_duplicates_resumes_apply_phase():
+    plans = []
+
+    async def on_progress(checkpoint, progress):
+        if checkpoint is not None and checkpoint["phase"] == "apply":
+            plans.append(checkpoint)
+
+    await remove_duplicates(
+        FakeDedupeBaserow(make_dedupe_pages()), "1", on_progress=on_progress
+    )
+
+    # Interrupted after the normalizations and the deletion of row 3, before
+    # that deletion's progress was saved
+    resumed = FakeDedupeBaserow([], gone=[3])
+    report = await remove_duplicates(
+        resumed,
+        "1",
+        checkpoint=plans[0],
+        progress={"rows_normalized": 1, "rows_deleted": 0},
+    )
+
+    assert resumed.batches == []
+    assert resumed.deleted == [5]
+    assert report["rows_deleted"] == 2
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from app.leads import lead_username, lead_values
+
+
+def test_lead_username_normalizes_urls_and_handles():
+    assert lead_username("https://www.instagram.com/Some.User/") == "some.user"
+    assert lead_username("@Some.User") == "some.user"
+    assert lead_username("") == ""
+
+
+def test_lead_values_keeps_first_row_per_username():
+    synced_at = datetime(2025, 1, 1)
+    rows = [
+        {"id": 1, "Instagram Page": "https://instagram.com/a"},
+        {"id": 2, "Instagram Page": "https://www.instagram.com/A/"},
+        {"id": 3, "Instagram Page": ""},
+        {"id": 4, "Instagram Page": None},
+        {"id": 5, "Instagram Page": "https://www.instagram.com/b"},
+    ]
+
+    values = lead_values(rows, synced_at)
+
+    assert [(value["username"], value["baserow_row_id"]) for value in values] == [
+        ("a", 1),
+        ("b", 5),
+    ]
+    assert values[0]["synced_at"] == synced_at
@@ -0,0 +1,80 @@
+import uuid
+
+import pytest
+
+from app import loops
+from app.loops import dispatch_account_created_events
+
+
+class FakeStreamResult:
+    def __init__(self, rows, size):
+        self.rows = rows
+        self.size = size
+
+    async def partitions(self):
+        for start in range(0, len(self.rows), self.size):
+            yield self.rows[start : start + self.size]
+
+
+class FakeSession:
+    def __init__(self, rows, added=None):
+        self.rows = rows
+        self.added = added if added is not None else []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def add(self, instance):
+        self.added.append(instance)
+
+    async def commit(self):
+        pass
+
+    async def stream(self, query):
+        assert query.get_execution_options()["yield_per"] == 2
+        return FakeStreamResult(self.rows, 2)
+
+
+@pytest.mark.asyncio
+async def test_dispatch_account_created_events_checkpoints_each_chunk(
+    monkeypatch, mocker
+):
+    users = [(uuid.UUID(int=i), f"user{i}@example.com") for i in range(1, 6)]
+    sent = []
+
+    async def send_loops_event(payload, idempotency_key):
+        if payload["email"] == "user3@example.com":
+            raise RuntimeError("rejected")
+        sent.append(idempotency_key)
+
+    monkeypatch.setattr(loops, "send_loops_event", send_loops_event)
+    monkeypatch.setattr(loops, "DISPATCH_CHUNK_SIZE", 2)
+    notify = mocker.patch("app.loops.outbox_dispatcher.notify")
+    checkpoints = []
+    added = []
+
+    async def on_progress(checkpoint, progress):
+        checkpoints.append(checkpoint)
+
+    stats = await dispatch_account_created_events(
+        "job-1",
+        on_progress=on_progress,
+        session_maker=lambda: FakeSession(users, added),
+    )
+
+    assert stats == {"users_processed": 5, "events_sent": 4, "failed": 1}
+    assert sent[0] == f"job-1-{users[0][0]}"
+    assert [c["user_id"] for c in checkpoints] == [
+        str(users[1][0]),
+        str(users[3][0]),
+        str(users[4][0]),
+    ]
+    assert checkpoints[0]["stats"]["users_processed"] == 2
+    # The rejected event is retried through the outbox
+    (message,) = added
+    assert message.topic == loops.LOOPS_EVENT_TOPIC
+    assert message.payload["email"] == "user3@example.com"
+    notify.assert_called_once()
@@ -0,0 +1,107 @@
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from prometheus_client import REGISTRY
+
+from app.metrics import (
+    IMAGE_GENERATIONS_IN_PROGRESS,
+    observe_dependency,
+    render_metrics,
+    track_image_generation,
+    track_metrics,
+)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_observe_dependency_labels_outcome():
+    before_ok = sample(
+        "outbound_request_duration_seconds_count", dependency="test", outcome="ok"
+    )
+    before_error = sample(
+        "outbound_request_duration_seconds_count", dependency="test", outcome="error"
+    )
+
+    with observe_dependency("test"):
+        pass
+    with pytest.raises(RuntimeError):
+        with observe_dependency("test"):
+            raise RuntimeError("boom")
+
+    assert (
+        sample(
+            "outbound_request_duration_seconds_count", dependency="test", outcome="ok"
+        )
+        == before_ok + 1
+    )
+    assert (
+        sample(
+            "outbound_request_duration_seconds_count",
+            dependency="test",
+            outcome="error",
+        )
+        == before_error + 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_track_image_generation_counts_running_generations():
+    seen = []
+
+    @track_image_generation
+    async def generate():
+        seen.append(IMAGE_GENERATIONS_IN_PROGRESS._value.get())
+
+    before = sample("image_generation_duration_seconds_count")
+    await generate()
+
+    assert seen == [1]
+    assert IMAGE_GENERATIONS_IN_PROGRESS._value.get() == 0
+    assert sample("image_generation_duration_seconds_count") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_track_metrics_labels_requests_by_route_template(mocker):
+    mocker.patch(
+        "app.metrics.get_pool_stats",
+        return_value={
+            "checked_out": 0,
+            "checked_in": 1,
+            "overflow": 0,
+            "checkout_wait_seconds_max": 0.0,
+        },
+    )
+    app = FastAPI()
+    app.middleware("http")(track_metrics)
+
+    @app.get("/projects/{project_id}")
+    async def get_project(project_id: str):
+        return {"id": project_id}
+
+    before = sample(
+        "http_requests_total",
+        method="GET",
+        route="/projects/{project_id}",
+        status="200",
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        await client.get("/projects/1")
+        await client.get("/projects/2")
+
+    assert (
+        sample(
+            "http_requests_total",
+            method="GET",
+            route="/projects/{project_id}",
+            status="200",
+        )
+        == before + 2
+    )
+    assert sample("db_pool_checked_in") == 1
+    content, content_type = render_metrics()
+    assert content_type.startswith("text/plain")
+    assert b"http_request_duration_seconds_bucket" in content
@@ -0,0 +1,42 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.outbox import OUTBOX_HANDLERS, deliver, register_outbox_handler, retry_delay
+
+
+def test_retry_delay_backs_off_exponentially_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr("app.outbox.settings.OUTBOX_RETRY_BACKOFF_SECONDS", 5.0)
+    monkeypatch.setattr("app.outbox.settings.OUTBOX_RETRY_MAX_BACKOFF_SECONDS", 60.0)
+
+    assert retry_delay(1) == timedelta(seconds=5)
+    assert retry_delay(3) == timedelta(seconds=20)
+    assert retry_delay(10) == timedelta(seconds=60)
+
+
+@pytest.mark.asyncio
+async def test_deliver_reports_handler_errors():
+    delivered = []
+
+    @register_outbox_handler("test.ok")
+    async def ok(payload, message_id):
+        delivered.append((payload, message_id))
+
+    @register_outbox_handler("test.failing")
+    async def failing(payload, message_id):
+        raise RuntimeError("boom")
+
+    try:
+        message = SimpleNamespace(id=1, topic="test.ok", payload={"a": 1})
+        assert await deliver(message) is None
+        assert delivered == [({"a": 1}, 1)]
+
+        message = SimpleNamespace(id=2, topic="test.failing", payload={})
+        assert await deliver(message) == "boom"
+
+        message = SimpleNamespace(id=3, topic="test.unknown", payload={})
+        assert "No handler" in await deliver(message)
+    finally:
+        OUTBOX_HANDLERS.pop("test.ok")
+        OUTBOX_HANDLERS.pop("test.failing")
@@ -0,0 +1,32 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    row_id = uuid.uuid4()
+    updated_at = datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+    cursor = encode_cursor(updated_at, row_id)
+
+    assert decode_cursor(cursor) == (updated_at, str(row_id))
+    assert decode_cursor(cursor, uuid.UUID) == (updated_at, row_id)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not-a-cursor",
+        encode_cursor(datetime(2025, 1, 1), "not-a-uuid"),
+        "WzEsMl0",  # [1,2]
+    ],
+)
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, uuid.UUID)
+
+    assert error.value.status_code == 400
@@ -0,0 +1,30 @@
+import sys
+
+import pytest
+
+from app.providers import LazyModule, close_provider_clients, get_s3_client
+
+
+def test_lazy_module_imports_on_first_attribute_access(mocker):
+    sys.modules.pop("colorsys", None)
+    on_import = mocker.Mock()
+    colorsys = LazyModule("colorsys", on_import=on_import)
+
+    assert "colorsys" not in sys.modules
+    assert colorsys.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+    assert colorsys.hls_to_rgb(0, 0, 0) == (0, 0, 0)
+
+    on_import.assert_called_once_with(sys.modules["colorsys"])
+
+
+@pytest.mark.asyncio
+async def test_s3_client_is_shared_until_closed():
+    first = await get_s3_client()
+
+    assert await get_s3_client() is first
+
+    await close_provider_clients()
+    second = await get_s3_client()
+    await close_provider_clients()
+
+    assert second is not first
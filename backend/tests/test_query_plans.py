@@ -0,0 +1,207 @@
+"""Query plan regression tests.
+
+Each hot-path query is EXPLAINed against seeded data with sequential scans
+disabled, so the planner only falls back to one when no index can serve the
+query. A sequential scan on the queried table fails the test.
+"""
+
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import and_, func, or_, select
+
+from app.models import (
+    HomeDesignConversation,
+    HomeDesignEdit,
+    HomeDesignProject,
+    Lead,
+    StripeEvent,
+    StripeInvoice,
+    User,
+)
+
+
+@pytest_asyncio.fixture
+async def seeded(db_session):
+    user = User(
+        id=uuid.uuid4(),
+        email="plans@example.com",
+        hashed_password="x",
+        stripe_customer_id="cus_plans",
+        stripe_subscription_id="sub_plans",
+    )
+    project = HomeDesignProject(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        name="Plans",
+        original_image_url="https://example.com/a.png",
+        current_image_url="https://example.com/a.png",
+    )
+    conversation = HomeDesignConversation(
+        id=uuid.uuid4(), project_id=project.id, messages=[]
+    )
+    db_session.add_all([user, project, conversation])
+    await db_session.flush()
+    db_session.add_all(
+        [
+            HomeDesignEdit(
+                project_id=project.id,
+                conversation_id=conversation.id,
+                prompt="Paint it blue",
+                before_image_url="https://example.com/a.png",
+                after_image_url="https://example.com/b.png",
+                edit_type="color_change",
+            ),
+            StripeInvoice(
+                id="in_plans",
+                customer_id="cus_plans",
+                hosted_invoice_url="https://example.com/invoice",
+                total=100,
+                credits=10,
+                created=datetime(2025, 1, 1, tzinfo=timezone.utc),
+            ),
+            Lead(
+                username="plans",
+                baserow_row_id=1,
+                instagram_url="https://www.instagram.com/plans",
+                synced_at=datetime(2025, 1, 1),
+            ),
+        ]
+    )
+    await db_session.flush()
+    return {"user": user, "project": project}
+
+
+async def explain(db_session, statement) -> dict:
+    compiled = statement.compile(dialect=db_session.bind.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup or ())
+    connection = await db_session.connection()
+    await connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", params
+    )
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def sequential_scans(plan: dict) -> list:
+    scans = [plan["Relation Name"]] if plan["Node Type"] == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        scans.extend(sequential_scans(child))
+    return scans
+
+
+HOT_PATH_QUERIES = {
+    # GET /home-design/projects, second page
+    "user_projects": lambda s: (
+        "home_design_projects",
+        select(HomeDesignProject)
+        .where(
+            HomeDesignProject.user_id == s["user"].id,
+            or_(
+                HomeDesignProject.updated_at < datetime(2025, 6, 1),
+                and_(
+                    HomeDesignProject.updated_at == datetime(2025, 6, 1),
+                    HomeDesignProject.id < s["project"].id,
+                ),
+            ),
+        )
+        .order_by(HomeDesignProject.updated_at.desc(), HomeDesignProject.id.desc())
+        .limit(11),
+    ),
+    # GET /home-design/projects/{id} and every project ownership check
+    "project": lambda s: (
+        "home_design_projects",
+        select(HomeDesignProject).where(
+            HomeDesignProject.id == s["project"].id,
+            HomeDesignProject.user_id == s["user"].id,
+        ),
+    ),
+    # GET /home-design/conversations/{project_id}
+    "project_conversations": lambda s: (
+        "home_design_conversations",
+        select(HomeDesignConversation)
+        .where(HomeDesignConversation.project_id == s["project"].id)
+        .order_by(HomeDesignConversation.updated_at.desc()),
+    ),
+    # Version check for conditional GET /home-design/conversations/{project_id}
+    "project_conversations_version": lambda s: (
+        "home_design_conversations",
+        select(
+            func.count(HomeDesignConversation.id),
+            func.max(HomeDesignConversation.updated_at),
+        )
+        .select_from(HomeDesignProject)
+        .outerjoin(
+            HomeDesignConversation,
+            HomeDesignConversation.project_id == HomeDesignProject.id,
+        )
+        .where(
+            HomeDesignProject.id == s["project"].id,
+            HomeDesignProject.user_id == s["user"].id,
+        )
+        .group_by(HomeDesignProject.id),
+    ),
+    # GET /home-design/edits/{project_id}
+    "project_edits": lambda s: (
+        "home_design_edits",
+        select(HomeDesignEdit)
+        .where(HomeDesignEdit.project_id == s["project"].id)
+        .order_by(HomeDesignEdit.created_at.desc()),
+    ),
+    # Stripe checkout, subscription created and renewal handlers
+    "user_by_customer": lambda s: (
+        "user",
+        select(User).where(User.stripe_customer_id == "cus_plans"),
+    ),
+    # Stripe subscription updated and deleted handlers
+    "user_by_subscription": lambda s: (
+        "user",
+        select(User).where(User.stripe_subscription_id == "sub_plans"),
+    ),
+    # GET /billing/invoices, second page
+    "invoices": lambda s: (
+        "invoices",
+        select(StripeInvoice)
+        .where(
+            StripeInvoice.customer_id == "cus_plans",
+            StripeInvoice.hosted_invoice_url.is_not(None),
+            or_(
+                StripeInvoice.created < datetime(2025, 6, 1, tzinfo=timezone.utc),
+                and_(
+                    StripeInvoice.created == datetime(2025, 6, 1, tzinfo=timezone.utc),
+                    StripeInvoice.id < "in_z",
+                ),
+            ),
+        )
+        .order_by(StripeInvoice.created.desc(), StripeInvoice.id.desc())
+        .limit(11),
+    ),
+    # Stripe event consumer
+    "pending_stripe_events": lambda s: (
+        "stripe_events",
+        select(StripeEvent)
+        .where(
+            StripeEvent.customer_id == "cus_plans",
+            StripeEvent.processed_at.is_(None),
+        )
+        .order_by(StripeEvent.stripe_created_at, StripeEvent.id),
+    ),
+    # POST /lead-generation/process-instagram-url
+    "lead": lambda s: ("leads", select(Lead).where(Lead.username == "plans")),
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", sorted(HOT_PATH_QUERIES))
+async def test_hot_path_query_uses_an_index(db_session, seeded, name):
+    table, statement = HOT_PATH_QUERIES[name](seeded)
+
+    plan = await explain(db_session, statement)
+
+    assert table not in sequential_scans(plan), json.dumps(plan, indent=2)
@@ -0,0 +1,62 @@
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, text
+
+from app.query_stats import count_queries, instrument_engine, track_queries
+
+
+@pytest.fixture
+def sqlite_engine():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_count_queries_counts_statements_in_nested_scopes(sqlite_engine):
+    with sqlite_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))  # Outside any scope
+        with count_queries() as outer:
+            connection.execute(text("SELECT 1"))
+            with count_queries() as inner:
+                for _ in range(3):
+                    connection.execute(text("SELECT 2"))
+
+    assert outer.count == 4
+    assert inner.count == 3
+    assert outer.duration_seconds >= inner.duration_seconds > 0
+    assert inner.repeated_statements(3) == {"SELECT 2": 3}
+    assert not outer.repeated_statements(5)
+
+
+def test_instrument_engine_is_idempotent(sqlite_engine):
+    instrument_engine(sqlite_engine)
+
+    with count_queries() as stats, sqlite_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    assert stats.count == 1
+
+
+@pytest.mark.asyncio
+async def test_track_queries_reports_server_timing(sqlite_engine, mocker, capsys):
+    mocker.patch("app.query_stats.settings.QUERY_REPEAT_THRESHOLD", 2)
+    app = FastAPI()
+    app.middleware("http")(track_queries)
+
+    @app.get("/items")
+    def list_items():
+        with sqlite_engine.connect() as connection:
+            for _ in range(2):
+                connection.execute(text("SELECT 1"))
+        return []
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.get("/items")
+
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert response.headers["Server-Timing"].endswith('desc="2 queries"')
+    assert "Possible N+1, ran 2 times: SELECT 1" in capsys.readouterr().out
@@ -0,0 +1,45 @@
+import json
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from pydantic import ValidationError
+
+from app.serializers import CONVERSATION_LIST, json_list_response
+
+
+def make_conversation(**overrides):
+    fields = {
+        "id": uuid.uuid4(),
+        "project_id": uuid.uuid4(),
+        "messages": [{"role": "user", "content": "Hi"}],
+        "created_at": datetime(2025, 1, 1),
+        "updated_at": datetime(2025, 1, 2),
+    }
+    return SimpleNamespace(**{**fields, **overrides})
+
+
+def test_json_list_response_encodes_rows_and_headers():
+    conversation = make_conversation()
+
+    response = json_list_response(
+        CONVERSATION_LIST, [conversation], {"X-Next-Cursor": "abc"}
+    )
+
+    assert response.media_type == "application/json"
+    assert response.headers["X-Next-Cursor"] == "abc"
+    assert json.loads(response.body) == [
+        {
+            "id": str(conversation.id),
+            "project_id": str(conversation.project_id),
+            "messages": [{"role": "user", "content": "Hi"}],
+            "created_at": "2025-01-01T00:00:00",
+            "updated_at": "2025-01-02T00:00:00",
+        }
+    ]
+
+
+def test_json_list_response_still_validates_rows():
+    with pytest.raises(ValidationError):
+        json_list_response(CONVERSATION_LIST, [make_conversation(messages=None)])